@@ -0,0 +1,217 @@
+# alm_gap.py
+
+import hashlib
+import io
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from coupon_maturity_summary import FUNDS, cached_fund_flows, file_keys, monthly_fund_inflows
+from demographics_app import cached_projection, load_demographics_workbook, projection_sidebar
+from demographics_projection import base_population
+from fixed_income import DATASETS, holdings_monthly_inflows
+
+INFLOW_SOURCES = ["Coupon/maturity CSV extracts", "Fixed income holdings file"]
+GAP_COLUMNS = ["Fund", "Month", "Coupon", "Maturity", "Contributions", "Inflows", "Outflows", "Net_Flow", "Cumulative_Gap"]
+
+
+@st.cache_data(show_spinner=False, max_entries=5)
+def load_holdings(digest, data, file_name):
+    """
+    Holdings sheets of a Fixed Income Dataset Viewer file: every DATASETS sheet
+    of a workbook, or one CSV whose name contains a dataset name.
+    """
+    if file_name.lower().endswith(".csv"):
+        name = next((name for name in DATASETS if name.lower() in file_name.lower()), None)
+        return {name: pd.read_csv(io.BytesIO(data))} if name else {}
+    excel = pd.ExcelFile(io.BytesIO(data))
+    return {name: excel.parse(sheet_name=name) for name in DATASETS if name in excel.sheet_names}
+
+
+def monthly_outflows(summary, fund):
+    """
+    Spread the yearly projection evenly over the months of each projected year.
+
+    Returns:
+        pd.DataFrame with Fund, Month, Contributions, Outflows
+    """
+    yearly = summary.loc[summary.index.repeat(12)]
+    month_numbers = np.tile(np.arange(1, 13), len(summary))
+    months = pd.to_datetime(pd.DataFrame({"year": yearly["Year"].to_numpy(), "month": month_numbers, "day": 1}))
+    return pd.DataFrame({
+        "Fund": fund,
+        "Month": months.to_numpy(),
+        "Contributions": yearly["Contributions"].to_numpy() / 12,
+        "Outflows": yearly["Outflows"].to_numpy() / 12,
+    })
+
+
+def liquidity_gap(inflows, outflows, start, end, funds=FUNDS, opening=None, include_contributions=True):
+    """
+    Align inflows and outflows on one Fund x Month grid and accumulate the gap per fund.
+
+    Args:
+        inflows (pd.DataFrame): Fund, Month, Coupon, Maturity
+        outflows (pd.DataFrame): Fund, Month, Contributions, Outflows
+        start, end: first and last month of the grid
+        funds (list): funds on the grid
+        opening (dict): opening liquid assets per fund
+        include_contributions (bool): count projected contributions as inflows
+
+    Returns:
+        pd.DataFrame with GAP_COLUMNS
+    """
+    grid = pd.MultiIndex.from_product(
+        [list(funds), pd.date_range(pd.Timestamp(start).to_period("M").to_timestamp(), end, freq="MS")],
+        names=["Fund", "Month"],
+    )
+    gap = (
+        inflows.set_index(["Fund", "Month"])
+        .join(outflows.set_index(["Fund", "Month"]), how="outer")
+        .reindex(grid)
+        .fillna(0.0)
+    )
+    if not include_contributions:
+        gap["Contributions"] = 0.0
+    gap["Inflows"] = gap["Coupon"] + gap["Maturity"] + gap["Contributions"]
+    gap["Net_Flow"] = gap["Inflows"] - gap["Outflows"]
+    opening_cash = pd.Series(opening or {}, dtype="float64").reindex(funds, fill_value=0.0)
+    gap["Cumulative_Gap"] = (
+        gap["Net_Flow"].groupby(level="Fund").cumsum()
+        + opening_cash.reindex(gap.index.get_level_values("Fund")).to_numpy()
+    )
+    return gap.reset_index()[GAP_COLUMNS]
+
+
+def gap_summary(gap):
+    """Totals, lowest cumulative gap and first shortfall month per fund."""
+    by_fund = gap.groupby("Fund", sort=False)
+    lowest = gap.loc[by_fund["Cumulative_Gap"].idxmin(), ["Fund", "Month", "Cumulative_Gap"]]
+    shortfall = gap[gap["Cumulative_Gap"] < 0].groupby("Fund")["Month"].min()
+    summary = by_fund.agg(
+        Inflows=("Inflows", "sum"),
+        Outflows=("Outflows", "sum"),
+        Ending_Gap=("Cumulative_Gap", "last"),
+    )
+    summary["Lowest_Gap"] = lowest.set_index("Fund")["Cumulative_Gap"]
+    summary["Lowest_Gap_Month"] = lowest.set_index("Fund")["Month"].dt.strftime("%Y-%m")
+    summary["First_Shortfall"] = shortfall.dt.strftime("%Y-%m").reindex(summary.index).fillna("None")
+    return summary.reset_index()
+
+
+def show_alm_gap_page():
+    st.title("📊 Asset-Liability Cash-Flow Gap")
+
+    # Both sources describe the same bonds; use one so nothing is counted twice
+    inflow_source = st.sidebar.radio("Bond inflows from:", INFLOW_SOURCES)
+    if inflow_source == INFLOW_SOURCES[0]:
+        bond_files = st.sidebar.file_uploader(
+            "Upload coupon and maturity CSV files", type=["csv"], accept_multiple_files=True
+        )
+        missing_bonds = "the coupon/maturity CSV files (same names as the Coupon and Maturities report)"
+    else:
+        holdings_file = st.sidebar.file_uploader("Upload fixed income holdings file", type=["csv", "xlsx"])
+        bond_files = [holdings_file] if holdings_file is not None else []
+        missing_bonds = "the fixed income holdings file (as loaded by the Fixed Income Dataset Viewer)"
+    demographics_file = st.sidebar.file_uploader("Upload demographics workbook", type=["xlsx"])
+
+    if not bond_files or not demographics_file:
+        st.info(f"Upload {missing_bonds} and the demographics workbook to build the gap report.")
+        return
+
+    liability_fund = st.sidebar.selectbox("Fund paying the projected benefits:", FUNDS, index=FUNDS.index("MPF"))
+    include_contributions = st.sidebar.checkbox("Count projected contributions as inflows", value=True)
+    opening_cash = st.sidebar.number_input(f"Opening liquid assets ({liability_fund})", min_value=0.0, value=0.0, step=1_000_000.0)
+    usd_rate_input = st.sidebar.text_input("Php to 1 USD Exchange Rate (leave blank to keep USD)", "")
+    try:
+        usd_rate = float(usd_rate_input) if usd_rate_input else None
+    except ValueError:
+        st.sidebar.error("Invalid exchange rate. Please enter a valid number.")
+        usd_rate = None
+    display_mode = st.sidebar.radio("Display Figures In:", ["Actual", "Millions"])
+    years, start_year, scenarios = projection_sidebar(allow_sweep=False)
+
+    try:
+        if inflow_source == INFLOW_SOURCES[0]:
+            flows = cached_fund_flows(file_keys(bond_files), bond_files)
+            inflows = monthly_fund_inflows(flows, usd_rate)
+        else:
+            holdings = bond_files[0].getvalue()
+            datasets = load_holdings(hashlib.sha1(holdings).hexdigest(), holdings, bond_files[0].name)
+            inflows = holdings_monthly_inflows(datasets, usd_rate)
+        workbook = demographics_file.getvalue()
+        _, cube = load_demographics_workbook(hashlib.sha1(workbook).hexdigest(), workbook)
+    except Exception as e:
+        st.error(f"Error reading uploaded files: {e}")
+        return
+
+    if inflows.empty:
+        st.warning("No coupon or maturity amounts were found in the uploaded bond files.")
+
+    ages, counts, per_member = base_population(cube)
+    if counts.sum() == 0:
+        st.warning("The demographics workbook has no age/sex contributor counts; benefit outflows are zero.")
+    projection, _ = cached_projection(counts, per_member, scenarios, years, start_year)
+    outflows = monthly_outflows(projection, liability_fund)
+
+    gap = liquidity_gap(
+        inflows, outflows,
+        start=f"{start_year + 1}-01-01", end=f"{start_year + years}-12-01",
+        opening={liability_fund: opening_cash},
+        include_contributions=include_contributions,
+    )
+    st.caption(
+        f"Monthly grid {start_year + 1}-01 to {start_year + years}-12. Projected yearly flows are spread evenly "
+        "over the months of each year; bond flows outside the grid are excluded."
+    )
+
+    factor = 1_000_000 if display_mode == "Millions" else 1
+    unit = "Millions" if display_mode == "Millions" else "Actual"
+    shown = gap.copy()
+    amount_cols = GAP_COLUMNS[2:]
+    shown[amount_cols] = shown[amount_cols] / factor
+
+    st.subheader(f"📉 Cumulative Liquidity Gap by Fund (Figures in {unit})")
+    gap_chart = alt.Chart(shown).mark_line().encode(
+        x=alt.X("Month:T", title="Month"),
+        y=alt.Y("Cumulative_Gap:Q", title="Cumulative Gap", axis=alt.Axis(format=",.1f")),
+        color=alt.Color("Fund:N", sort=FUNDS),
+        tooltip=["Fund", alt.Tooltip("Month:T", format="%Y-%m"), alt.Tooltip("Cumulative_Gap:Q", format=",.2f")]
+    )
+    zero = alt.Chart(pd.DataFrame({"y": [0]})).mark_rule(color="red", strokeDash=[4, 4]).encode(y="y:Q")
+    st.altair_chart((gap_chart + zero).properties(height=400).interactive(), use_container_width=True)
+
+    st.subheader(f"📋 Gap Summary (Figures in {unit})")
+    summary = gap_summary(gap)
+    summary[["Inflows", "Outflows", "Ending_Gap", "Lowest_Gap"]] /= factor
+    st.dataframe(
+        summary.style.format({col: "{:,.2f}" for col in ["Inflows", "Outflows", "Ending_Gap", "Lowest_Gap"]}),
+        use_container_width=True
+    )
+
+    st.subheader(f"💵 Monthly Inflows vs Outflows: {liability_fund}")
+    fund_rows = shown[shown["Fund"] == liability_fund]
+    bars = fund_rows.assign(Outflows=-fund_rows["Outflows"]).melt(
+        id_vars="Month", value_vars=["Coupon", "Maturity", "Contributions", "Outflows"],
+        var_name="Flow", value_name="Amount"
+    )
+    flow_chart = alt.Chart(bars).mark_bar().encode(
+        x=alt.X("Month:T", title="Month"),
+        y=alt.Y("sum(Amount):Q", title="Amount", axis=alt.Axis(format=",.1f")),
+        color=alt.Color("Flow:N"),
+        tooltip=[alt.Tooltip("Month:T", format="%Y-%m"), "Flow", alt.Tooltip("Amount:Q", format=",.2f")]
+    ).properties(height=350)
+    st.altair_chart(flow_chart, use_container_width=True)
+
+    with st.expander("Monthly gap detail"):
+        st.dataframe(
+            shown.style.format({col: "{:,.2f}" for col in amount_cols}).format({"Month": "{:%Y-%m}"}),
+            use_container_width=True
+        )
+    st.download_button(
+        "📥 Download Gap Table as CSV",
+        shown.to_csv(index=False).encode("utf-8"),
+        file_name="alm_liquidity_gap.csv", mime="text/csv"
+    )
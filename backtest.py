@@ -0,0 +1,422 @@
+# backtest.py
+
+import os
+import time
+
+import altair as alt
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from indicators import DEFAULT_PARAMS, SMOOTHING_METHODS, bar_panel, macd, rsi, stochastic
+from market_store import get_store
+
+TRADING_DAYS = 252
+METRIC_COLUMNS = [
+    "Total_Return", "Ann_Return", "Ann_Vol", "Sharpe", "Max_Drawdown",
+    "Trades", "Hit_Rate", "Exposure", "Buy_Hold_Return",
+]
+STRATEGIES = {
+    "RSI mean reversion": "Buy when RSI falls below the lower level, sell when it rises above the upper level",
+    "MACD trend": "Hold while MACD is above its signal line",
+    "Stochastic cross": "Hold while %K is above %D",
+}
+
+
+# --- Signals ---
+
+def _ffill_index(mask, axis=-2):
+    """Index of the latest True at or before each position along `axis`, -1 before the first."""
+    shape = [1] * mask.ndim
+    shape[axis] = mask.shape[axis]
+    rows = np.arange(mask.shape[axis], dtype=np.int32).reshape(shape)
+    return np.maximum.accumulate(np.where(mask, rows, np.int32(-1)), axis=axis)
+
+
+def latch(enter, exit_, axis=-2):
+    """
+    Position that switches on at `enter` and off at `exit_` events along the time `axis`.
+
+    Long wherever the latest entry is more recent than the latest exit.
+    Arrays broadcast, so a (params x time x stocks) grid is evaluated in one pass.
+    """
+    return _ffill_index(enter, axis) > _ffill_index(exit_, axis)
+
+
+def rsi_positions(rsi_values, lower=30, upper=70, axis=-2):
+    """Long from RSI < lower until RSI > upper."""
+    with np.errstate(invalid="ignore"):
+        return latch(rsi_values < lower, rsi_values > upper, axis)
+
+
+def cross_positions(fast, slow):
+    """Long while `fast` is above `slow` (flat while either is missing)."""
+    with np.errstate(invalid="ignore"):
+        return fast > slow
+
+
+# --- Backtest ---
+
+def _backtest_time_last(positions, close, lag, cost_bps, keep_equity):
+    """backtest() with time on the last axis: positions (..., stocks, bars), close (stocks, bars)."""
+    valid = ~np.isnan(close)
+    n_bars = close.shape[-1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        returns = np.nan_to_num(close[:, 1:] / close[:, :-1] - 1, nan=0.0, posinf=0.0, neginf=0.0)
+
+    held = np.zeros(np.shape(positions), dtype=bool)
+    held[..., lag:] = positions[..., :n_bars - lag]
+    held &= valid
+    changes = held[..., 1:] != held[..., :-1]
+
+    # Bar t earns the return from t-1 to t if the position was held at t-1
+    strategy = np.zeros(held.shape)
+    np.multiply(held[..., :-1], returns, out=strategy[..., 1:])
+    if cost_bps:
+        strategy[..., 1:] -= (cost_bps / 1e4) * changes
+    n_valid = np.maximum(np.count_nonzero(valid, axis=-1), 1)
+    mean = strategy.sum(axis=-1) / n_valid
+    var = np.einsum("...t,...t->...", strategy, strategy) / n_valid - mean ** 2
+    strategy += 1
+    equity = np.cumprod(strategy, axis=-1, out=strategy)
+    total = equity[..., -1] - 1
+    drawdown = (equity / np.maximum.accumulate(equity, axis=-1)).min(axis=-1) - 1
+
+    # Trades from the sparse position changes; entry k of a row pairs with exit k of that row
+    rows_shape = held.shape[:-1]
+    flat_equity = equity.reshape(-1, n_bars)
+    change_at = np.flatnonzero(changes)
+    change_row, change_bar = np.divmod(change_at, n_bars - 1)
+    change_bar += 1
+    is_entry = held.reshape(-1, n_bars)[change_row, change_bar]
+    entry_row, entry_bar = change_row[is_entry], change_bar[is_entry]
+    still_open = np.flatnonzero(held[..., -1])
+    exit_row = np.concatenate([change_row[~is_entry], still_open])
+    exit_bar = np.concatenate([change_bar[~is_entry], np.full(len(still_open), n_bars - 1)])
+    order = np.lexsort((exit_bar, exit_row))
+    won = flat_equity[exit_row[order], exit_bar[order]] > flat_equity[entry_row, entry_bar - 1]
+    n_rows = flat_equity.shape[0]
+    trades = np.bincount(entry_row, minlength=n_rows).reshape(rows_shape)
+    wins = np.bincount(entry_row, weights=won, minlength=n_rows).reshape(rows_shape)
+
+    vol = np.sqrt(np.maximum(var, 0.0) * TRADING_DAYS)
+    years = n_valid / TRADING_DAYS
+    stocks = np.arange(close.shape[0])
+    first = np.argmax(valid, axis=-1)
+    last = n_valid - 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = {
+            "Total_Return": total,
+            "Ann_Return": (1 + total) ** (1 / years) - 1,
+            "Ann_Vol": vol,
+            "Sharpe": np.where(vol > 0, mean * TRADING_DAYS / vol, np.nan),
+            "Max_Drawdown": drawdown,
+            "Trades": trades,
+            "Hit_Rate": np.where(trades > 0, wins / np.maximum(trades, 1), np.nan),
+            "Exposure": np.count_nonzero(held, axis=-1) / n_valid,
+            "Buy_Hold_Return": np.broadcast_to(close[stocks, last] / close[stocks, first] - 1, total.shape),
+        }
+    if keep_equity:
+        result["Equity"] = equity
+    return result
+
+
+def backtest(positions, close, lag=1, cost_bps=0.0, keep_equity=False):
+    """
+    Metrics of long/flat positions for every stock (and every leading parameter axis).
+
+    A position decided at the close of bar t is traded at the close of bar
+    t + lag and earns the close-to-close returns after that. Each change of
+    position costs `cost_bps` of the traded amount.
+
+    Args:
+        positions (np.ndarray): (..., bars, stocks) bool target positions
+        close (np.ndarray): (bars, stocks) closes, bar-aligned (NaN after a stock's last bar)
+        lag (int): bars between signal and execution (1 = next bar)
+        cost_bps (float): cost per position change, in basis points
+        keep_equity (bool): also return the equity curves
+
+    Returns:
+        dict METRIC_COLUMNS -> (..., stocks) arrays, plus "Equity" (..., bars, stocks) if keep_equity
+    """
+    # Work with time as the last (contiguous) axis
+    result = _backtest_time_last(
+        np.ascontiguousarray(np.swapaxes(positions, -1, -2)),
+        np.ascontiguousarray(np.asarray(close, dtype=np.float64).T),
+        lag, cost_bps, keep_equity,
+    )
+    if keep_equity:
+        result["Equity"] = np.swapaxes(result["Equity"], -1, -2)
+    return result
+
+
+def strategy_positions(strategy, high, low, close, params):
+    """Target positions of one of STRATEGIES on (bars x stocks) panels."""
+    if strategy == "RSI mean reversion":
+        values = rsi(close, params["rsi_window"], params["smoothing"])
+        return rsi_positions(values, params["lower"], params["upper"])
+    if strategy == "MACD trend":
+        line, signal, _ = macd(close, params["macd_fast"], params["macd_slow"], params["macd_signal"])
+        return cross_positions(line, signal)
+    if strategy == "Stochastic cross":
+        k, d = stochastic(high, low, close, params["stoch_window"], params["stoch_smooth"])
+        return cross_positions(k, d)
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def rsi_sweep(close, windows, lowers, uppers, smoothing="wilder", lag=1, cost_bps=0.0, max_cells=4_000_000):
+    """
+    Backtest every RSI window x (lower, upper) pair for every stock.
+
+    RSI for all windows is computed in one pass over tiled columns; each
+    chunk of stocks then evaluates the whole window x threshold grid as one
+    broadcast (windows x pairs x stocks x bars) array. Chunks keep each
+    array under `max_cells` elements.
+
+    Returns:
+        pd.DataFrame with Window, Lower, Upper, Stock_Index and METRIC_COLUMNS
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n_bars, n_stocks = close.shape
+    windows = np.asarray(sorted(set(int(w) for w in windows)))
+    lowers = np.asarray(sorted(set(lowers)), dtype=np.float64)
+    uppers = np.asarray(sorted(set(uppers)), dtype=np.float64)
+    pair_lower, pair_upper = (idx.ravel() for idx in np.meshgrid(np.arange(len(lowers)), np.arange(len(uppers)), indexing="ij"))
+    keep = lowers[pair_lower] < uppers[pair_upper]
+    pair_lower, pair_upper = pair_lower[keep], pair_upper[keep]
+    pairs = np.column_stack([lowers[pair_lower], uppers[pair_upper]])
+    if len(windows) == 0 or len(pairs) == 0 or n_stocks == 0:
+        return pd.DataFrame(columns=["Window", "Lower", "Upper", "Stock_Index"] + METRIC_COLUMNS)
+    # (windows, thresholds, stocks, bars)
+    lowers_col = lowers.reshape(1, -1, 1, 1)
+    uppers_col = uppers.reshape(1, -1, 1, 1)
+
+    # Stocks per RSI pass (windows x stocks x bars) and per grid evaluation (windows x pairs x stocks x bars)
+    rsi_step = max(1, max_cells // (n_bars * len(windows)))
+    grid_step = max(1, max_cells // (n_bars * len(windows) * len(pairs)))
+    frames = []
+    for rsi_start in range(0, n_stocks, rsi_step):
+        block = close[:, rsi_start:rsi_start + rsi_step]
+        n = block.shape[1]
+        # (bars, windows * n) -> (windows, n, bars), time last
+        values = rsi(np.tile(block, (1, len(windows))), np.repeat(windows, n), smoothing)
+        values = np.ascontiguousarray(values.reshape(n_bars, len(windows), n).transpose(1, 2, 0))
+        block_t = np.ascontiguousarray(block.T)
+        for start in range(0, n, grid_step):
+            chunk = slice(start, start + grid_step)
+            # Latest entry/exit bar per threshold, then one comparison per (lower, upper) pair
+            with np.errstate(invalid="ignore"):
+                last_entry = _ffill_index(values[:, None, chunk] < lowers_col, -1)
+                last_exit = _ffill_index(values[:, None, chunk] > uppers_col, -1)
+            positions = last_entry[:, pair_lower] > last_exit[:, pair_upper]
+            metrics = _backtest_time_last(positions, block_t[chunk], lag, cost_bps, False)
+            shape = (len(windows), len(pairs), block[:, chunk].shape[1])
+            stock_index = np.arange(rsi_start + start, rsi_start + start + shape[2])
+            frames.append(pd.DataFrame({
+                "Window": np.broadcast_to(windows[:, None, None], shape).ravel(),
+                "Lower": np.broadcast_to(pairs[:, 0][None, :, None], shape).ravel(),
+                "Upper": np.broadcast_to(pairs[:, 1][None, :, None], shape).ravel(),
+                "Stock_Index": np.broadcast_to(stock_index[None, None, :], shape).ravel(),
+                **{name: np.broadcast_to(metrics[name], shape).ravel() for name in METRIC_COLUMNS},
+            }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def summarize_sweep(results):
+    """Average metrics across stocks for each parameter set."""
+    return (
+        results.assign(Beat_Buy_Hold=results["Total_Return"] > results["Buy_Hold_Return"])
+        .groupby(["Window", "Lower", "Upper"])
+        .agg(
+            Stocks=("Stock_Index", "nunique"),
+            Mean_Return=("Total_Return", "mean"),
+            Median_Return=("Total_Return", "median"),
+            Mean_Sharpe=("Sharpe", "mean"),
+            Mean_Hit_Rate=("Hit_Rate", "mean"),
+            Mean_Max_Drawdown=("Max_Drawdown", "mean"),
+            Mean_Trades=("Trades", "mean"),
+            Beat_Buy_Hold=("Beat_Buy_Hold", "mean"),
+        )
+        .reset_index()
+    )
+
+
+# --- Page ---
+
+@st.cache_data(show_spinner=False)
+def load_ohlc_panels(db_path, db_mtime):
+    """Bar-aligned High/Low/Close panels and per-bar dates of every stock in the OHLC database."""
+    df = get_store(db_path).get_ohlc(columns=["Stock", "Date", "High", "Low", "Close"])
+    panels, (bars, stock_codes, positions), stocks = bar_panel(df, ["High", "Low", "Close"])
+    dates = np.full(panels["Close"].shape, np.datetime64("NaT"), dtype="datetime64[ns]")
+    dates[bars, stock_codes] = df["Date"].to_numpy()[positions]
+    return panels, dates, list(stocks)
+
+
+@st.cache_data(show_spinner=False)
+def cached_sweep(db_path, db_mtime, columns, windows, lowers, uppers, smoothing, cost_bps):
+    """rsi_sweep() over the selected stock columns of the OHLC database; returns (results, seconds)."""
+    close = load_ohlc_panels(db_path, db_mtime)[0]["Close"][:, list(columns)]
+    started = time.perf_counter()
+    results = rsi_sweep(close, windows, lowers, uppers, smoothing, cost_bps=cost_bps)
+    return results, time.perf_counter() - started
+
+
+def _int_list(text):
+    return [int(float(part)) for part in text.replace(",", " ").split()]
+
+
+def show_backtest_page():
+    st.title("🧪 Strategy Backtest")
+
+    db_path = st.sidebar.text_input("OHLC DB Path", "ohlc_bbdata.db")
+    if not os.path.exists(db_path):
+        st.error(f"Database not found: {db_path}")
+        return
+    try:
+        with st.spinner("Loading price history..."):
+            panels, dates, stocks = load_ohlc_panels(db_path, os.path.getmtime(db_path))
+    except Exception as e:
+        st.error(f"Error reading the database: {e}")
+        return
+    if not stocks:
+        st.warning("No price data found in the database.")
+        return
+
+    mode = st.sidebar.radio("Mode", ["Single backtest", "Parameter sweep"], horizontal=True)
+    cost_bps = st.sidebar.number_input("Cost per trade (bps)", min_value=0.0, value=10.0, step=5.0)
+    st.sidebar.caption("Signals are taken at the close and traded at the next bar's close.")
+    high, low, close = panels["High"], panels["Low"], panels["Close"]
+    last_dates = pd.Series(np.nanmax(dates, axis=0)).dt.date.to_numpy()
+
+    if mode == "Single backtest":
+        strategy = st.sidebar.selectbox("Strategy", list(STRATEGIES))
+        st.caption(STRATEGIES[strategy])
+        params = dict(DEFAULT_PARAMS)
+        with st.sidebar.expander("Strategy Settings", expanded=True):
+            if strategy == "RSI mean reversion":
+                params["rsi_window"] = int(st.number_input("RSI window", 2, 100, DEFAULT_PARAMS["rsi_window"]))
+                params["lower"] = st.number_input("Buy below RSI", 1.0, 99.0, 30.0)
+                params["upper"] = st.number_input("Sell above RSI", 1.0, 99.0, 70.0)
+            elif strategy == "MACD trend":
+                params["macd_fast"] = int(st.number_input("MACD fast", 2, 100, DEFAULT_PARAMS["macd_fast"]))
+                params["macd_slow"] = int(st.number_input("MACD slow", 2, 200, DEFAULT_PARAMS["macd_slow"]))
+                params["macd_signal"] = int(st.number_input("MACD signal", 2, 100, DEFAULT_PARAMS["macd_signal"]))
+            else:
+                params["stoch_window"] = int(st.number_input("%K window", 2, 100, DEFAULT_PARAMS["stoch_window"]))
+                params["stoch_smooth"] = int(st.number_input("%D smoothing", 1, 50, DEFAULT_PARAMS["stoch_smooth"]))
+
+        started = time.perf_counter()
+        positions = strategy_positions(strategy, high, low, close, params)
+        metrics = backtest(positions, close, cost_bps=cost_bps, keep_equity=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        equity = metrics.pop("Equity")
+        table = pd.DataFrame({"Stock": stocks, "Bars": np.count_nonzero(~np.isnan(close), axis=0), **metrics})
+        table["Last_Date"] = last_dates
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Stocks", f"{len(stocks):,}")
+        col2.metric("Median return", f"{table['Total_Return'].median():.2%}")
+        col3.metric("Beat buy & hold", f"{(table['Total_Return'] > table['Buy_Hold_Return']).mean():.0%}")
+        st.caption(f"Backtested {len(stocks):,} stocks x {close.shape[0]:,} bars in {elapsed:,.1f} ms.")
+
+        st.subheader("📋 Results by Stock")
+        st.dataframe(
+            table.sort_values("Total_Return", ascending=False).style.format({
+                "Total_Return": "{:.2%}", "Ann_Return": "{:.2%}", "Ann_Vol": "{:.2%}", "Sharpe": "{:,.2f}",
+                "Max_Drawdown": "{:.2%}", "Trades": "{:,.0f}", "Hit_Rate": "{:.1%}", "Exposure": "{:.1%}",
+                "Buy_Hold_Return": "{:.2%}",
+            }, na_rep="-"),
+            use_container_width=True, hide_index=True
+        )
+
+        shown = st.multiselect("Equity curves", stocks, default=stocks[:min(5, len(stocks))])
+        if shown:
+            columns = [stocks.index(stock) for stock in shown]
+            curves = pd.DataFrame({
+                "Date": dates[:, columns].T.ravel(),
+                "Stock": np.repeat(shown, close.shape[0]),
+                "Equity": equity[:, columns].T.ravel(),
+            }).dropna(subset=["Date"])
+            st.subheader("📈 Equity Curves (start = 1.0)")
+            chart = alt.Chart(curves).mark_line().encode(
+                x=alt.X("Date:T", title="Date"),
+                y=alt.Y("Equity:Q", title="Equity", scale=alt.Scale(zero=False)),
+                color="Stock:N",
+                tooltip=["Stock", alt.Tooltip("Date:T", format="%Y-%m-%d"), alt.Tooltip("Equity:Q", format=",.4f")]
+            ).properties(height=400).interactive()
+            st.altair_chart(chart, use_container_width=True)
+
+        st.download_button(
+            "📥 Download Results as CSV",
+            table.to_csv(index=False).encode("utf-8"),
+            file_name="backtest_results.csv", mime="text/csv"
+        )
+        return
+
+    st.caption(STRATEGIES["RSI mean reversion"] + ", for every RSI window and threshold pair.")
+    with st.sidebar.expander("Sweep Settings", expanded=True):
+        first_window, last_window = st.slider("RSI windows", 2, 60, (5, 30))
+        window_step = int(st.number_input("Window step", 1, 10, 1))
+        smoothing = st.selectbox("Smoothing", list(SMOOTHING_METHODS), format_func=SMOOTHING_METHODS.get)
+        lower_text = st.text_input("Buy-below levels", "20, 25, 30, 35")
+        upper_text = st.text_input("Sell-above levels", "65, 70, 75, 80")
+    selected = st.sidebar.multiselect("Stocks (blank = all)", stocks)
+    try:
+        lowers, uppers = _int_list(lower_text), _int_list(upper_text)
+    except ValueError:
+        st.sidebar.error("Levels must be numbers separated by commas.")
+        return
+    windows = list(range(first_window, last_window + 1, window_step))
+    columns = [stocks.index(stock) for stock in selected] if selected else list(range(len(stocks)))
+
+    sweep_key = (db_path, tuple(columns), tuple(windows), tuple(lowers), tuple(uppers), smoothing, cost_bps)
+    if st.button("Run sweep"):
+        st.session_state["backtest_sweep"] = sweep_key
+    if st.session_state.get("backtest_sweep") != sweep_key:
+        n_pairs = sum(lower < upper for lower in set(lowers) for upper in set(uppers))
+        st.info(
+            f"{len(windows)} windows x {n_pairs} threshold pairs x {len(columns):,} stocks "
+            f"= {len(windows) * n_pairs * len(columns):,} backtests. Press **Run sweep** to start."
+        )
+        return
+
+    with st.spinner("Running parameter sweep..."):
+        results, elapsed = cached_sweep(
+            db_path, os.path.getmtime(db_path), tuple(columns), tuple(windows), tuple(lowers), tuple(uppers),
+            smoothing, cost_bps,
+        )
+    if results.empty:
+        st.warning("No parameter sets to test. Every buy-below level must be lower than a sell-above level.")
+        return
+    summary = summarize_sweep(results)
+    results.insert(0, "Stock", np.asarray(stocks)[columns][results.pop("Stock_Index").to_numpy()])
+    st.caption(f"{len(results):,} backtests over {close.shape[0]:,} bars in {elapsed:,.2f} s.")
+
+    metric = st.selectbox(
+        "Heatmap metric", ["Mean_Return", "Median_Return", "Mean_Sharpe", "Mean_Hit_Rate", "Beat_Buy_Hold"]
+    )
+    heat = summary.assign(Thresholds=summary["Lower"].map("{:g}".format) + " / " + summary["Upper"].map("{:g}".format))
+    st.subheader(f"🌡️ {metric} by RSI Window and Thresholds")
+    heatmap = alt.Chart(heat).mark_rect().encode(
+        x=alt.X("Window:O", title="RSI window"),
+        y=alt.Y("Thresholds:N", title="Buy below / sell above"),
+        color=alt.Color(f"{metric}:Q", scale=alt.Scale(scheme="redyellowgreen")),
+        tooltip=["Window", "Lower", "Upper", alt.Tooltip(f"{metric}:Q", format=",.4f"), "Stocks"]
+    ).properties(height=max(200, 25 * heat["Thresholds"].nunique()))
+    st.altair_chart(heatmap, use_container_width=True)
+
+    st.subheader("🏆 Top Parameter Sets")
+    st.dataframe(
+        summary.sort_values(metric, ascending=False).head(20).style.format({
+            "Mean_Return": "{:.2%}", "Median_Return": "{:.2%}", "Mean_Sharpe": "{:,.2f}",
+            "Mean_Hit_Rate": "{:.1%}", "Mean_Max_Drawdown": "{:.2%}", "Mean_Trades": "{:,.1f}",
+            "Beat_Buy_Hold": "{:.0%}", "Lower": "{:g}", "Upper": "{:g}",
+        }, na_rep="-"),
+        use_container_width=True, hide_index=True
+    )
+    st.download_button(
+        "📥 Download Sweep Results as CSV",
+        results.to_csv(index=False).encode("utf-8"),
+        file_name="rsi_sweep_results.csv", mime="text/csv"
+    )
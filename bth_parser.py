@@ -0,0 +1,130 @@
+# bth_parser.py
+#
+# Parser for Bloomberg BTH template workbooks. Each sheet holds side-by-side
+# stock blocks 8 columns wide: the ticker ("AC PM Equity") in row 4 and
+# Date, Open, High, Low, Close, Volume, Value from row 6 down, followed by a
+# blank separator column. Sheets are streamed once in read-only mode into a
+# 2-D array and all blocks are sliced out together by reshaping.
+
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+BTH_COLUMNS = ["Date", "Open", "High", "Low", "Close", "Volume", "Value"]
+BLOCK_WIDTH = 8
+HEADER_ROW = 4
+FIRST_DATA_ROW = 6
+MAX_WORKERS = 4
+POOL_MIN_BYTES = 4 * 1024 * 1024  # below this in total, start-up costs more than the pool saves
+
+
+def parse_bth_sheet(rows):
+    """
+    Long OHLC frame from the cell values of one BTH sheet.
+
+    Args:
+        rows (list[tuple]): cell values from row HEADER_ROW down (as from iter_rows(values_only=True))
+
+    Returns:
+        pd.DataFrame with Stock and BTH_COLUMNS (empty if the sheet has no stock blocks)
+    """
+    if not rows:
+        return pd.DataFrame(columns=["Stock"] + BTH_COLUMNS)
+    header = rows[0]
+    # Blocks continue until the first empty ticker cell
+    tickers = []
+    for col in range(0, len(header), BLOCK_WIDTH):
+        if header[col] is None:
+            break
+        tickers.append(header[col])
+    if not tickers:
+        return pd.DataFrame(columns=["Stock"] + BTH_COLUMNS)
+
+    width = len(tickers) * BLOCK_WIDTH
+    data = rows[FIRST_DATA_ROW - HEADER_ROW:]
+    values = np.full((len(data), width), None, dtype=object)
+    for i, row in enumerate(data):
+        row = row[:width]
+        values[i, :len(row)] = row
+    # (rows, stocks, fields); each block ends at its first all-empty row
+    blocks = values.reshape(len(data), len(tickers), BLOCK_WIDTH)[:, :, :len(BTH_COLUMNS)]
+    empty = np.equal(blocks, None).all(axis=2)
+    length = np.where(empty.any(axis=0), empty.argmax(axis=0), len(data))
+    keep = np.arange(len(data))[:, None] < length[None, :]
+
+    stocks = [ticker.split()[0] if isinstance(ticker, str) else ticker for ticker in tickers]
+    cells = blocks.transpose(1, 0, 2)[keep.T]
+    df = pd.DataFrame(cells, columns=BTH_COLUMNS)
+    df.insert(0, "Stock", np.repeat(np.asarray(stocks, dtype=object), length))
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+    df = df.dropna(subset=["Date"])
+    df["Date"] = df["Date"].dt.date
+    for col in BTH_COLUMNS[1:]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df.reset_index(drop=True)
+
+
+def _combine(frames):
+    """Concatenate parsed frames; a (Stock, Date) repeated across sheets or workbooks keeps its last row."""
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=["Stock"] + BTH_COLUMNS)
+    return pd.concat(frames, ignore_index=True).drop_duplicates(["Stock", "Date"], keep="last").reset_index(drop=True)
+
+
+def parse_bth_workbook(source, sheets=None):
+    """
+    Parse the BTH sheets of one workbook in a single read-only pass.
+
+    Args:
+        source: path, file object or bytes of an .xlsx workbook
+        sheets (list[str]): sheet names to parse (default: every sheet with a ticker in A4)
+
+    Returns:
+        pd.DataFrame with Stock and BTH_COLUMNS
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    frames = []
+    try:
+        for ws in wb.worksheets:
+            if sheets is not None and ws.title not in sheets:
+                continue
+            frames.append(parse_bth_sheet(list(ws.iter_rows(min_row=HEADER_ROW, values_only=True))))
+    finally:
+        wb.close()
+    return _combine(frames)
+
+
+def parse_bth_files(sources, max_workers=None):
+    """
+    Parse several BTH workbooks into one frame, one worker process per workbook.
+
+    openpyxl parsing is CPU-bound, so large uploads are spread over processes
+    rather than threads. Workers are spawned, not forked: this runs on a
+    Streamlit script thread, and forking the multi-threaded server can leave
+    the child waiting on a lock held at fork time. A single workbook, or less
+    than POOL_MIN_BYTES in total, is parsed in this process.
+
+    Args:
+        sources (list): workbook paths or bytes (picklable)
+        max_workers (int): worker processes (default: one per CPU, at most MAX_WORKERS)
+
+    Returns:
+        pd.DataFrame with Stock and BTH_COLUMNS
+    """
+    sources = list(sources)
+    workers = min(max_workers or min(os.cpu_count() or 1, MAX_WORKERS), len(sources))
+    size = sum(len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source) for source in sources)
+    if workers <= 1 or size < POOL_MIN_BYTES:
+        frames = [parse_bth_workbook(source) for source in sources]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            frames = list(pool.map(parse_bth_workbook, sources))
+    return _combine(frames)
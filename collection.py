@@ -3,6 +3,14 @@ import pandas as pd
 import os
 import tempfile
 import pdfplumber
+import altair as alt
+
+from collection_schema import COLLECTION_SCHEMAS, coerce_collection_frame, read_collection_csv, format_thousands
+from collection_forecast import forecast_monthly
+from collection_anomaly import daily_component_totals, detect_anomalies
+
+COMPONENT_AMOUNTS = ["ER_Amount", "EE_Amount", "SE_Amount", "VM_Amount", "OFW_Amount", "NWS_Amount", "Total_Amount"]
+COMPONENT_NUMBERS = ["ER_Num", "EE_Num", "SE_Num", "VM_Num", "OFW_Num", "NWS_Num", "Total_Num"]
 
 
 def extract_pdf_with_pdfplumber(file_path, plan_type):
@@ -35,38 +43,20 @@ def extract_pdf_with_pdfplumber(file_path, plan_type):
                 col_count = df.shape[1]
 
                 if plan_type == "MPF":
-                    expected_cols = 18
+                    expected_cols = len(COLLECTION_SCHEMAS["MPF"]["columns"])
                     if col_count >= expected_cols:
                         df = df.iloc[:, :expected_cols]
-                        df.columns = [
-                            "Payment_Date", "Posting_Date",
-                            "ER_Num", "ER_Amount",
-                            "SE_Num", "SE_Amount",
-                            "SE_Expanded_Num", "SE_Expanded_Amount",
-                            "VM_Num", "VM_Amount",
-                            "HH_ER_Num", "HH_ER_Amount",
-                            "OFW_Num", "OFW_Amount",
-                            "NWS_Num", "NWS_Amount",
-                            "Total_Num", "Total_Amount"
-                        ]
+                        df.columns = COLLECTION_SCHEMAS["MPF"]["columns"]
                     else:
                         raise ValueError(
                             f"Page {page_num}: Expected at least {expected_cols} columns for MPF, but got {col_count}."
                         )
 
                 elif plan_type == "NVPF":
-                    expected_cols = 14
+                    expected_cols = len(COLLECTION_SCHEMAS["NVPF"]["columns"])
                     if col_count >= expected_cols:
                         df = df.iloc[:, :expected_cols]
-                        df.columns = [
-                            "Payment_Date", "Posting_Date",
-                            "EE_Num", "EE_Amount",
-                            "SE_Num", "SE_Amount",
-                            "VM_Num", "VM_Amount",
-                            "OFW_Num", "OFW_Amount",
-                            "NWS_Num", "NWS_Amount",
-                            "Total_Num", "Total_Amount"
-                        ]
+                        df.columns = COLLECTION_SCHEMAS["NVPF"]["columns"]
                     else:
                         raise ValueError(
                             f"Page {page_num}: Expected at least {expected_cols} columns for NVPF, but got {col_count}."
@@ -88,6 +78,76 @@ def extract_pdf_with_pdfplumber(file_path, plan_type):
         raise RuntimeError(f"Error processing PDF with pdfplumber: {e}")
 
 
+def monthly_component_sums(df):
+    """Monthly sums of every ER/EE/SE/VM/OFW/NWS/Total amount and number column present."""
+    cols = [col for col in COMPONENT_AMOUNTS + COMPONENT_NUMBERS if col in df.columns]
+    month = df["Payment_Date"].dt.to_period("M").dt.to_timestamp()
+    return df.groupby(month.rename("Month"))[cols].sum()
+
+
+@st.cache_data(show_spinner=False)
+def cached_forecast(panel, horizon, level):
+    return forecast_monthly(panel, horizon=horizon, level=level)
+
+
+def show_forecast_report(monthly_series, plan_type):
+    st.title("Collection Forecast")
+    horizon = st.sidebar.slider("Forecast horizon (months):", 12, 24, 12)
+    level = st.sidebar.selectbox("Prediction interval:", (0.8, 0.9, 0.95), index=2, format_func=lambda x: f"{x:.0%}")
+
+    panels = {plan_type: monthly_series.set_index("Month").drop(columns="Month_str")}
+    other_plan = "NVPF" if plan_type == "MPF" else "MPF"
+    other_path = f"{other_plan}_Collection.csv"
+    if os.path.exists(other_path) and st.sidebar.checkbox(f"Include {other_plan} (default dataset)", value=True):
+        other_df = read_collection_csv(other_path, other_plan)
+        panels[other_plan] = monthly_component_sums(other_df[other_df["Payment_Date"].notna()].assign(
+            Total_Num=lambda d: d["Total_Num"].abs(), Total_Amount=lambda d: d["Total_Amount"].abs()
+        ))
+
+    # Every component of every plan goes into one panel and is fitted in one batch
+    panel = pd.concat(panels, axis=1).astype("float64")
+    panel.columns = [f"{plan} {col}" for plan, col in panel.columns]
+    forecast_df, params_df = cached_forecast(panel, horizon, level)
+
+    series = st.sidebar.selectbox("Series to chart:", panel.columns.tolist(),
+                                  index=panel.columns.get_loc(f"{plan_type} Total_Amount") if f"{plan_type} Total_Amount" in panel.columns else 0)
+    history = panel[series].rename("Actual")
+    projected = forecast_df[forecast_df["Series"] == series].set_index("Month")
+    chart_df = pd.concat([history, projected[["Forecast", "Lower", "Upper"]]], axis=1)
+    chart_df.index = chart_df.index.strftime("%Y-%m")
+    st.subheader(f"{series}: {horizon}-month projection ({level:.0%} interval)")
+    st.line_chart(chart_df)
+
+    wide = forecast_df.pivot(index="Month", columns="Series", values="Forecast")[panel.columns]
+    wide.index = wide.index.strftime("%Y-%m")
+    st.subheader("Projected Monthly Collections (all series)")
+    st.dataframe(wide.style.format("{:,.0f}"))
+
+    st.subheader("Fitted Smoothing Parameters")
+    st.dataframe(params_df.style.format({"Alpha": "{:.2f}", "Beta": "{:.2f}", "Gamma": "{:.2f}", "Sigma": "{:,.0f}"}))
+
+    export = forecast_df.assign(Month=forecast_df["Month"].dt.strftime("%Y-%m"))
+    st.download_button(
+        "Download Forecast as CSV (for liquidity planning)",
+        data=export.to_csv(index=False).encode("utf-8"),
+        file_name="collection_forecast.csv", mime="text/csv"
+    )
+
+
+def collection_anomalies(result_df, cols, plan_type):
+    """
+    Daily anomaly flags for the loaded dataset. The previous result is kept in
+    session state so newly ingested days are scored without redoing the history.
+    """
+    window = st.sidebar.slider("Anomaly window (payment days):", 21, 252, 63)
+    threshold = st.sidebar.slider("Anomaly threshold (|z|):", 2.0, 8.0, 3.5, 0.5)
+    daily = daily_component_totals(result_df, cols)
+    store = st.session_state.setdefault("collection_anomalies", {})
+    result = detect_anomalies(daily, window=window, threshold=threshold, previous=store.get(plan_type))
+    store[plan_type] = result
+    return result
+
+
 def show_collection_page():
     st.sidebar.header("Data Source Selection")
     data_source = st.sidebar.radio("Select Data Source:", ("Raw PDF Files", "Processed Dataset"))
@@ -115,7 +175,7 @@ def show_collection_page():
                     st.sidebar.error(f"Error reading {uploaded_file.name}: {e}")
 
             if dfs:
-                result_df = pd.concat(dfs, ignore_index=True)
+                result_df = coerce_collection_frame(pd.concat(dfs, ignore_index=True), plan_type)
 
     elif data_source == "Processed Dataset":
         st.sidebar.subheader("Clean Processed Dataset Selection")
@@ -125,16 +185,16 @@ def show_collection_page():
         if uploaded_processed:
             try:
                 if uploaded_processed.name.lower().endswith(".csv"):
-                    result_df = pd.read_csv(uploaded_processed)
+                    result_df = read_collection_csv(uploaded_processed, plan_type)
                 else:
-                    result_df = pd.read_excel(uploaded_processed)
+                    result_df = coerce_collection_frame(pd.read_excel(uploaded_processed), plan_type)
             except Exception as e:
                 st.sidebar.error(f"Error reading processed dataset: {e}")
         else:
             default_path = "MPF_Collection.csv" if plan_type == "MPF" else "NVPF_Collection.csv"
             if os.path.exists(default_path):
                 try:
-                    result_df = pd.read_csv(default_path)
+                    result_df = read_collection_csv(default_path, plan_type)
                     st.sidebar.info(f"Loaded default dataset: {os.path.basename(default_path)}")
                 except Exception as e:
                     st.sidebar.error(f"Error reading default dataset: {e}")
@@ -142,34 +202,20 @@ def show_collection_page():
                 st.sidebar.error("Default dataset not found.")
 
     if result_df is not None:
-        # Convert and format dates
-        if "Payment_Date" in result_df.columns:
-            result_df["Payment_Date"] = pd.to_datetime(result_df["Payment_Date"], errors="coerce").dt.strftime("%Y-%m-%d")
-        if "Posting_Date" in result_df.columns:
-            result_df["Posting_Date"] = pd.to_datetime(result_df["Posting_Date"], errors="coerce").dt.strftime("%Y-%m-%d")
-        result_df = result_df[result_df["Payment_Date"].notna()]
+        # Dates and numbers are already typed by the collection schema
+        result_df = result_df[result_df["Payment_Date"].notna()].copy()
+        for col in ["Total_Num", "Total_Amount"]:
+            if col in result_df.columns:
+                result_df[col] = result_df[col].abs()
 
         show_data = st.sidebar.radio("Display Data?", ("No", "Yes"))
         if show_data == "Yes":
             st.title("Loaded Dataset")
-            display_df = result_df.copy()
-            numeric_cols = display_df.select_dtypes(include=["number"]).columns
-            for col in numeric_cols:
-                display_df[col] = display_df[col].apply(lambda x: f"{x:,.0f}" if pd.notnull(x) else "")
-            st.dataframe(display_df)
-
-        non_numeric = ["Payment_Date", "Posting_Date"]
-        numeric_cols = [col for col in result_df.columns if col not in non_numeric + ["Month"]]
-        if numeric_cols:
-            result_df[numeric_cols] = result_df[numeric_cols].replace({",": ""}, regex=True)
-            result_df[numeric_cols] = result_df[numeric_cols].apply(pd.to_numeric, errors="coerce")
-            if "Total_Num" in result_df.columns:
-                result_df["Total_Num"] = result_df["Total_Num"].abs()
-            if "Total_Amount" in result_df.columns:
-                result_df["Total_Amount"] = result_df["Total_Amount"].abs()
+            date_fmt = {col: "{:%Y-%m-%d}" for col in ["Payment_Date", "Posting_Date"] if col in result_df.columns}
+            st.dataframe(result_df.style.format({**format_thousands(result_df), **date_fmt}, na_rep=""))
 
         if "Month" not in result_df.columns and "Payment_Date" in result_df.columns:
-            result_df["Month"] = pd.to_datetime(result_df["Payment_Date"]).dt.to_period("M").dt.to_timestamp()
+            result_df["Month"] = result_df["Payment_Date"].dt.to_period("M").dt.to_timestamp()
 
         if "Total_Num" in result_df.columns and "Total_Amount" in result_df.columns:
             monthly_totals = result_df.groupby("Month")[['Total_Num', 'Total_Amount']].sum().reset_index()
@@ -178,8 +224,6 @@ def show_collection_page():
             for col in ['Total_Num', 'Total_Amount']:
                 monthly_totals[col] = monthly_totals[col].round(0).astype('Int64')
             display_monthly = monthly_totals.copy()
-            display_monthly['Total_Num'] = display_monthly['Total_Num'].apply(lambda x: f"{x:,}" if pd.notnull(x) else "")
-            display_monthly['Total_Amount'] = display_monthly['Total_Amount'].apply(lambda x: f"{x:,}" if pd.notnull(x) else "")
         else:
             monthly_totals = None
             display_monthly = None
@@ -187,20 +231,21 @@ def show_collection_page():
         show_monthly = st.sidebar.radio("Display Monthly Totals?", ("No", "Yes"))
         if show_monthly == "Yes" and display_monthly is not None:
             st.title("Monthly Totals")
-            st.table(display_monthly[['Month_str', 'Total_Num', 'Total_Amount']].rename(columns={'Month_str': 'Month'}))
+            monthly_table = display_monthly[['Month_str', 'Total_Num', 'Total_Amount']].rename(columns={'Month_str': 'Month'})
+            st.table(monthly_table.style.format(format_thousands(monthly_table), na_rep=""))
 
         overall_nums = int(result_df["Total_Num"].sum().round(0)) if "Total_Num" in result_df.columns else None
         overall_amount = int(result_df["Total_Amount"].sum().round(0)) if "Total_Amount" in result_df.columns else None
 
-        amount_cols = [col for col in ["ER_Amount", "EE_Amount", "SE_Amount", "VM_Amount", "OFW_Amount", "NWS_Amount", "Total_Amount"] if col in result_df.columns]
-        number_cols = [col for col in ["ER_Num", "EE_Num", "SE_Num", "VM_Num", "OFW_Num", "NWS_Num", "Total_Num"] if col in result_df.columns]
+        amount_cols = [col for col in COMPONENT_AMOUNTS if col in result_df.columns]
+        number_cols = [col for col in COMPONENT_NUMBERS if col in result_df.columns]
         if (amount_cols + number_cols) and ("Month" in result_df.columns):
             monthly_series = result_df.groupby("Month")[amount_cols + number_cols].sum().reset_index()
             monthly_series['Month_str'] = monthly_series['Month'].dt.strftime("%Y-%m")
         else:
             monthly_series = None
 
-        report_type = st.sidebar.radio("Select Report:", ("Totals", "Comparative Line Chart", "Statistics"))
+        report_type = st.sidebar.radio("Select Report:", ("Totals", "Comparative Line Chart", "Statistics", "Forecast"))
 
         if report_type == "Totals":
             st.title("Aggregate Totals")
@@ -215,10 +260,33 @@ def show_collection_page():
             chart_group = st.sidebar.selectbox("Choose Value Type:", ("Amount", "Number"))
             if chart_group == "Amount":
                 selected_cols = st.sidebar.multiselect("Select Amount Columns:", amount_cols, default=amount_cols)
-                chart_df = monthly_series.set_index("Month_str")[selected_cols]
-                st.line_chart(chart_df)
             else:
                 selected_cols = st.sidebar.multiselect("Select Number Columns:", number_cols, default=number_cols)
+
+            if st.sidebar.checkbox("Show daily totals with flagged anomalies") and selected_cols:
+                anomalies = collection_anomalies(result_df, selected_cols, plan_type)
+                daily_long = anomalies["daily"].reset_index().melt(
+                    id_vars="Payment_Date", var_name="Component", value_name="Value"
+                )
+                lines = alt.Chart(daily_long).mark_line(strokeWidth=1).encode(
+                    x=alt.X("Payment_Date:T", title="Payment Date"),
+                    y=alt.Y("Value:Q", title=chart_group, axis=alt.Axis(format=",.0f")),
+                    color="Component:N"
+                )
+                points = alt.Chart(anomalies["flags"]).mark_point(color="red", size=60, filled=True).encode(
+                    x="Payment_Date:T",
+                    y="Value:Q",
+                    tooltip=[
+                        alt.Tooltip("Payment_Date:T", title="Date"),
+                        "Component:N",
+                        alt.Tooltip("Value:Q", format=",.0f"),
+                        alt.Tooltip("Expected:Q", format=",.0f"),
+                        alt.Tooltip("Z_Score:Q", format="+.1f"),
+                    ]
+                )
+                st.altair_chart((lines + points).interactive().properties(height=450), use_container_width=True)
+                st.caption(f"{len(anomalies['flags']):,} flagged component-days shown in red.")
+            else:
                 chart_df = monthly_series.set_index("Month_str")[selected_cols]
                 st.line_chart(chart_df)
 
@@ -226,9 +294,7 @@ def show_collection_page():
             st.title("Yearly and Monthly Statistics")
             monthly_totals['Year'] = pd.to_datetime(monthly_totals['Month_str']).dt.year
             yearly_avg = monthly_totals.groupby('Year')[['Total_Num', 'Total_Amount']].mean().reset_index()
-            yearly_avg['Avg_Num'] = yearly_avg['Total_Num'].apply(lambda x: f"{x:,.2f}")
-            yearly_avg['Avg_Amount'] = yearly_avg['Total_Amount'].apply(lambda x: f"{x:,.2f}")
-            yearly_avg_df = yearly_avg[['Year', 'Avg_Num', 'Avg_Amount']]
+            yearly_avg_df = yearly_avg.rename(columns={'Total_Num': 'Avg_Num', 'Total_Amount': 'Avg_Amount'})
 
             min_num = monthly_totals['Total_Num'].min()
             max_num = monthly_totals['Total_Num'].max()
@@ -241,10 +307,26 @@ def show_collection_page():
             })
 
             st.subheader("Yearly Averages")
-            st.table(yearly_avg_df)
+            st.table(yearly_avg_df.style.format({'Avg_Num': "{:,.2f}", 'Avg_Amount': "{:,.2f}"}))
             st.subheader("Monthly Min/Max")
             st.table(min_max_df)
 
+            st.subheader("Daily Anomalies")
+            anomaly_cols = st.sidebar.multiselect("Anomaly components:", amount_cols + number_cols, default=amount_cols)
+            if anomaly_cols:
+                flags = collection_anomalies(result_df, anomaly_cols, plan_type)["flags"]
+                st.dataframe(flags.style.format({
+                    "Payment_Date": "{:%Y-%m-%d}", "Value": "{:,.0f}", "Expected": "{:,.0f}", "Z_Score": "{:+.1f}"
+                }))
+                st.download_button(
+                    "Download Anomalies as CSV",
+                    data=flags.assign(Payment_Date=flags["Payment_Date"].dt.strftime("%Y-%m-%d")).to_csv(index=False).encode("utf-8"),
+                    file_name=f"{plan_type.lower()}_collection_anomalies.csv", mime="text/csv"
+                )
+
+        elif report_type == "Forecast" and (monthly_series is not None):
+            show_forecast_report(monthly_series, plan_type)
+
         else:
             st.write("Selected report or data not available.")
     else:
@@ -0,0 +1,158 @@
+# collection_forecast.py
+
+import numpy as np
+import pandas as pd
+
+# Smoothing grid searched for every series at once
+ALPHAS = np.array([0.05, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.8])
+BETAS = np.array([0.0, 0.02, 0.05, 0.1, 0.2])
+GAMMAS = np.array([0.0, 0.05, 0.1, 0.2, 0.4])
+Z_SCORES = {0.8: 1.2816, 0.9: 1.6449, 0.95: 1.9600, 0.99: 2.5758}
+
+
+def _param_grid(seasonal):
+    gammas = GAMMAS if seasonal else np.array([0.0])
+    a, b, g = np.meshgrid(ALPHAS, BETAS, gammas, indexing="ij")
+    return a.reshape(-1, 1), b.reshape(-1, 1), g.reshape(-1, 1)
+
+
+def _mean(block):
+    """Column means ignoring NaN; NaN (without a warning) for a column with no values."""
+    count = (~np.isnan(block)).sum(axis=0)
+    return np.where(count > 0, np.nansum(block, axis=0) / np.maximum(count, 1), np.nan)
+
+
+def _initial_state(Y, m):
+    """
+    Level, trend and seasonal indices of each series from its own first two
+    seasons, counted from its first observed month (first two points without
+    season). A series with less than two seasons after its start gets no
+    seasonal indices.
+
+    Returns:
+        level (S,), trend (S,), season (S, m), start (S,) first observed row,
+        seasonal (S,) bool
+    """
+    T, S = Y.shape
+    observed = ~np.isnan(Y)
+    start = np.where(observed.any(axis=0), observed.argmax(axis=0), T)
+    span = max(2 * m, 2)
+    rows = start[None, :] + np.arange(span)[:, None]
+    window = np.where(rows < T, Y[np.minimum(rows, T - 1), np.arange(S)], np.nan)  # (span, S)
+
+    # Without season: first point and the step to the second
+    level = window[0]
+    trend = window[1] - window[0]
+    season = np.zeros((S, m))
+    seasonal = np.zeros(S, dtype=bool)
+    if m > 1:
+        seasonal = start + 2 * m <= T
+        first = _mean(window[:m])
+        second = _mean(window[m:])
+        level = np.where(seasonal, first, level)
+        trend = np.where(seasonal, (second - first) / m, trend)
+        # Row i of the window is month start + i, i.e. season slot (start + i) % m
+        slots = (rows[:m] % m).T
+        deviations = np.nan_to_num(window[:m] - first).T
+        season[np.arange(S)[:, None], slots] = np.where(seasonal[:, None], deviations, 0.0)
+    return np.nan_to_num(level), np.nan_to_num(trend), season, start, seasonal
+
+
+def _run_filter(Y, alpha, beta, gamma, m):
+    """
+    Additive Holt-Winters filter for G parameter sets x S series in one pass over time.
+
+    Each series is filtered from its first observed month; its state is held
+    until then.
+
+    Returns:
+        sse (G, S), n_obs (S,), final level (G, S), trend (G, S), season (G, S, m),
+        seasonal (S,) whether the series had two seasons to fit seasonality on
+    """
+    T, S = Y.shape
+    G = alpha.shape[0]
+    level0, trend0, season0, start, seasonal = _initial_state(Y, m)
+    level = np.broadcast_to(level0, (G, S)).copy()
+    trend = np.broadcast_to(trend0, (G, S)).copy()
+    season = np.broadcast_to(season0, (G, S, m)).copy()
+    sse = np.zeros((G, S))
+    observed = ~np.isnan(Y)
+
+    for t in range(T):
+        slot = t % m
+        forecast = level + trend + season[:, :, slot]
+        # Missing months: carry the forecast forward (zero error)
+        error = np.where(observed[t], Y[t] - forecast, 0.0)
+        sse += error ** 2
+        level_new = np.where(t >= start, level + trend + alpha * error, level)
+        trend = trend + alpha * beta * error
+        season[:, :, slot] = season[:, :, slot] + gamma * error
+        level = level_new
+    return sse, observed.sum(axis=0), level, trend, season, seasonal
+
+
+def forecast_monthly(panel, horizon=12, season_length=12, level=0.95):
+    """
+    Fit additive Holt-Winters models to every column of a monthly panel at once.
+
+    Each series gets the smoothing parameters with the lowest in-sample
+    one-step squared error from a fixed grid; all grid points and series are
+    filtered together as (grid x series) arrays. Each series is initialised
+    and scored from its own first observed month, so panels of series that
+    start on different dates can be fitted together; a series with less than
+    two seasons from its start is fitted without seasonality.
+
+    Args:
+        panel (pd.DataFrame): month-start DatetimeIndex, one column per series
+        horizon (int): months to project
+        season_length (int): months per season
+        level (float): prediction interval coverage (0.8, 0.9, 0.95 or 0.99)
+
+    Returns:
+        forecast_df (pd.DataFrame): Series, Month, Forecast, Lower, Upper (long form)
+        params_df (pd.DataFrame): Series, Alpha, Beta, Gamma, Sigma per series
+    """
+    panel = panel.sort_index().asfreq("MS")
+    Y = panel.to_numpy(dtype="float64")
+    T, S = Y.shape
+    m = season_length if T >= 2 * season_length else 1
+    alpha, beta, gamma = _param_grid(m > 1)
+
+    sse, n_obs, level_T, trend_T, season_T, seasonal = _run_filter(Y, alpha, beta, gamma, m)
+    # Series without two seasons of their own are fitted without seasonality
+    best = np.argmin(np.where((gamma > 0) & ~seasonal, np.inf, sse), axis=0)
+    cols = np.arange(S)
+    a, b, g = alpha[best, 0], beta[best, 0], gamma[best, 0]
+    n_params = 3 + np.where(seasonal, m, 0)
+    sigma = np.sqrt(sse[best, cols] / np.maximum(n_obs - n_params, 1))
+
+    steps = np.arange(1, horizon + 1)
+    slots = (T + steps - 1) % m
+    point = (
+        level_T[best, cols][None, :]
+        + steps[:, None] * trend_T[best, cols][None, :]
+        + season_T[best, cols][:, slots].T
+    )
+
+    # Variance of the h-step error: sigma^2 * (1 + sum_{j<h} c_j^2)
+    j = np.arange(1, horizon)[:, None]
+    c = a[None, :] * (1 + j * b[None, :]) + g[None, :] * ((j % m) == 0)
+    var_factor = 1 + np.concatenate([np.zeros((1, S)), np.cumsum(c ** 2, axis=0)])
+    spread = Z_SCORES.get(level, 1.96) * sigma[None, :] * np.sqrt(var_factor)
+
+    months = pd.date_range(panel.index[-1] + pd.offsets.MonthBegin(1), periods=horizon, freq="MS")
+    forecast_df = pd.DataFrame({
+        "Series": np.tile(panel.columns.to_numpy(), horizon),
+        "Month": np.repeat(months, S),
+        "Forecast": np.clip(point, 0, None).reshape(-1),
+        "Lower": np.clip(point - spread, 0, None).reshape(-1),
+        "Upper": np.clip(point + spread, 0, None).reshape(-1),
+    })
+    params_df = pd.DataFrame({
+        "Series": panel.columns,
+        "Alpha": a,
+        "Beta": b,
+        "Gamma": g,
+        "Sigma": sigma,
+    })
+    return forecast_df, params_df
@@ -0,0 +1,140 @@
+# collection_reconcile.py
+
+import numpy as np
+import pandas as pd
+
+STATUS_MATCHED = "Matched"
+STATUS_PARTIAL = "Partial"
+STATUS_CMD_ONLY = "Unmatched (CMD only)"
+STATUS_COLLECTION_ONLY = "Unmatched (Collection only)"
+
+
+def wisp_daily_amounts(wisp_df, date_col="Run Date", cumulative=True):
+    """
+    One CMD amount per date from the parsed WISP tracker.
+
+    Args:
+        wisp_df (pd.DataFrame): output of load_wisp_tracker
+        date_col (str): "Run Date" or "Payment Date"
+        cumulative (bool): WISP rows are running totals within each Applicable Month
+
+    Returns:
+        pd.DataFrame with Date, Amount_CMD
+    """
+    df = wisp_df.dropna(subset=[date_col]).sort_values(["Applicable Month", date_col], kind="stable")
+    amounts = df["Amount"]
+    if cumulative:
+        amounts = amounts.groupby(df["Applicable Month"]).diff().fillna(amounts)
+    return (
+        pd.DataFrame({"Date": df[date_col].to_numpy(), "Amount_CMD": amounts.to_numpy()})
+        .groupby("Date", as_index=False)["Amount_CMD"].sum()
+    )
+
+
+def collection_daily_amounts(mpf_df, date_col="Posting_Date"):
+    """One collection-report amount per date (Total_Amount summed)."""
+    df = mpf_df.dropna(subset=[date_col])
+    return (
+        df.groupby(df[date_col].dt.normalize())["Total_Amount"].sum()
+        .rename_axis("Date")
+        .reset_index(name="Amount_Collection")
+    )
+
+
+def _within_tolerance(cmd_amount, collection_amount, amount_tolerance, pct_tolerance):
+    limit = np.maximum(amount_tolerance, pct_tolerance * np.abs(cmd_amount))
+    return np.abs(collection_amount - cmd_amount) <= limit
+
+
+def _match_pass(cmd, coll, lag, amount_check):
+    """Pair the still-unmatched items exactly `lag` days apart; returns (cmd_id, coll_id) pairs."""
+    if cmd.empty or coll.empty:
+        return pd.DataFrame(columns=["_cmd_id", "_coll_id"])
+    pairs = cmd.assign(_day=cmd["Date_CMD"].dt.normalize() + pd.Timedelta(days=lag)).merge(
+        coll.assign(_day=coll["Date_Collection"].dt.normalize()), on="_day"
+    )
+    if amount_check is not None:
+        pairs = pairs[amount_check(pairs["Amount_CMD"], pairs["Amount_Collection"])]
+    # Repeated dates on either side: each item is claimed once, by the closest amount
+    pairs = (
+        pairs.assign(_gap=(pairs["Amount_Collection"] - pairs["Amount_CMD"]).abs())
+        .sort_values(["_gap", "_cmd_id", "_coll_id"], kind="stable")
+        .drop_duplicates("_cmd_id")
+        .drop_duplicates("_coll_id")
+    )
+    return pairs[["_cmd_id", "_coll_id"]]
+
+
+def reconcile_daily(cmd_df, collection_df, date_tolerance_days=0, amount_tolerance=0.0, pct_tolerance=0.0):
+    """
+    Match CMD amounts to collection amounts by date within a tolerance.
+
+    Candidates are the pairs exactly k days apart, taken one offset at a
+    time over the still-unmatched items: lag 0 (same date) first, then
+    -1, +1, ..., -N, +N (collection before CMD first). Pairs whose amounts
+    agree are taken in a first round over every offset, so a matching amount
+    a day away wins over a wrong amount on the same date; the remaining items
+    are then paired on date alone (partials).
+
+    Args:
+        cmd_df (pd.DataFrame): Date, Amount_CMD
+        collection_df (pd.DataFrame): Date, Amount_Collection
+        date_tolerance_days (int): maximum distance between matched dates
+        amount_tolerance (float): absolute difference still counted as a match
+        pct_tolerance (float): relative difference (of Amount_CMD) still counted as a match
+
+    Returns:
+        pd.DataFrame with Date_CMD, Date_Collection, Amount_CMD, Amount_Collection,
+        Difference, Lag_Days and Status, sorted by date
+    """
+    cmd = cmd_df.rename(columns={"Date": "Date_CMD"}).sort_values("Date_CMD").reset_index(drop=True)
+    coll = collection_df.rename(columns={"Date": "Date_Collection"}).sort_values("Date_Collection").reset_index(drop=True)
+    cmd["_cmd_id"] = np.arange(len(cmd))
+    coll["_coll_id"] = np.arange(len(coll), dtype="float64")
+
+    def amounts_agree(cmd_amount, collection_amount):
+        return _within_tolerance(cmd_amount, collection_amount, amount_tolerance, pct_tolerance)
+
+    lags = [0] + [lag for k in range(1, date_tolerance_days + 1) for lag in (-k, k)]
+    found = []
+    cmd_left, coll_left = cmd, coll
+    for amount_check in (amounts_agree, None):
+        for lag in lags:
+            pairs = _match_pass(cmd_left, coll_left, lag, amount_check)
+            if pairs.empty:
+                continue
+            found.append(pairs)
+            cmd_left = cmd_left[~cmd_left["_cmd_id"].isin(pairs["_cmd_id"])]
+            coll_left = coll_left[~coll_left["_coll_id"].isin(pairs["_coll_id"])]
+
+    pairs = pd.concat(found, ignore_index=True) if found else pd.DataFrame(columns=["_cmd_id", "_coll_id"])
+    result = (
+        cmd.merge(pairs, on="_cmd_id", how="left")
+        .merge(coll, on="_coll_id", how="outer")
+    )
+    result["Lag_Days"] = (result["Date_Collection"] - result["Date_CMD"]).dt.days
+    result["Difference"] = result["Amount_Collection"] - result["Amount_CMD"]
+    result["Status"] = np.select(
+        [
+            result["Date_Collection"].isna(),
+            result["Date_CMD"].isna(),
+            amounts_agree(result["Amount_CMD"], result["Amount_Collection"]),
+        ],
+        [STATUS_CMD_ONLY, STATUS_COLLECTION_ONLY, STATUS_MATCHED],
+        default=STATUS_PARTIAL,
+    )
+    result["Sort_Date"] = result["Date_CMD"].fillna(result["Date_Collection"])
+    result = result.sort_values("Sort_Date", kind="stable").reset_index(drop=True)
+    return result[["Date_CMD", "Date_Collection", "Amount_CMD", "Amount_Collection", "Difference", "Lag_Days", "Status"]]
+
+
+def summarize_reconciliation(result):
+    """Count and amount totals per status."""
+    summary = result.groupby("Status").agg(
+        Items=("Status", "size"),
+        Amount_CMD=("Amount_CMD", "sum"),
+        Amount_Collection=("Amount_Collection", "sum"),
+        Difference=("Difference", "sum"),
+    )
+    order = [STATUS_MATCHED, STATUS_PARTIAL, STATUS_CMD_ONLY, STATUS_COLLECTION_ONLY]
+    return summary.reindex([s for s in order if s in summary.index]).reset_index()
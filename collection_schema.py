@@ -0,0 +1,208 @@
+# collection_schema.py
+
+import io
+import re
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow is optional; fall back to the pandas reader
+    pa = None
+
+
+# --- Collection layouts ---
+# Column order matches the tables printed on the MPF/NVPF collection PDFs.
+COLLECTION_SCHEMAS = {
+    "MPF": {
+        "dates": ["Payment_Date", "Posting_Date"],
+        "counts": ["ER_Num", "SE_Num", "SE_Expanded_Num", "VM_Num", "HH_ER_Num", "OFW_Num", "NWS_Num", "Total_Num"],
+        "amounts": ["ER_Amount", "SE_Amount", "SE_Expanded_Amount", "VM_Amount", "HH_ER_Amount", "OFW_Amount", "NWS_Amount", "Total_Amount"],
+        "columns": [
+            "Payment_Date", "Posting_Date",
+            "ER_Num", "ER_Amount",
+            "SE_Num", "SE_Amount",
+            "SE_Expanded_Num", "SE_Expanded_Amount",
+            "VM_Num", "VM_Amount",
+            "HH_ER_Num", "HH_ER_Amount",
+            "OFW_Num", "OFW_Amount",
+            "NWS_Num", "NWS_Amount",
+            "Total_Num", "Total_Amount"
+        ],
+    },
+    "NVPF": {
+        "dates": ["Payment_Date", "Posting_Date"],
+        "counts": ["EE_Num", "SE_Num", "VM_Num", "OFW_Num", "NWS_Num", "Total_Num"],
+        "amounts": ["EE_Amount", "SE_Amount", "VM_Amount", "OFW_Amount", "NWS_Amount", "Total_Amount"],
+        "columns": [
+            "Payment_Date", "Posting_Date",
+            "EE_Num", "EE_Amount",
+            "SE_Num", "SE_Amount",
+            "VM_Num", "VM_Amount",
+            "OFW_Num", "OFW_Amount",
+            "NWS_Num", "NWS_Amount",
+            "Total_Num", "Total_Amount"
+        ],
+    },
+}
+
+THOUSANDS_SEPARATOR = ","
+CURRENCY_SYMBOLS = ["₱", "PHP", "Php", "$"]
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d-%b-%y", "%d-%b-%Y", "%Y-%m-%d %H:%M:%S"]
+
+# Everything that may wrap a number in the source files: separators, currency, blanks
+_NOISE_PATTERN = "|".join(
+    [re.escape(THOUSANDS_SEPARATOR), r"\s"] + [re.escape(sym) for sym in CURRENCY_SYMBOLS]
+)
+_NUMBER_PATTERN = r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$"
+
+
+def detect_plan(columns):
+    """Guess the plan layout ("MPF" or "NVPF") from a set of column names."""
+    columns = set(columns)
+    if "ER_Amount" in columns or "ER_Num" in columns:
+        return "MPF"
+    if "EE_Amount" in columns or "EE_Num" in columns:
+        return "NVPF"
+    return None
+
+
+def numeric_columns(plan_type, columns=None):
+    """Counts and amounts declared for a plan, optionally limited to `columns`."""
+    schema = COLLECTION_SCHEMAS.get(plan_type)
+    if schema is None:
+        declared = ["Total_Num", "Total_Amount"]
+    else:
+        declared = schema["counts"] + schema["amounts"]
+    if columns is None:
+        return declared
+    return [col for col in declared if col in columns]
+
+
+def coerce_collection_frame(df, plan_type=None):
+    """
+    Convert an already-loaded collection frame (PDF extract, Excel upload)
+    to the declared dtypes: dates -> datetime64, *_Num -> Int64, *_Amount -> float64.
+
+    Args:
+        df (pd.DataFrame): Frame with MPF/NVPF column names
+        plan_type (str): "MPF", "NVPF" or None to detect from the columns
+
+    Returns:
+        pd.DataFrame
+    """
+    plan_type = plan_type or detect_plan(df.columns)
+    df = df.copy()
+
+    for col in ["Payment_Date", "Posting_Date"]:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            # Parse distinct strings once; extracts repeat the same dates many times
+            uniques = pd.Series(df[col].dropna().unique())
+            parsed = uniques.map(lambda v: pd.to_datetime(v, errors="coerce"))
+            df[col] = df[col].map(dict(zip(uniques, parsed))).astype("datetime64[ns]")
+
+    for col in numeric_columns(plan_type, df.columns):
+        values = df[col]
+        if not pd.api.types.is_numeric_dtype(values):
+            values = values.astype("string").str.replace(_NOISE_PATTERN, "", regex=True)
+        values = pd.to_numeric(values, errors="coerce")
+        if col.endswith("_Num"):
+            df[col] = values.round(0).astype("Int64")
+        else:
+            df[col] = values.astype("float64")
+    return df
+
+
+def _read_bytes(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    data = source.read()
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return data
+
+
+def _arrow_numbers(column, is_count):
+    """Strip separators/currency from a string column and cast it in one pass."""
+    cleaned = pc.replace_substring_regex(column, pattern=_NOISE_PATTERN, replacement="")
+    valid = pc.match_substring_regex(cleaned, pattern=_NUMBER_PATTERN)
+    cleaned = pc.if_else(valid, cleaned, pa.scalar(None, pa.string()))
+    values = pc.cast(cleaned, pa.float64())
+    if is_count:
+        values = pc.round(values)
+    return values
+
+
+def _arrow_dates(column):
+    """Parse a string column against the known date formats, first match wins."""
+    parsed = [
+        pc.strptime(column, format=fmt, unit="s", error_is_null=True)
+        for fmt in DATE_FORMATS
+    ]
+    values = pc.coalesce(*parsed).to_pandas().astype("datetime64[ns]")
+    unparsed = values.isna() & column.is_valid().to_pandas()
+    if unparsed.any():
+        # Unusual formats: let pandas try only the cells arrow could not parse
+        raw = column.to_pandas()[unparsed]
+        values[unparsed] = raw.map(lambda v: pd.to_datetime(v, errors="coerce"))
+    return values
+
+
+def read_collection_csv(source, plan_type=None):
+    """
+    Load a processed MPF/NVPF collection CSV straight into typed columns.
+
+    Numbers with thousands separators or currency symbols and the date columns
+    are converted while reading, so pages never clean the columns again.
+
+    Args:
+        source: Path, bytes or an uploaded file object
+        plan_type (str): "MPF", "NVPF" or None to detect from the header
+
+    Returns:
+        pd.DataFrame with datetime64 dates, Int64 counts and float64 amounts
+    """
+    data = _read_bytes(source)
+    header = pd.read_csv(io.BytesIO(data), nrows=0).columns.str.strip().tolist()
+    plan_type = plan_type or detect_plan(header)
+    numbers = numeric_columns(plan_type, header)
+    dates = [col for col in ["Payment_Date", "Posting_Date"] if col in header]
+
+    if pa is None:
+        df = pd.read_csv(io.BytesIO(data), dtype={col: str for col in numbers + dates})
+        df.columns = df.columns.str.strip()
+        return coerce_collection_frame(df, plan_type)
+
+    table = pa_csv.read_csv(
+        io.BytesIO(data),
+        read_options=pa_csv.ReadOptions(column_names=header, skip_rows=1),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in numbers + dates},
+            strings_can_be_null=True,
+        ),
+    )
+
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if name in dates:
+            columns[name] = _arrow_dates(column)
+        elif name in numbers:
+            values = _arrow_numbers(column, name.endswith("_Num")).to_pandas()
+            columns[name] = values.astype("Int64") if name.endswith("_Num") else values
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns, columns=table.column_names)
+
+
+def format_thousands(df, decimals=0):
+    """Styler formatter for every numeric column of `df`."""
+    cols = df.select_dtypes(include="number").columns
+    return {col: f"{{:,.{decimals}f}}" for col in cols}
@@ -1,9 +1,99 @@
 # collection_tracker.py
 
+import hashlib
+import io
+import pickle
+
+import openpyxl
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 
+from collection_schema import read_collection_csv
+from collection_reconcile import (
+    wisp_daily_amounts, collection_daily_amounts, reconcile_daily, summarize_reconciliation
+)
+
+WISP_START_MONTH = pd.Timestamp("2020-12-01")
+WISP_PAYMENT_DATE_FROM = pd.Timestamp("2021-06-01")  # earlier sheets have no Payment Date column
+
+
+def _sheet_month(sheet_name):
+    try:
+        return pd.to_datetime(sheet_name.strip(), format="%b %Y")
+    except (ValueError, TypeError):
+        return None
+
+
+def read_wisp_sheets(file_bytes):
+    """
+    Stream the monthly sheets of a CMD WISP Tracker workbook in one read-only pass.
+
+    Returns:
+        sheets (list[tuple]): (sheet_name, month, rows) with raw cell values from row 5, columns A:D
+        skipped (list[str]): sheet names that are not a "Mon YYYY" month
+    """
+    wb = openpyxl.load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    sheets, skipped = [], []
+    try:
+        for ws in wb.worksheets:
+            month = _sheet_month(ws.title)
+            if month is None:
+                skipped.append(ws.title)
+                continue
+            if month < WISP_START_MONTH:
+                continue
+            rows = list(ws.iter_rows(min_row=5, max_col=4, values_only=True))
+            sheets.append((ws.title, month, rows))
+    finally:
+        wb.close()
+    return sheets, skipped
+
+
+@st.cache_data(show_spinner=False, max_entries=500)
+def parse_wisp_sheet(sheet_name, content_hash, _rows):
+    """
+    Parse one monthly sheet into Payment Date / Run Date / Amount / Applicable Month.
+
+    Cached by the sheet's content hash, so re-uploading a newer tracker only
+    re-parses the sheets whose cells changed.
+    """
+    month = _sheet_month(sheet_name)
+    rows = [tuple(row) + (None,) * (4 - len(row)) for row in _rows]
+    if month < WISP_PAYMENT_DATE_FROM:
+        df = pd.DataFrame([row[:3] for row in rows], columns=["Run Date", "Amount", "Additional"])
+        df["Payment Date"] = pd.NaT
+    else:
+        df = pd.DataFrame(rows, columns=["Payment Date", "Run Date", "Amount", "Additional"])
+
+    for col in ["Payment Date", "Run Date"]:
+        df[col] = pd.to_datetime(df[col], errors="coerce").ffill()
+    df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce")
+    df = df.dropna(subset=["Amount"])
+    df["Applicable Month"] = month
+    return df[["Payment Date", "Run Date", "Amount", "Applicable Month"]].reset_index(drop=True)
+
+
+@st.cache_data(show_spinner=False, max_entries=10)
+def load_wisp_tracker(file_hash, _file_bytes):
+    """
+    Combined WISP frame for one tracker file, cached by the file's hash.
+
+    Returns:
+        combined_df (pd.DataFrame): typed Payment Date / Run Date (datetime64), Amount, Applicable Month
+        skipped (list[str]): sheets that were not recognised as months
+    """
+    sheets, skipped = read_wisp_sheets(_file_bytes)
+    parsed = [
+        parse_wisp_sheet(name, hashlib.sha1(pickle.dumps(rows)).hexdigest(), rows)
+        for name, _, rows in sheets
+    ]
+    if not parsed:
+        return pd.DataFrame(columns=["Payment Date", "Run Date", "Amount", "Applicable Month"]), skipped
+    combined_df = pd.concat(parsed, ignore_index=True)
+    combined_df.sort_values(by=["Applicable Month", "Payment Date"], inplace=True, kind="stable")
+    return combined_df.reset_index(drop=True), skipped
+
 def show_collection_tracker_page():
     st.title("📊 CMD WISP Tracker & MPF Collection Report")
 
@@ -13,6 +103,7 @@ def show_collection_tracker_page():
     show_wisp_raw = st.sidebar.checkbox("Show Full Parsed Dataset (WISP Tracker)")
     show_mpf_raw = st.sidebar.checkbox("Show Full Parsed Dataset (MPF Collection Report)")
     show_merged = st.sidebar.checkbox("Show CMD vs MPF Comparison")
+    show_daily = st.sidebar.checkbox("Show Daily Reconciliation (CMD vs MPF)")
 
     combined_df = pd.DataFrame()
     latest_wisp_df = pd.DataFrame()
@@ -22,43 +113,12 @@ def show_collection_tracker_page():
 
     try:
         if wisp_file:
-            xl = pd.ExcelFile(wisp_file)
-            all_data = []
-
-            for sheet_name in xl.sheet_names:
-                try:
-                    sheet_date = pd.to_datetime(sheet_name.strip(), format="%b %Y")
-                    if sheet_date < pd.to_datetime("2020-12-01"):
-                        continue
-                    formatted_month = sheet_date.strftime("%Y-%m")
-                except:
-                    st.warning(f"⚠️ Skipping sheet: {sheet_name}")
-                    continue
-
-                if sheet_date < pd.to_datetime("2021-06-01"):
-                    df = pd.read_excel(xl, sheet_name=sheet_name, header=None, skiprows=4, usecols="A:C")
-                    df.columns = ["Run Date", "Amount", "Additional"]
-                    df["Payment Date"] = None
-                else:
-                    df = pd.read_excel(xl, sheet_name=sheet_name, header=None, skiprows=4, usecols="A:D")
-                    df.columns = ["Payment Date", "Run Date", "Amount", "Additional"]
-
-                df["Payment Date"] = pd.to_datetime(df["Payment Date"], errors="coerce").dt.strftime('%Y-%m-%d')
-                df["Run Date"] = pd.to_datetime(df["Run Date"], errors="coerce").dt.strftime('%Y-%m-%d')
-                df["Payment Date"].fillna(method='ffill', inplace=True)
-                df["Run Date"].fillna(method='ffill', inplace=True)
-                df.dropna(how='all', inplace=True)
-                df["Applicable Month"] = formatted_month
-                df = df[["Payment Date", "Run Date", "Amount", "Applicable Month"]]
-                all_data.append(df)
-
-            if all_data:
-                combined_df = pd.concat(all_data, ignore_index=True)
-                combined_df["Amount"] = pd.to_numeric(combined_df["Amount"], errors="coerce")
-                combined_df.dropna(subset=["Amount"], inplace=True)
-                combined_df["Applicable Month"] = pd.to_datetime(combined_df["Applicable Month"], format="%Y-%m")
-                combined_df.sort_values(by=["Applicable Month", "Payment Date"], inplace=True)
+            file_bytes = wisp_file.getvalue()
+            combined_df, skipped_sheets = load_wisp_tracker(hashlib.sha1(file_bytes).hexdigest(), file_bytes)
+            for sheet_name in skipped_sheets:
+                st.warning(f"⚠️ Skipping sheet: {sheet_name}")
 
+            if not combined_df.empty:
                 latest_wisp_df = (
                     combined_df.groupby("Applicable Month")
                     .tail(1)
@@ -74,30 +134,23 @@ def show_collection_tracker_page():
                 st.dataframe(latest_wisp_df)
 
                 if show_wisp_raw:
-                    df_display = combined_df.copy()
-                    df_display["Amount"] = df_display["Amount"].map("{:,.2f}".format)
-                    df_display["Applicable Month"] = df_display["Applicable Month"].dt.strftime("%Y-%m")
                     st.subheader("📋 Full Parsed Dataset (WISP Tracker)")
-                    st.dataframe(df_display)
+                    st.dataframe(combined_df.style.format({
+                        "Payment Date": "{:%Y-%m-%d}",
+                        "Run Date": "{:%Y-%m-%d}",
+                        "Amount": "{:,.2f}",
+                        "Applicable Month": "{:%Y-%m}",
+                    }, na_rep=""))
     except Exception as e:
         st.error(f"❌ Error reading CMD WISP Tracker File: {e}")
 
     try:
         if mpf_file:
-            mpf_df = pd.read_csv(mpf_file, parse_dates=["Posting_Date"])
+            mpf_df = read_collection_csv(mpf_file, "MPF")
 
             if "Total_Amount" not in mpf_df.columns:
                 st.error("❌ Column 'Total_Amount' is missing.")
             else:
-                mpf_df["Total_Amount"] = (
-                    mpf_df["Total_Amount"]
-                    .astype(str)
-                    .str.replace(",", "")
-                    .str.replace("₱", "")
-                    .str.extract(r"([0-9.]+)", expand=False)
-                    .astype(float)
-                )
-
                 mpf_df["Posting_Month"] = mpf_df["Posting_Date"].dt.to_period("M").astype(str)
 
                 mpf_summary_df = (
@@ -158,3 +211,44 @@ def show_collection_tracker_page():
             st.dataframe(merged_df)
     except Exception as e:
         st.error(f"❌ Error merging datasets: {e}")
+
+    try:
+        if not combined_df.empty and not mpf_df.empty and show_daily:
+            st.sidebar.markdown("---")
+            st.sidebar.subheader("Daily Reconciliation Settings")
+            cmd_date_col = st.sidebar.selectbox("CMD date", ["Run Date", "Payment Date"])
+            mpf_date_col = st.sidebar.selectbox("Collection Report date", ["Posting_Date", "Payment_Date"])
+            cumulative = st.sidebar.checkbox("WISP amounts are running monthly totals", value=True)
+            date_tol = st.sidebar.number_input("Date tolerance (days)", min_value=0, max_value=31, value=1)
+            amount_tol = st.sidebar.number_input("Amount tolerance (absolute)", min_value=0.0, value=1.0, step=1.0)
+            pct_tol = st.sidebar.number_input("Amount tolerance (%)", min_value=0.0, max_value=100.0, value=0.0, step=0.1)
+
+            recon_df = reconcile_daily(
+                wisp_daily_amounts(combined_df, cmd_date_col, cumulative),
+                collection_daily_amounts(mpf_df, mpf_date_col),
+                date_tolerance_days=int(date_tol),
+                amount_tolerance=amount_tol,
+                pct_tolerance=pct_tol / 100,
+            )
+
+            money = {col: "{:,.2f}" for col in ["Amount_CMD", "Amount_Collection", "Difference"]}
+            st.subheader("🧾 Daily Reconciliation Summary")
+            st.dataframe(summarize_reconciliation(recon_df).style.format(money, na_rep=""))
+
+            statuses = st.multiselect("Show items", recon_df["Status"].unique().tolist(), default=recon_df["Status"].unique().tolist())
+            detail_df = recon_df[recon_df["Status"].isin(statuses)]
+            st.subheader("📋 Daily Reconciliation Items")
+            st.dataframe(detail_df.style.format({
+                **money,
+                "Date_CMD": "{:%Y-%m-%d}",
+                "Date_Collection": "{:%Y-%m-%d}",
+                "Lag_Days": "{:+.0f}",
+            }, na_rep=""))
+            st.download_button(
+                "📥 Download Reconciliation",
+                data=detail_df.to_csv(index=False).encode("utf-8"),
+                file_name="cmd_vs_mpf_daily_reconciliation.csv",
+                mime="text/csv"
+            )
+    except Exception as e:
+        st.error(f"❌ Error reconciling daily data: {e}")
@@ -2,6 +2,131 @@
 import streamlit as st
 import pandas as pd
 import re
+import numpy as np
+
+from collection_schema import read_collection_csv
+
+def snapshot_label(name):
+    """Label a snapshot by the extraction date in its file name, if any."""
+    m = re.search(r"(\d{4}-\d{2}-\d{2})", name)
+    return m.group(1) if m else name
+
+
+def aggregate_snapshot(df, tag_option):
+    """Sum Total_Amount and Total_Num by Payment_Date ('Daily') or month ('Monthly')."""
+    period = df['Payment_Date'].dt.strftime('%Y-%m' if tag_option == 'Monthly' else '%Y-%m-%d')
+    return (
+        df.assign(Period=period)
+        .groupby('Period')[['Total_Amount', 'Total_Num']]
+        .sum()
+        .reset_index()
+    )
+
+
+def load_snapshots(uploaded_files, tag_option):
+    """
+    Read every uploaded collection CSV into one long table keyed by (Snapshot, Period).
+
+    Returns:
+        (pd.DataFrame, list[str]): long table and snapshot labels in chronological
+        order (by the extraction date in the file name; undated files last, in upload order)
+    """
+    frames = []
+    labels = []
+    dates = []
+    for file in uploaded_files:
+        lbl = snapshot_label(file.name)
+        dates.append(pd.to_datetime(lbl, format="%Y-%m-%d", errors="coerce"))
+        if lbl in labels:
+            lbl = f"{lbl} ({file.name})"
+        df = read_collection_csv(file)
+        missing = [col for col in ["Payment_Date", "Total_Amount", "Total_Num"] if col not in df.columns]
+        if missing:
+            raise ValueError(f"Missing column '{missing[0]}' in {file.name}")
+        df['Total_Amount'] = df['Total_Amount'].fillna(0)
+        df['Total_Num'] = df['Total_Num'].fillna(0).astype('int64')
+        frames.append(aggregate_snapshot(df, tag_option).assign(Snapshot=lbl))
+        labels.append(lbl)
+
+    # Extraction date order; snapshots without a date follow in upload order
+    order = sorted(range(len(labels)), key=lambda i: (pd.isna(dates[i]), dates[i] if pd.notna(dates[i]) else 0, i))
+    labels = [labels[i] for i in order]
+    long_df = pd.concat(frames, ignore_index=True)
+    long_df['Snapshot'] = pd.Categorical(long_df['Snapshot'], categories=labels, ordered=True)
+    return long_df, labels
+
+
+def snapshot_revisions(long_df, measure):
+    """
+    Pivot one measure to a Period x Snapshot panel and derive its revisions.
+
+    Returns:
+        wide (pd.DataFrame): value per period and snapshot (missing periods = 0)
+        consecutive (pd.DataFrame): change from each snapshot to the next one
+        pairwise (np.ndarray): Period x From x To array of deltas (To - From)
+    """
+    wide = long_df.pivot_table(
+        index='Period', columns='Snapshot', values=measure, aggfunc='sum', fill_value=0, observed=False
+    ).sort_index()
+    values = wide.to_numpy(dtype='float64')
+    consecutive = pd.DataFrame(
+        np.diff(values, axis=1),
+        index=wide.index,
+        columns=[f"{a} → {b}" for a, b in zip(wide.columns[:-1], wide.columns[1:])]
+    )
+    pairwise = values[:, None, :] - values[:, :, None]
+    return wide, consecutive, pairwise
+
+
+def show_nway_comparison(long_df, labels, view_option):
+    measure = st.sidebar.selectbox(
+        "Measure", ["Total_Amount", "Total_Num"], key="collection_compare_measure"
+    )
+    wide, consecutive, pairwise = snapshot_revisions(long_df, measure)
+
+    if view_option == 'Differences Only':
+        revised = (consecutive != 0).any(axis=1).to_numpy()
+        wide, consecutive, pairwise = wide[revised], consecutive[revised], pairwise[revised]
+
+    st.subheader(f"{measure} by Snapshot")
+    st.dataframe(wide.style.format('{:,.0f}'))
+
+    st.subheader('Revisions Between Consecutive Snapshots')
+    st.dataframe(consecutive.style.format('{:,.0f}'))
+
+    st.subheader('Pairwise Deltas (column minus row)')
+    period_options = ["All periods (total)"] + wide.index.tolist()
+    period = st.selectbox("Period", period_options, key="collection_compare_pair_period")
+    if period == period_options[0]:
+        matrix = pairwise.sum(axis=0)
+    else:
+        matrix = pairwise[wide.index.get_loc(period)]
+    st.dataframe(pd.DataFrame(matrix, index=labels, columns=labels).style.format('{:,.0f}'))
+
+    pairs_long = pd.DataFrame({
+        'Period': np.repeat(wide.index.to_numpy(), len(labels) ** 2),
+        'From': np.tile(np.repeat(labels, len(labels)), len(wide)),
+        'To': np.tile(labels, len(labels) * len(wide)),
+        'Delta': pairwise.reshape(-1),
+    })
+    pairs_long = pairs_long[pairs_long['From'] != pairs_long['To']]
+    st.download_button(
+        "📥 Download Pairwise Deltas",
+        data=pairs_long.to_csv(index=False).encode('utf-8'),
+        file_name=f"pairwise_{measure.lower()}.csv",
+        mime="text/csv"
+    )
+
+    st.subheader('Revision History per Period')
+    most_revised = (consecutive != 0).sum(axis=1).sort_values(ascending=False).index[:5].tolist()
+    periods = st.multiselect(
+        "Periods to chart", wide.index.tolist(), default=most_revised, key="collection_compare_history"
+    )
+    if periods:
+        history = wide.loc[periods].T
+        history.index = history.index.astype(str)
+        st.line_chart(history)
+
 
 def show_collection_compare_page():
     """
@@ -11,13 +136,20 @@ def show_collection_compare_page():
 
     # Sidebar file uploader
     uploaded_files = st.sidebar.file_uploader(
-        "Upload exactly two CSV files",
+        "Upload two or more CSV files",
         type=["csv"],
         accept_multiple_files=True,
         key="collection_compare_files"
     )
 
     enable_analysis = uploaded_files and len(uploaded_files) >= 2
+    compare_mode = st.sidebar.radio(
+        "Comparison Mode",
+        options=["Two Files", "All Snapshots (N-way)"],
+        disabled=not enable_analysis,
+        key="collection_compare_mode"
+    )
+
     view_option = st.sidebar.radio(
         "View",
         options=["All", "Differences Only"],
@@ -34,79 +166,42 @@ def show_collection_compare_page():
 
     if uploaded_files:
         if len(uploaded_files) < 2:
-            st.warning("Please upload exactly two CSV files to compare.")
+            st.warning("Please upload at least two CSV files to compare.")
+            return
+
+        files = uploaded_files if compare_mode == "All Snapshots (N-way)" else uploaded_files[:2]
+        try:
+            long_df, labels = load_snapshots(files, tag_option)
+        except ValueError as e:
+            st.error(str(e))
             return
 
-        group_dfs = []
-        labels = []
-
-        # Process up to two files
-        for file in uploaded_files[:2]:
-            name = file.name
-            m = re.search(r"(\d{4}-\d{2}-\d{2})", name)
-            lbl = m.group(1) if m else name
-            labels.append(lbl)
-
-            df = pd.read_csv(file)
-            for col in ["Payment_Date", "Total_Amount", "Total_Num"]:
-                if col not in df.columns:
-                    st.error(f"Missing column '{col}' in {name}")
-                    return
-
-            # Parse and format date
-            df['Payment_Date'] = pd.to_datetime(
-                df['Payment_Date'], errors='coerce'
-            ).dt.date.astype(str)
-
-            # Ensure numeric
-            df['Total_Amount'] = pd.to_numeric(
-                df['Total_Amount'].astype(str).str.replace(',', ''),
-                errors='coerce'
-            ).fillna(0)
-            df['Total_Num'] = pd.to_numeric(
-                df['Total_Num'].astype(str).str.replace(',', ''),
-                errors='coerce'
-            ).fillna(0)
-
-            # Group by date or month
-            base = df.groupby('Payment_Date').agg({
-                'Total_Amount': 'sum',
-                'Total_Num': 'sum'
-            }).reset_index()
-
-            if tag_option == 'Monthly':
-                base['Period'] = base['Payment_Date'].str[:7]
-                base = base.groupby('Period').agg({
-                    'Total_Amount': 'sum',
-                    'Total_Num': 'sum'
-                }).reset_index()
-            else:
-                base = base.rename(columns={'Payment_Date': 'Period'})
-
-            # Rename for clarity
-            base = base.rename(columns={
-                'Total_Amount': f"Total_Amount_{labels[-1]}",
-                'Total_Num': f"Total_Num_{labels[-1]}"
-            })
-            group_dfs.append(base)
-
-        # Merge the two dataframes
-        left = group_dfs[0]
-        right = group_dfs[1]
-        comp = pd.merge(left, right, on='Period', how='outer').fillna(0)
+        if compare_mode == "All Snapshots (N-way)":
+            show_nway_comparison(long_df, labels, view_option)
+            return
+
+        # Two-file mode keeps the upload order (older file first)
+        labels = [snapshot_label(f.name) for f in files]
+        if labels[0] == labels[1]:
+            labels[1] = f"{labels[1]} ({files[1].name})"
+        amounts, _, _ = snapshot_revisions(long_df, 'Total_Amount')
+        numbers, _, _ = snapshot_revisions(long_df, 'Total_Num')
 
         a0 = f"Total_Amount_{labels[0]}"
         a1 = f"Total_Amount_{labels[1]}"
         n0 = f"Total_Num_{labels[0]}"
         n1 = f"Total_Num_{labels[1]}"
 
+        comp = pd.DataFrame({
+            a0: amounts[labels[0]], a1: amounts[labels[1]],
+            n0: numbers[labels[0]], n1: numbers[labels[1]],
+        })
+
         # Calculate differences
         comp['Diff_Amount'] = comp[a1] - comp[a0]
         comp['Diff_Num'] = comp[n1] - comp[n0]
-        comp['Pct_Amount'] = comp['Diff_Amount'] / comp[a0].replace({0: pd.NA}) * 100
-        comp['Pct_Num'] = comp['Diff_Num'] / comp[n0].replace({0: pd.NA}) * 100
-
-        comp = comp.sort_values('Period').set_index('Period')
+        comp['Pct_Amount'] = comp['Diff_Amount'] / comp[a0].replace({0: np.nan}) * 100
+        comp['Pct_Num'] = comp['Diff_Num'] / comp[n0].replace({0: np.nan}) * 100
 
         # Filter by view
         if view_option == 'Differences Only':
@@ -1,8 +1,291 @@
 import streamlit as st
 import pandas as pd
 import re
-import matplotlib.pyplot as plt
 import io
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+try:
+    import pyarrow.csv as pa_csv
+except ImportError:  # pyarrow is optional; fall back to the pandas reader
+    pa_csv = None
+
+FUNDS = ["SSS", "EC", "FLEXI", "PESO", "MIA", "MPF", "NVPF"]
+
+# Coupon / maturity extracts: (file name pattern, type, group, currency, date column, amount columns)
+FLOW_SOURCES = [
+    ("coupon.*gs.*php", "Coupon", "GS", "PHP", "Coupon_Payment_Date",
+     ["Coupon_Payment_EC", "Coupon_Payment_FLEXI", "Coupon_Payment_MIA",
+      "Coupon_Payment_MPF", "Coupon_Payment_NVPF", "Coupon_Payment_PESO", "Coupon_Payment_SSS"]),
+    ("coupon.*gs.*usd", "Coupon", "GS", "USD", "Coupon_Payment_Date",
+     ["Coupon_Payment_EC", "Coupon_Payment_MPF", "Coupon_Payment_SSS"]),
+    ("coupon.*cbn.*php", "Coupon", "CBN", "PHP", "Coupon_Payment_Date",
+     ["Coupon_Payment_EC", "Coupon_Payment_FLEXI", "Coupon_Payment_MIA",
+      "Coupon_Payment_MPF", "Coupon_Payment_NVPF", "Coupon_Payment_SSS"]),
+    ("coupon.*cbn.*usd", "Coupon", "CBN", "USD", "Coupon_Payment_Date",
+     ["Coupon_Payment_EC", "Coupon_Payment_MPF", "Coupon_Payment_SSS"]),
+    ("maturit.*gs.*php", "Maturity", "GS", "PHP", "Maturity_Date",
+     ["Face_Amount_SSS", "Face_Amount_EC", "Face_Amount_FLEXI",
+      "Face_Amount_PESO", "Face_Amount_MIA", "Face_Amount_MPF", "Face_Amount_NVPF"]),
+    ("maturit.*gs.*usd", "Maturity", "GS", "USD", "Maturity_Date",
+     ["Face_Amount_SSS", "Face_Amount_EC", "Face_Amount_FLEXI",
+      "Face_Amount_PESO", "Face_Amount_MIA", "Face_Amount_MPF", "Face_Amount_NVPF"]),
+    ("maturit.*cbn.*php", "Maturity", "CBN", "PHP", "Maturity_Date",
+     ["SSS_Outstanding", "EC_Outstanding", "FLEXI_Outstanding",
+      "MIA_Outstanding", "MPF_Outstanding", "NVPF_Outstanding"]),
+    ("maturit.*cbn.*usd", "Maturity", "CBN", "USD", "Maturity_Date",
+     ["SSS_Outstanding", "EC_Outstanding", "FLEXI_Outstanding",
+      "MIA_Outstanding", "MPF_Outstanding", "NVPF_Outstanding"]),
+]
+FLOW_COLUMNS = ["Month", "Type", "Group", "Currency", "Fund", "Amount"]
+EXPORT_FORMATS = {
+    "PNG": ("png", "image/png"),
+    "PDF": ("pdf", "application/pdf"),
+    "SVG": ("svg", "image/svg+xml"),
+}
+EXPORT_CACHE_SIZE = 16
+SUMMARY_COLUMNS = [
+    "GS Coupon", "CBN Coupon", "Total Coupon", "Cumulative Coupon",
+    "GS Maturity", "CBN Maturity", "Total Maturity", "Cumulative Maturity",
+    "Total Coupon + Maturity", "Cumulative Total"
+]
+
+
+def fund_of_column(column):
+    """Fund code in an amount column name (Coupon_Payment_MPF, Face_Amount_MPF, MPF_Outstanding)."""
+    for fund in FUNDS:
+        if column.endswith(f"_{fund}") or column.startswith(f"{fund}_"):
+            return fund
+    return None
+
+
+def _read_columns(data, wanted):
+    """Read only the `wanted` columns of a CSV (bytes or path); pyarrow parses in parallel without the GIL."""
+    source = io.BytesIO(data) if isinstance(data, bytes) else data
+    if pa_csv is None:
+        return pd.read_csv(source, usecols=lambda col: col in wanted)
+    header = pd.read_csv(io.BytesIO(data) if isinstance(data, bytes) else data, nrows=0).columns
+    columns = [col for col in header if col in wanted]
+    source = io.BytesIO(data) if isinstance(data, bytes) else data
+    table = pa_csv.read_csv(source, convert_options=pa_csv.ConvertOptions(include_columns=columns))
+    return table.to_pandas()
+
+
+def load_flow_file(uploaded_file, source):
+    """
+    Monthly amounts per fund from one coupon/maturity extract, in long form.
+
+    Returns:
+        pd.DataFrame with FLOW_COLUMNS (Month = first day of the month)
+    """
+    _, flow_type, group, currency, date_col, amount_cols = source
+    data = uploaded_file.getvalue() if hasattr(uploaded_file, "getvalue") else uploaded_file
+    df = _read_columns(data, [date_col] + amount_cols)
+    available_cols = [col for col in amount_cols if col in df.columns]
+    if not available_cols or date_col not in df.columns:
+        return pd.DataFrame(columns=FLOW_COLUMNS)
+
+    # Schedules repeat the same payment dates: parse each distinct value once
+    codes, uniques = pd.factorize(df[date_col])
+    unique_months = pd.to_datetime(pd.Series(uniques), errors="coerce").dt.to_period("M").dt.to_timestamp()
+    months = pd.Series(unique_months.to_numpy()[codes], index=df.index).where(codes >= 0)
+    amounts = df[available_cols].apply(pd.to_numeric, errors="coerce")
+    amounts.columns = [fund_of_column(col) for col in available_cols]
+    long = (
+        amounts.groupby(months).sum()
+        .rename_axis("Month").rename_axis("Fund", axis=1)
+        .stack().rename("Amount").reset_index()
+    )
+    return long.assign(Type=flow_type, Group=group, Currency=currency)[FLOW_COLUMNS]
+
+
+def match_flow_files(uploaded_files):
+    """Pair each FLOW_SOURCES entry with the first uploaded file whose name matches it."""
+    matched = []
+    for source in FLOW_SOURCES:
+        for file in uploaded_files:
+            if re.search(source[0], file.name, re.IGNORECASE):
+                matched.append((file, source))
+                break
+    return matched
+
+
+def load_fund_flows(uploaded_files, max_workers=8):
+    """
+    All recognised coupon/maturity extracts in one long (Month, Type, Group, Currency, Fund, Amount) frame.
+
+    Matched files are read concurrently.
+    """
+    matched = match_flow_files(uploaded_files)
+    if not matched:
+        return pd.DataFrame(columns=FLOW_COLUMNS)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(matched))) as pool:
+        frames = list(pool.map(lambda pair: load_flow_file(*pair), matched))
+    return pd.concat(frames, ignore_index=True)
+
+
+@st.cache_data(show_spinner=False)
+def cached_fund_flows(file_keys, _uploaded_files):
+    """load_fund_flows cached by the uploaded files' names and content hashes."""
+    return load_fund_flows(_uploaded_files)
+
+
+def file_keys(uploaded_files):
+    return tuple((f.name, hashlib.sha1(f.getvalue()).hexdigest()) for f in uploaded_files)
+
+
+def coupon_maturity_summary(flows):
+    """
+    Monthly GS/CBN coupon and maturity totals with cumulative columns.
+
+    Every column comes from one groupby over (Month, Type, Group) and one cumulative sum.
+
+    Returns:
+        pd.DataFrame indexed by month ("YYYY-MM") with the report columns
+    """
+    if flows.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS, dtype="float64")
+    by_group = flows.groupby(["Month", "Type", "Group"])["Amount"].sum().unstack(["Type", "Group"], fill_value=0.0)
+    by_group = by_group.reindex(
+        columns=pd.MultiIndex.from_product([["Coupon", "Maturity"], ["GS", "CBN"]]), fill_value=0.0
+    )
+    summary = pd.DataFrame({
+        "GS Coupon": by_group[("Coupon", "GS")],
+        "CBN Coupon": by_group[("Coupon", "CBN")],
+        "Total Coupon": by_group["Coupon"].sum(axis=1),
+        "GS Maturity": by_group[("Maturity", "GS")],
+        "CBN Maturity": by_group[("Maturity", "CBN")],
+        "Total Maturity": by_group["Maturity"].sum(axis=1),
+    })
+    summary["Total Coupon + Maturity"] = summary["Total Coupon"] + summary["Total Maturity"]
+    cumulative = summary[["Total Coupon", "Total Maturity", "Total Coupon + Maturity"]].cumsum()
+    summary["Cumulative Coupon"] = cumulative["Total Coupon"]
+    summary["Cumulative Maturity"] = cumulative["Total Maturity"]
+    summary["Cumulative Total"] = cumulative["Total Coupon + Maturity"]
+    summary.index = summary.index.strftime("%Y-%m")
+    return summary[SUMMARY_COLUMNS]
+
+
+def monthly_fund_inflows(flows, usd_rate=None):
+    """
+    Coupon and maturity inflows per fund and month.
+
+    Args:
+        flows (pd.DataFrame): output of load_fund_flows
+        usd_rate (float): Php per USD; None keeps USD amounts as reported
+
+    Returns:
+        pd.DataFrame with Fund, Month, Coupon, Maturity
+    """
+    amount = flows["Amount"].astype("float64")
+    if usd_rate:
+        amount = amount.where(flows["Currency"] != "USD", amount * usd_rate)
+    return (
+        flows.assign(Amount=amount)
+        .pivot_table(index=["Fund", "Month"], columns="Type", values="Amount", aggfunc="sum", fill_value=0.0)
+        .reindex(columns=["Coupon", "Maturity"], fill_value=0.0)
+        .rename_axis(None, axis=1)
+        .reset_index()
+    )
+
+
+def frame_hash(df):
+    """Content hash of a frame (values, index and columns)."""
+    digest = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    digest.update(repr(list(df.columns)).encode())
+    return digest.hexdigest()
+
+
+def render_summary_table(scaled_df, display_mode, export_format="PNG"):
+    """
+    Draw the coupon, maturity and combined summary tables into one image.
+
+    Uses a standalone Figure (no pyplot state), so it is safe to run off the script thread.
+
+    Returns:
+        bytes of the PNG (300 dpi), PDF or SVG file
+    """
+    formatted_df = scaled_df.apply(lambda col: col.map("{:,.2f}".format))
+    formatted_df.insert(0, "Month", formatted_df.index)
+
+    # Define column groups
+    coupon_cols = ["GS Coupon", "CBN Coupon", "Total Coupon", "Cumulative Coupon"]
+    maturity_cols = ["GS Maturity", "CBN Maturity", "Total Maturity", "Cumulative Maturity"]
+    combined_cols = ["Total Coupon + Maturity", "Cumulative Total"]
+
+    row_height = 0.25
+    fig_height = len(formatted_df) * row_height + 6
+    fig = Figure(figsize=(16, fig_height))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.axis("off")
+
+    mode_label = "(Figures in Millions)" if display_mode == "Millions" else "(Figures in Actual)"
+
+    def draw_table_and_title(df, title, y_offset):
+        ax.text(0, y_offset, f"{title} {mode_label}", fontsize=14, fontweight='bold', ha='left', va='bottom')
+        table = ax.table(
+            cellText=df.values,
+            colLabels=df.columns,
+            cellLoc='center',
+            loc='upper center',
+            bbox=[0, y_offset - 0.22, 1, 0.2]
+        )
+        table.auto_set_font_size(False)
+        table.set_fontsize(10)
+        table.scale(1, 1.2)
+
+    y_start = 0.95
+    spacing = 0.33
+
+    draw_table_and_title(formatted_df[["Month"] + coupon_cols], "Coupon Summary", y_start)
+    draw_table_and_title(formatted_df[["Month"] + maturity_cols], "Maturity Summary", y_start - spacing)
+    draw_table_and_title(formatted_df[["Month"] + combined_cols], "Total Coupon + Maturity Summary", y_start - spacing * 2)
+
+    extension, _ = EXPORT_FORMATS[export_format]
+    buf = io.BytesIO()
+    if extension == "png":
+        fig.savefig(buf, format=extension, bbox_inches="tight", dpi=300)
+    else:
+        # Vector output: one draw pass (no tight-bbox pre-render), no rasterization
+        fig.savefig(buf, format=extension)
+    return buf.getvalue()
+
+
+@st.cache_resource
+def _export_executor():
+    """Worker shared by all sessions for table exports."""
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="table-export")
+
+
+@st.cache_resource
+def _export_futures():
+    """
+    (data hash, display mode, format) -> Future of the rendered bytes, most
+    recent last, and the lock every session holds while using it.
+    """
+    return OrderedDict(), threading.Lock()
+
+
+def submit_table_export(scaled_df, display_mode, export_format):
+    """Start rendering in the background, or return the cached/in-flight render for the same inputs."""
+    futures, lock = _export_futures()
+    key = (frame_hash(scaled_df), display_mode, export_format)
+    with lock:
+        future = futures.get(key)
+        if future is None or (future.done() and future.exception() is not None):
+            future = _export_executor().submit(render_summary_table, scaled_df.copy(), display_mode, export_format)
+            futures[key] = future
+        futures.move_to_end(key)
+        while len(futures) > EXPORT_CACHE_SIZE:
+            futures.popitem(last=False)
+    return future
+
 
 def show_coupon_maturity_summary_page():
     st.title("📊 Monthly GS & CBN Coupon and Maturities Summary")
@@ -10,96 +293,13 @@ def show_coupon_maturity_summary_page():
     uploaded_files = st.sidebar.file_uploader("Upload CSV files", type=["csv"], accept_multiple_files=True)
     display_mode = st.sidebar.radio("Display Figures In:", ["Actual", "Millions"])
 
-    def scale(value):
-        return value / 1_000_000 if display_mode == "Millions" else value
+    if not uploaded_files:
+        uploaded_files = []
 
-    def match_file(keyword):
-        for file in uploaded_files:
-            if re.search(keyword, file.name, re.IGNORECASE):
-                return file
-        return None
-
-    def load_and_sum_by_month(uploaded_file, date_col, amount_cols):
-        if uploaded_file is None:
-            return pd.Series(dtype='float64')
-        
-        df = pd.read_csv(uploaded_file)
-
-        # Only use columns that exist in the file
-        available_cols = [col for col in amount_cols if col in df.columns]
-        if not available_cols:
-            return pd.Series(dtype='float64')
-
-        df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-        df = df.dropna(subset=[date_col])
-        df['Month'] = df[date_col].dt.to_period('M')
-        df['Total'] = df[available_cols].sum(axis=1)
-        return df.groupby('Month')['Total'].sum()
-
-    # Match files
-    coupon_gs_php = match_file("coupon.*gs.*php")
-    coupon_gs_usd = match_file("coupon.*gs.*usd")
-    coupon_cbn_php = match_file("coupon.*cbn.*php")
-    coupon_cbn_usd = match_file("coupon.*cbn.*usd")
-    maturity_gs_php = match_file("maturit.*gs.*php")
-    maturity_gs_usd = match_file("maturit.*gs.*usd")
-    maturity_cbn_php = match_file("maturit.*cbn.*php")
-    maturity_cbn_usd = match_file("maturit.*cbn.*usd")
-
-    # Load series
-    gs_coupon_php_series = load_and_sum_by_month(coupon_gs_php, "Coupon_Payment_Date",
-        ["Coupon_Payment_EC", "Coupon_Payment_FLEXI", "Coupon_Payment_MIA",
-         "Coupon_Payment_MPF", "Coupon_Payment_NVPF", "Coupon_Payment_PESO", "Coupon_Payment_SSS"])
-
-    gs_coupon_usd_series = load_and_sum_by_month(coupon_gs_usd, "Coupon_Payment_Date",
-        ["Coupon_Payment_EC", "Coupon_Payment_MPF", "Coupon_Payment_SSS"])
-
-    cbn_coupon_php_series = load_and_sum_by_month(coupon_cbn_php, "Coupon_Payment_Date",
-        ["Coupon_Payment_EC", "Coupon_Payment_FLEXI", "Coupon_Payment_MIA",
-         "Coupon_Payment_MPF", "Coupon_Payment_NVPF", "Coupon_Payment_SSS"])
-
-    cbn_coupon_usd_series = load_and_sum_by_month(coupon_cbn_usd, "Coupon_Payment_Date",
-        ["Coupon_Payment_EC", "Coupon_Payment_MPF", "Coupon_Payment_SSS"])
-
-    gs_maturity_php_series = load_and_sum_by_month(maturity_gs_php, "Maturity_Date",
-        ["Face_Amount_SSS", "Face_Amount_EC", "Face_Amount_FLEXI",
-         "Face_Amount_PESO", "Face_Amount_MIA", "Face_Amount_MPF", "Face_Amount_NVPF"])
-
-    gs_maturity_usd_series = load_and_sum_by_month(maturity_gs_usd, "Maturity_Date",
-        ["Face_Amount_SSS", "Face_Amount_EC", "Face_Amount_FLEXI",
-         "Face_Amount_PESO", "Face_Amount_MIA", "Face_Amount_MPF", "Face_Amount_NVPF"])
-
-    cbn_maturity_php_series = load_and_sum_by_month(maturity_cbn_php, "Maturity_Date",
-        ["SSS_Outstanding", "EC_Outstanding", "FLEXI_Outstanding",
-         "MIA_Outstanding", "MPF_Outstanding", "NVPF_Outstanding"])
-
-    cbn_maturity_usd_series = load_and_sum_by_month(maturity_cbn_usd, "Maturity_Date",
-        ["SSS_Outstanding", "EC_Outstanding", "FLEXI_Outstanding",
-         "MIA_Outstanding", "MPF_Outstanding", "NVPF_Outstanding"])
-
-    # Combine series
-    gs_coupon = gs_coupon_php_series.add(gs_coupon_usd_series, fill_value=0).rename("GS Coupon")
-    cbn_coupon = cbn_coupon_php_series.add(cbn_coupon_usd_series, fill_value=0).rename("CBN Coupon")
-    total_coupon = gs_coupon.add(cbn_coupon, fill_value=0).rename("Total Coupon")
-    cumulative_coupon = total_coupon.cumsum().rename("Cumulative Coupon")
-
-    gs_maturity = gs_maturity_php_series.add(gs_maturity_usd_series, fill_value=0).rename("GS Maturity")
-    cbn_maturity = cbn_maturity_php_series.add(cbn_maturity_usd_series, fill_value=0).rename("CBN Maturity")
-    total_maturity = gs_maturity.add(cbn_maturity, fill_value=0).rename("Total Maturity")
-    cumulative_maturity = total_maturity.cumsum().rename("Cumulative Maturity")
-
-    total_coupon_maturity = total_coupon.add(total_maturity, fill_value=0).rename("Total Coupon + Maturity")
-    cumulative_coupon_maturity = total_coupon_maturity.cumsum().rename("Cumulative Total")
-
-    # Create final DataFrame
-    summary_df = pd.concat([
-        gs_coupon, cbn_coupon, total_coupon, cumulative_coupon,
-        gs_maturity, cbn_maturity, total_maturity, cumulative_maturity,
-        total_coupon_maturity, cumulative_coupon_maturity
-    ], axis=1).fillna(0)
-
-    summary_df.index = summary_df.index.astype(str)
-    scaled_df = summary_df.applymap(scale)
+    # Load all matched files (concurrently) into one long frame, then summarize
+    flows = cached_fund_flows(file_keys(uploaded_files), uploaded_files)
+    summary_df = coupon_maturity_summary(flows)
+    scaled_df = summary_df * (1 / 1_000_000 if display_mode == "Millions" else 1)
 
     # Display in app
     table_title = f"📋 Summary Table (Figures in {'Millions' if display_mode == 'Millions' else 'Actual'})"
@@ -110,51 +310,29 @@ def show_coupon_maturity_summary_page():
     csv = scaled_df.reset_index().to_csv(index=False).encode("utf-8")
     st.download_button("📥 Download Table as CSV", csv, file_name="coupon_maturity_summary.csv", mime="text/csv")
 
-    # 🖼️ PNG Export
-    if st.button("🖼️ Download Table as PNG"):
-        formatted_df = scaled_df.copy().applymap(lambda x: f"{x:,.2f}")
-        formatted_df.insert(0, "Month", formatted_df.index)
-
-        # Define column groups
-        coupon_cols = ["GS Coupon", "CBN Coupon", "Total Coupon", "Cumulative Coupon"]
-        maturity_cols = ["GS Maturity", "CBN Maturity", "Total Maturity", "Cumulative Maturity"]
-        combined_cols = ["Total Coupon + Maturity", "Cumulative Total"]
-
-        coupon_df = formatted_df[["Month"] + coupon_cols]
-        maturity_df = formatted_df[["Month"] + maturity_cols]
-        combined_df = formatted_df[["Month"] + combined_cols]
-
-        row_height = 0.25
-        fig_height = len(formatted_df) * row_height + 6
-        fig, ax = plt.subplots(figsize=(16, fig_height))
-        ax.axis("off")
-
-        mode_label = "(Figures in Millions)" if display_mode == "Millions" else "(Figures in Actual)"
-
-        def draw_table_and_title(ax, df, title, y_offset):
-            ax.text(0, y_offset, f"{title} {mode_label}", fontsize=14, fontweight='bold', ha='left', va='bottom')
-            table = ax.table(
-                cellText=df.values,
-                colLabels=df.columns,
-                cellLoc='center',
-                loc='upper center',
-                bbox=[0, y_offset - 0.22, 1, 0.2]
+    # 🖼️ Table Export (rendered in the background)
+    export_format = st.selectbox("Table export format:", list(EXPORT_FORMATS), help="PDF and SVG are vector formats and render much faster than the 300-dpi PNG.")
+    export_key = (frame_hash(scaled_df), display_mode, export_format)
+    if st.button(f"🖼️ Render Table as {export_format}"):
+        st.session_state["coupon_maturity_export"] = export_key
+        submit_table_export(scaled_df, display_mode, export_format)
+
+    if st.session_state.get("coupon_maturity_export") == export_key:
+        future = submit_table_export(scaled_df, display_mode, export_format)
+        if not future.done():
+            st.info("Rendering the table export in the background. You can keep working on the page.")
+            st.button("🔄 Check export status")
+        elif future.exception() is not None:
+            st.error(f"Error rendering the table export: {future.exception()}")
+        else:
+            extension, mime = EXPORT_FORMATS[export_format]
+            image = future.result()
+            if export_format == "PNG":
+                st.image(image, caption="Segmented Summary Table as PNG", use_column_width=True)
+            st.download_button(
+                f"Download {export_format}", data=image,
+                file_name=f"coupon_maturity_summary_segmented.{extension}", mime=mime
             )
-            table.auto_set_font_size(False)
-            table.set_fontsize(10)
-            table.scale(1, 1.2)
-
-        y_start = 0.95
-        spacing = 0.33
-
-        draw_table_and_title(ax, coupon_df, "📘 Coupon Summary", y_start)
-        draw_table_and_title(ax, maturity_df, "📙 Maturity Summary", y_start - spacing)
-        draw_table_and_title(ax, combined_df, "📗 Total Coupon + Maturity Summary", y_start - spacing * 2)
-
-        buf = io.BytesIO()
-        plt.savefig(buf, format="png", bbox_inches="tight", dpi=300)
-        st.image(buf, caption="Segmented Summary Table as PNG", use_column_width=True)
-        st.download_button("Download PNG", data=buf.getvalue(), file_name="coupon_maturity_summary_segmented.png", mime="image/png")
 
     # 📈 Chart Visualization
     st.subheader("📈 Visualize Trends")
@@ -0,0 +1,234 @@
+# db_ingest.py
+#
+# Set-based ingest for the SQLite market databases (stock_data in
+# ohlc_bbdata.db and stock_vwap.db, vwap_data in vwap_data.db). A batch is
+# loaded into a TEMP staging table, classified against the target's key
+# index, and inserted with one INSERT ... SELECT ... ON CONFLICT DO NOTHING,
+# all in one transaction. The existing keys are never read into pandas, so
+# the cost scales with the batch, not with the database.
+#
+# Each batch can be recorded as one row of ingest_audit in the same database
+# (counts, date range, throughput), with the skipped keys optionally stored
+# as zlib-compressed JSON.
+
+import json
+import time
+import zlib
+from datetime import datetime
+
+import pandas as pd
+
+from market_db_v2 import compat_layout, key_match_sql
+from price_mirror import price_keys
+
+AUDIT_TABLE = "ingest_audit"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_key_columns(conn, table):
+    """
+    Columns of the table's PRIMARY KEY, or of its first UNIQUE index if it has no declared primary key.
+
+    Raises:
+        ValueError: if the table does not exist or has no key
+    """
+    info = conn.execute(f"PRAGMA table_info({_quote(table)})").fetchall()
+    if not info:
+        raise ValueError(f"Table not found: {table}")
+    pk = sorted((row[5], row[1]) for row in info if row[5])
+    if pk:
+        return [name for _, name in pk]
+    for index in conn.execute(f"PRAGMA index_list({_quote(table)})").fetchall():
+        if index[2]:  # unique
+            return [row[2] for row in conn.execute(f"PRAGMA index_info({_quote(index[1])})")]
+    raise ValueError(f"Table {table} has no primary key or unique index to deduplicate on.")
+
+
+def _records(df):
+    """Row tuples with NaN/NA as NULL and numpy scalars as Python values."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def _range(row):
+    return (row[1], row[2]) if row and row[0] else (None, None)
+
+
+def bulk_upsert(conn, table, df, key_columns=None, range_column=None):
+    """
+    Insert the rows of `df` whose key is not yet in `table`; existing keys are left untouched.
+
+    Rows are staged in a TEMP table and inserted in one transaction. A key
+    repeated within the batch is inserted once (its first row).
+
+    Args:
+        conn (sqlite3.Connection): database connection
+        table (str): target table (must exist)
+        df (pd.DataFrame): rows to insert; columns are a subset of the table's columns
+        key_columns (list[str]): conflict key (default: the table's primary key / unique index)
+        range_column (str): column reported as the min/max range of inserted and skipped rows
+            (default: the date column, else the first key column)
+
+    Returns:
+        dict with "inserted" and "skipped" counts, "inserted_range" and
+        "skipped_range" (min, max) of `range_column`, "inserted_rows"
+        (pd.DataFrame of the inserted rows), "skipped_keys" (pd.DataFrame
+        of the keys that were already present or repeated in the batch) and
+        "seconds" (duration)
+    """
+    started = time.perf_counter()
+    # A v2 database exposes the legacy table as a view over a clustered table
+    layout = compat_layout(conn, table)
+    key_columns = list(key_columns or (layout["key"] if layout else table_key_columns(conn, table)))
+    columns = list(df.columns)
+    range_column = range_column or price_keys(columns)[0] or key_columns[0]
+    staging = _quote(f"_staging_{table}")
+    cols = ", ".join(map(_quote, columns))
+    if layout:
+        probe_table, key_match = layout["table"], key_match_sql(layout, "s", "t")
+    else:
+        probe_table = table
+        key_match = " AND ".join(f"t.{_quote(col)} = s.{_quote(col)}" for col in key_columns)
+    key_list = ", ".join(map(_quote, key_columns))
+
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+        # Same columns and affinities as the target, plus the row's ingest status
+        conn.execute(f"CREATE TEMP TABLE {staging} AS SELECT {cols} FROM {_quote(table)} WHERE 0")
+        conn.execute(f"ALTER TABLE temp.{staging} ADD COLUMN _status TEXT")
+        conn.executemany(
+            f"INSERT INTO temp.{staging} ({cols}) VALUES ({', '.join('?' * len(columns))})",
+            _records(df[columns]),
+        )
+        # Keys already in the table (one index probe per staged row) ...
+        conn.execute(f"""
+            UPDATE temp.{staging} AS s SET _status = 'existing'
+            WHERE EXISTS (SELECT 1 FROM {_quote(probe_table)} AS t WHERE {key_match})
+        """)
+        # ... and repeats within the batch
+        conn.execute(f"""
+            UPDATE temp.{staging} SET _status = 'repeated'
+            WHERE _status IS NULL AND rowid NOT IN (
+                SELECT MIN(rowid) FROM temp.{staging} WHERE _status IS NULL GROUP BY {key_list}
+            )
+        """)
+        # Views cannot take an upsert clause; their rows are already known to be new
+        conn.execute(f"""
+            INSERT INTO {_quote(table)} ({cols})
+            SELECT {cols} FROM temp.{staging} WHERE _status IS NULL ORDER BY rowid
+            {"" if layout else "ON CONFLICT DO NOTHING"}
+        """)
+        range_col = _quote(range_column)
+        inserted = conn.execute(
+            f"SELECT COUNT(*), MIN({range_col}), MAX({range_col}) FROM temp.{staging} WHERE _status IS NULL"
+        ).fetchone()
+        skipped = conn.execute(
+            f"SELECT COUNT(*), MIN({range_col}), MAX({range_col}) FROM temp.{staging} WHERE _status IS NOT NULL"
+        ).fetchone()
+        inserted_rows = pd.read_sql(
+            f"SELECT {cols} FROM temp.{staging} WHERE _status IS NULL ORDER BY rowid", conn
+        )
+        skipped_keys = pd.read_sql(
+            f"SELECT {key_list}, _status AS Reason FROM temp.{staging} WHERE _status IS NOT NULL ORDER BY rowid", conn
+        )
+        conn.execute(f"DROP TABLE temp.{staging}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {
+        "inserted": inserted[0],
+        "skipped": skipped[0],
+        "inserted_range": _range(inserted),
+        "skipped_range": _range(skipped),
+        "inserted_rows": inserted_rows,
+        "skipped_keys": skipped_keys,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def ensure_audit_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {AUDIT_TABLE} (
+            Batch_Id INTEGER PRIMARY KEY AUTOINCREMENT,
+            Ingested_At TEXT,
+            Target TEXT,
+            File_Name TEXT,
+            File_Hash TEXT,
+            Sheet TEXT,
+            Inserted INTEGER,
+            Skipped INTEGER,
+            Failed INTEGER,
+            Date_From TEXT,
+            Date_To TEXT,
+            Duration_Sec REAL,
+            Rows_Per_Sec REAL,
+            Detail BLOB
+        )
+    """)
+
+
+def record_ingest(conn, table, result=None, file_name=None, file_hash=None, sheet=None,
+                  failed=0, seconds=None, keep_detail=False):
+    """
+    Append one ingest_audit row for a batch.
+
+    Args:
+        conn (sqlite3.Connection): database connection
+        table (str): target table of the batch
+        result (dict): bulk_upsert() result (None if the batch failed)
+        failed (int): rows that could not be written
+        seconds (float): batch duration (default: result["seconds"])
+        keep_detail (bool): store the skipped keys as compressed JSON in Detail
+
+    Returns:
+        int: Batch_Id of the new row
+    """
+    ensure_audit_table(conn)
+    result = result or {}
+    inserted, skipped = result.get("inserted", 0), result.get("skipped", 0)
+    ranges = [r for r in (result.get("inserted_range"), result.get("skipped_range")) if r and r[0] is not None]
+    seconds = result.get("seconds", 0.0) if seconds is None else seconds
+    detail = None
+    if keep_detail and skipped:
+        detail = zlib.compress(result["skipped_keys"].to_json(orient="split", index=False).encode("utf-8"))
+    cursor = conn.execute(
+        f"""
+        INSERT INTO {AUDIT_TABLE} (
+            Ingested_At, Target, File_Name, File_Hash, Sheet, Inserted, Skipped, Failed,
+            Date_From, Date_To, Duration_Sec, Rows_Per_Sec, Detail
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            datetime.now().isoformat(timespec="seconds"), table, file_name, file_hash, sheet,
+            int(inserted), int(skipped), int(failed),
+            min((r[0] for r in ranges), default=None), max((r[1] for r in ranges), default=None),
+            seconds, (inserted + skipped + failed) / seconds if seconds else None, detail,
+        ),
+    )
+    conn.commit()
+    return cursor.lastrowid
+
+
+def read_ingest_history(conn, limit=200):
+    """Latest ingest_audit rows (without Detail), newest first; Has_Detail flags stored key detail."""
+    ensure_audit_table(conn)
+    return pd.read_sql(
+        f"""
+        SELECT Batch_Id, Ingested_At, Target, File_Name, File_Hash, Sheet, Inserted, Skipped, Failed,
+               Date_From, Date_To, Duration_Sec, Rows_Per_Sec, Detail IS NOT NULL AS Has_Detail
+        FROM {AUDIT_TABLE} ORDER BY Batch_Id DESC LIMIT ?
+        """,
+        conn, params=(limit,),
+    )
+
+
+def read_ingest_detail(conn, batch_id):
+    """Skipped keys stored for one batch (empty if none were kept)."""
+    row = conn.execute(f"SELECT Detail FROM {AUDIT_TABLE} WHERE Batch_Id = ?", (batch_id,)).fetchone()
+    if not row or row[0] is None:
+        return pd.DataFrame()
+    split = json.loads(zlib.decompress(row[0]).decode("utf-8"))
+    return pd.DataFrame(split["data"], columns=split["columns"])
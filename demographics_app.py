@@ -1,66 +1,324 @@
+import hashlib
+import io
+
+import numpy as np
 import streamlit as st
 import pandas as pd
 import altair as alt
 
+from demographics_ingest import DEFAULT_CHUNKSIZE, aggregate_extract
+from demographics_projection import (
+    DEFAULT_ASSUMPTIONS,
+    base_population,
+    population_pyramid,
+    project_cohorts,
+    scenario_grid,
+)
+
+FILL_SHEETS = [
+    "unique_counts_by_age_sex",
+    "unique_counts_by_sex_region",
+    "unique_counts_by_sex_membership",
+    "sum_by_sex_region",
+    "sum_by_sex_membership",
+    "sum_by_age_sex"
+]
+
+# Sheet prefix -> (value column, measure name in the cube)
+CUBE_MEASURES = {
+    "unique_counts_by_": ("SSNUM", "contributors"),
+    "sum_by_": ("TOTPREM", "contribution"),
+}
+CUBE_COLUMNS = ["age", "sex", "region", "membership", "measure", "value"]
+ALL = "All"
+
+
+def _dimension_column(columns, keyword):
+    for col in columns:
+        if keyword in str(col).upper():
+            return col
+    return None
+
+
+def build_demographics_cube(sheets):
+    """
+    Stack the aggregated sheets into one tidy (age, sex, region, membership, measure, value) table.
+
+    Dimensions a sheet is not broken down by are set to "All" (age: <NA>).
+    """
+    parts = []
+    for sheet_name, df in sheets.items():
+        prefix = next((p for p in CUBE_MEASURES if sheet_name.lower().startswith(p)), None)
+        if prefix is None:
+            continue
+        value_col, measure = CUBE_MEASURES[prefix]
+        if value_col not in df.columns or "SEX2" not in df.columns:
+            continue
+        age_col = "AGE24_INT" if "AGE24_INT" in df.columns else None
+        region_col = _dimension_column(df.columns, "REGION")
+        member_col = _dimension_column(df.columns, "MEMB")
+
+        no_age = pd.Series(pd.NA, index=df.index, dtype="Int64")
+        part = pd.DataFrame({
+            "age": pd.to_numeric(df[age_col], errors="coerce").round(0).astype("Int64") if age_col else no_age,
+            "sex": df["SEX2"].astype("string"),
+            "region": df[region_col].astype("string") if region_col else pd.Series(ALL, index=df.index, dtype="string"),
+            "membership": df[member_col].astype("string") if member_col else pd.Series(ALL, index=df.index, dtype="string"),
+            "measure": measure,
+            "value": pd.to_numeric(df[value_col], errors="coerce").fillna(0.0).astype("float64"),
+        })
+        # Rows without a breakdown value are subtotal/blank rows of the sheet
+        needed = part["sex"].notna()
+        for col, present in (("age", age_col), ("region", region_col), ("membership", member_col)):
+            if present:
+                needed &= part[col].notna()
+        parts.append(part[needed])
+
+    if not parts:
+        return pd.DataFrame(columns=CUBE_COLUMNS)
+    cube = pd.concat(parts, ignore_index=True)
+    for col in ["sex", "region", "membership", "measure"]:
+        cube[col] = cube[col].astype("category")
+    return cube[CUBE_COLUMNS]
+
+
+@st.cache_data(show_spinner=False, max_entries=5)
+def load_demographics_workbook(file_hash, _file_bytes):
+    """
+    Parse every sheet of the demographics workbook once per content hash.
+
+    Returns:
+        sheets (dict[str, pd.DataFrame]): raw sheets for the Sheet Viewer (SEX2 forward-filled)
+        cube (pd.DataFrame): tidy table used by every dashboard chart
+    """
+    sheets = pd.read_excel(io.BytesIO(_file_bytes), sheet_name=None)
+    for name, df in sheets.items():
+        if name.lower() in FILL_SHEETS and "SEX2" in df.columns:
+            df["SEX2"] = df["SEX2"].ffill()
+    return sheets, build_demographics_cube(sheets)
+
+
+@st.cache_data(show_spinner=False, max_entries=3)
+def load_member_extract(file_hash, file_format, chunksize, workers, _source):
+    """
+    Stream a member-level CSV/Parquet extract into workbook-style sheets and the cube.
+
+    Returns the same (sheets, cube) pair as load_demographics_workbook.
+    """
+    sheets = aggregate_extract(_source, file_format, chunksize=chunksize, workers=workers)
+    return sheets, build_demographics_cube(sheets)
+
+
+def cube_slice(cube, measure, by, region=ALL, membership=ALL):
+    """Sum of one measure by the `by` dimensions, taken from the rows matching the other filters."""
+    rows = cube[(cube["measure"] == measure)]
+    if "region" not in by:
+        rows = rows[rows["region"] == region]
+    if "membership" not in by:
+        rows = rows[rows["membership"] == membership]
+    if "age" in by:
+        rows = rows[rows["age"].notna()]
+    else:
+        rows = rows[rows["age"].isna()]
+    return rows.groupby(by, observed=True)["value"].sum().reset_index()
+
+
+def pyramid_frame(cube, measure, value_name, scale):
+    """Age x sex pyramid data: males negative, scaled, ages 14-100."""
+    df = cube_slice(cube, measure, ["age", "sex"])
+    df = df[df["age"].between(14, 100)]
+    wide = df.pivot(index="age", columns="sex", values="value").fillna(0)
+    chart = wide.reset_index().melt(id_vars="age", var_name="SEX2", value_name=value_name)
+    chart = chart.rename(columns={"age": "AGE24_INT"})
+    chart["AGE24_INT"] = chart["AGE24_INT"].astype(int)
+    chart[value_name] = np.where(chart["SEX2"] == "M", -1.0, 1.0) * chart[value_name] / scale
+    return chart, sorted(wide.index.astype(int), reverse=True)
+
+
+# Assumption -> (slider label, min, max, step, display format) for the projection sidebar
+PROJECTION_INPUTS = {
+    "entry_rate": ("Entry rate (% of actives per year)", 0.0, 0.30, 0.01, "%"),
+    "lapse_rate": ("Lapse rate (% per year)", 0.0, 0.40, 0.01, "%"),
+    "mortality_multiplier": ("Mortality multiplier", 0.5, 2.0, 0.05, "x"),
+    "retirement_age": ("Retirement age", 50, 70, 1, "age"),
+    "early_retirement_rate": ("Early retirement rate (% per year)", 0.0, 0.20, 0.01, "%"),
+    "contribution_growth": ("Contribution growth (% per year)", -0.05, 0.15, 0.005, "%"),
+    "interest_rate": ("Interest credited (% per year)", 0.0, 0.12, 0.005, "%"),
+}
+
+
+@st.cache_data(show_spinner=False)
+def cached_projection(counts, per_member, scenarios, years, start_year):
+    return project_cohorts(counts, per_member, scenarios, years=years, start_year=start_year)
+
+
+def projection_sidebar(allow_sweep=True):
+    """
+    Sidebar inputs for the cohort projection.
+
+    Returns:
+        years (int), start_year (int), scenarios (pd.DataFrame, one row per scenario)
+    """
+    st.sidebar.subheader("Projection Assumptions")
+    years = st.sidebar.slider("Projection years", min_value=5, max_value=50, value=30)
+    start_year = st.sidebar.number_input("Base year", min_value=2000, max_value=2100, value=pd.Timestamp.today().year)
+    base = {}
+    with st.sidebar.expander("Rates", expanded=False):
+        for key, (label, lo, hi, step, kind) in PROJECTION_INPUTS.items():
+            default = DEFAULT_ASSUMPTIONS[key]
+            if kind == "age":
+                base[key] = st.slider(label, int(lo), int(hi), int(default), int(step))
+            elif kind == "%":
+                base[key] = st.slider(label, lo * 100, hi * 100, default * 100, step * 100) / 100
+            else:
+                base[key] = st.slider(label, lo, hi, float(default), step)
+
+    sweep_labels = {PROJECTION_INPUTS[key][0]: key for key in PROJECTION_INPUTS}
+    sweep_choice = "None"
+    if allow_sweep:
+        sweep_choice = st.sidebar.selectbox("Sweep an assumption:", ["None"] + list(sweep_labels))
+    values = ()
+    if sweep_choice != "None":
+        key = sweep_labels[sweep_choice]
+        _, lo, hi, step, kind = PROJECTION_INPUTS[key]
+        factor = 100 if kind == "%" else 1
+        low, high = st.sidebar.slider(
+            "Sweep range", float(lo) * factor, float(hi) * factor,
+            (float(lo) * factor, float(hi) * factor), float(step) * factor
+        )
+        points = st.sidebar.slider("Scenarios", min_value=2, max_value=25, value=5)
+        values = np.linspace(low, high, points) / factor
+        if kind == "age":
+            values = np.unique(np.round(values))
+    return years, int(start_year), scenario_grid(base, sweep_labels.get(sweep_choice), values)
+
+
+def show_projection_view(cube):
+    """Cohort projection of the uploaded population, with an optional sweep over one assumption."""
+    ages, counts, per_member = base_population(cube)
+    if counts.sum() == 0:
+        st.warning("The age/sex contributor counts (Unique_Counts_by_AGE_SEX) are needed for the projection.")
+        return
+
+    years, start_year, scenarios = projection_sidebar()
+    summary, population = cached_projection(counts, per_member, scenarios, years, start_year)
+
+    st.subheader("Projected Contributions and Benefit Outflows")
+    flows = summary.melt(
+        id_vars=["Scenario", "Year"], value_vars=["Contributions", "Outflows"],
+        var_name="Flow", value_name="Amount"
+    )
+    flows["Amount"] = flows["Amount"] / 1e6
+    flow_chart = alt.Chart(flows).mark_line().encode(
+        x=alt.X("Year:O", title="Year"),
+        y=alt.Y("Amount:Q", title="Amount (Millions)", axis=alt.Axis(format=",.1f")),
+        color=alt.Color("Scenario:N", sort=list(scenarios.index)),
+        strokeDash=alt.StrokeDash("Flow:N", title="Flow"),
+        tooltip=["Scenario", "Year", "Flow", alt.Tooltip("Amount:Q", format=",.2f")]
+    ).properties(height=400)
+    st.altair_chart(flow_chart, use_container_width=True)
+
+    members = summary.assign(Members=summary["Active"] + summary["Inactive"])
+    member_chart = alt.Chart(members).mark_line().encode(
+        x=alt.X("Year:O", title="Year"),
+        y=alt.Y("Members:Q", title="Members", axis=alt.Axis(format=",.0f")),
+        color=alt.Color("Scenario:N", sort=list(scenarios.index)),
+        tooltip=["Scenario", "Year", alt.Tooltip("Active:Q", format=",.0f"), alt.Tooltip("Inactive:Q", format=",.0f")]
+    ).properties(height=300)
+    st.subheader("Projected Members (Active + Inactive)")
+    st.altair_chart(member_chart, use_container_width=True)
+
+    st.subheader("Projected Population Pyramid")
+    pyramid_scenario = st.selectbox("Scenario", list(scenarios.index)) if len(scenarios) > 1 else scenarios.index[0]
+    offset = st.slider("Years ahead", min_value=0, max_value=years, value=years)
+    df_pyramid = population_pyramid(population, ages, list(scenarios.index).index(pyramid_scenario), offset)
+    pyramid_chart = alt.Chart(df_pyramid).mark_bar().encode(
+        y=alt.Y('AGE24_INT:O', sort=sorted(ages, reverse=True), title='Age (years)'),
+        x=alt.X('Count:Q', title='Members (Thousands)', axis=alt.Axis(format=',.1f')),
+        color=alt.Color('SEX2:N', title='Sex', scale=alt.Scale(domain=['M', 'F'], range=['steelblue', 'salmon'])),
+        tooltip=[
+            alt.Tooltip('AGE24_INT:O', title='Age'),
+            alt.Tooltip('SEX2:N', title='Sex'),
+            alt.Tooltip('Count:Q', title='Members (K)', format=',.2f')
+        ]
+    ).properties(height=400)
+    st.altair_chart(pyramid_chart, use_container_width=True)
+
+    st.subheader("Projection Summary")
+    st.dataframe(summary.style.format({col: "{:,.0f}" for col in summary.columns if col not in ("Scenario", "Year")}))
+    st.download_button(
+        label="Download Projection as CSV",
+        data=summary.to_csv(index=False).encode('utf-8'),
+        file_name="cohort_projection.csv", mime="text/csv"
+    )
+
 
 def show_demographics_page():
     st.header("Excel Sheet Viewer")
 
-    # File uploader
-    event_file = st.sidebar.file_uploader(
-        label="Upload an Excel file",
-        type=["xlsx"]
+    data_source = st.sidebar.radio(
+        "Data source:",
+        ("Aggregated workbook (.xlsx)", "Member-level extract (CSV/Parquet)")
     )
 
-    if not event_file:
-        st.info("Please upload an Excel (.xlsx) file to get started.")
-        return
+    if data_source == "Aggregated workbook (.xlsx)":
+        # File uploader
+        event_file = st.sidebar.file_uploader(
+            label="Upload an Excel file",
+            type=["xlsx"]
+        )
+        if not event_file:
+            st.info("Please upload an Excel (.xlsx) file to get started.")
+            return
+    else:
+        event_file = st.sidebar.file_uploader(
+            label="Upload a member-level extract",
+            type=["csv", "parquet"]
+        )
+        with st.sidebar.expander("Extract processing"):
+            chunksize = st.number_input(
+                "Rows per chunk", min_value=50_000, max_value=5_000_000,
+                value=DEFAULT_CHUNKSIZE, step=50_000
+            )
+            workers = st.slider("Worker threads", min_value=1, max_value=16, value=4)
+        if not event_file:
+            st.info(
+                "Please upload a member-level extract (CSV or Parquet) with SSNUM, SEX2 and TOTPREM "
+                "columns (AGE24_INT, REGION and MEMBERSHIP are optional)."
+            )
+            return
 
     try:
-        excel_data = pd.ExcelFile(event_file)
-        sheet_names = excel_data.sheet_names
+        file_bytes = event_file.getvalue()
+        file_hash = hashlib.sha1(file_bytes).hexdigest()
+        if data_source == "Aggregated workbook (.xlsx)":
+            sheets, cube = load_demographics_workbook(file_hash, file_bytes)
+        else:
+            file_format = "parquet" if event_file.name.lower().endswith(".parquet") else "csv"
+            with st.spinner("Aggregating extract..."):
+                sheets, cube = load_member_extract(
+                    file_hash, file_format, int(chunksize), workers, io.BytesIO(file_bytes)
+                )
+            summary = sheets["Extract_Summary"].iloc[0]
+            st.caption(
+                f"Aggregated {summary['Rows']:,.0f} records in {summary['Chunks']:,.0f} chunks. "
+                f"Contributor counts are HyperLogLog estimates (about ±{104 / 2 ** (summary['HLL_Precision'] / 2):.1f}%)."
+            )
+        sheet_names = list(sheets)
 
         view_mode = st.sidebar.radio(
             "View options:",
-            ("Summary Dashboard", "Sheet Viewer")
+            ("Summary Dashboard", "Cohort Projection", "Sheet Viewer")
         )
 
-        fill_sheets = [
-            "unique_counts_by_age_sex",
-            "unique_counts_by_sex_region",
-            "unique_counts_by_sex_membership",
-            "sum_by_sex_region",
-            "sum_by_sex_membership",
-            "sum_by_age_sex"
-        ]
-
         if view_mode == "Summary Dashboard":
             # (Insert the existing dashboard code here exactly as in the original,
             # but without `st.set_page_config` and the top-level `st.title`.)
             # E.g., Contribution Pyramid and Count Pyramid sections...
             
             # Contribution Pyramid by Age and Sex
-            age_sheet = "sum_by_AGE_SEX"
-            if age_sheet in sheet_names:
-                df_age = pd.read_excel(event_file, sheet_name=age_sheet)
-                if 'SEX2' in df_age.columns:
-                    df_age['SEX2'] = df_age['SEX2'].fillna(method='ffill')
-                df_age['AGE24_INT'] = pd.to_numeric(df_age['AGE24_INT'], errors='coerce')
-                df_age = df_age.dropna(subset=['AGE24_INT'])
-                df_age['AGE24_INT'] = df_age['AGE24_INT'].astype(int)
-                df_age = df_age[df_age['AGE24_INT'].between(14, 100)]
-                df_age['TOTPREM'] = pd.to_numeric(df_age['TOTPREM'], errors='coerce').fillna(0)
-
-                df_pivot = df_age.groupby(['AGE24_INT', 'SEX2'])['TOTPREM'].sum().reset_index()
-                df_wide = df_pivot.pivot(index='AGE24_INT', columns='SEX2', values='TOTPREM').fillna(0)
-                age_vals = sorted(df_wide.index, reverse=True)
-                df_chart = df_wide.reset_index().melt(
-                    id_vars='AGE24_INT', var_name='SEX2', value_name='Amount'
-                )
-                df_chart['Amount'] = df_chart.apply(
-                    lambda r: -r['Amount']/1e6 if r['SEX2']=='M' else r['Amount']/1e6,
-                    axis=1
-                )
+            df_chart, age_vals = pyramid_frame(cube, "contribution", "Amount", 1e6)
+            if not df_chart.empty:
                 contrib_chart = alt.Chart(df_chart).mark_bar().encode(
                     y=alt.Y('AGE24_INT:O', sort=age_vals, title='Age (years)'),
                     x=alt.X('Amount:Q', title='Total Contribution (Millions)', axis=alt.Axis(format=',.1f')),
@@ -90,30 +348,11 @@ def show_demographics_page():
 """
                 )
             else:
-                st.warning(f"Sheet '{age_sheet}' not found.")
+                st.warning("Sheet 'sum_by_AGE_SEX' not found.")
 
             # Contributor Count Pyramid by Age and Sex
-            count_sheet = "Unique_Counts_by_AGE_SEX"
-            if count_sheet in sheet_names:
-                df_count = pd.read_excel(event_file, sheet_name=count_sheet)
-                if 'SEX2' in df_count.columns:
-                    df_count['SEX2'] = df_count['SEX2'].fillna(method='ffill')
-                df_count['AGE24_INT'] = pd.to_numeric(df_count['AGE24_INT'], errors='coerce')
-                df_count = df_count.dropna(subset=['AGE24_INT'])
-                df_count['AGE24_INT'] = df_count['AGE24_INT'].astype(int)
-                df_count = df_count[df_count['AGE24_INT'].between(14, 100)]
-                df_count['SSNUM'] = pd.to_numeric(df_count['SSNUM'], errors='coerce').fillna(0)
-
-                df_pivot2 = df_count.groupby(['AGE24_INT', 'SEX2'])['SSNUM'].sum().reset_index()
-                df_wide2 = df_pivot2.pivot(index='AGE24_INT', columns='SEX2', values='SSNUM').fillna(0)
-                age_vals2 = sorted(df_wide2.index, reverse=True)
-                df_chart2 = df_wide2.reset_index().melt(
-                    id_vars='AGE24_INT', var_name='SEX2', value_name='Count'
-                )
-                df_chart2['Count'] = df_chart2.apply(
-                    lambda r: -r['Count']/1e3 if r['SEX2']=='M' else r['Count']/1e3,
-                    axis=1
-                )
+            df_chart2, age_vals2 = pyramid_frame(cube, "contributors", "Count", 1e3)
+            if not df_chart2.empty:
                 count_chart = alt.Chart(df_chart2).mark_bar().encode(
                     y=alt.Y('AGE24_INT:O', sort=age_vals2, title='Age (years)'),
                     x=alt.X('Count:Q', title='Number of Contributors (Thousands)', axis=alt.Axis(format=',.1f')),
@@ -143,14 +382,15 @@ def show_demographics_page():
 """
                 )
             else:
-                st.warning(f"Sheet '{count_sheet}' not found.")
+                st.warning("Sheet 'Unique_Counts_by_AGE_SEX' not found.")
+
+        elif view_mode == "Cohort Projection":
+            show_projection_view(cube)
 
         else:
             # Sheet Viewer mode
             selected_sheet = st.sidebar.selectbox("Select a sheet to display:", sheet_names)
-            df = pd.read_excel(event_file, sheet_name=selected_sheet)
-            if selected_sheet.lower() in fill_sheets and 'SEX2' in df.columns:
-                df['SEX2'] = df['SEX2'].fillna(method='ffill')
+            df = sheets[selected_sheet]
             st.subheader(f"Sheet: {selected_sheet}")
             numeric_cols = df.select_dtypes(include='number').columns.tolist()
             if numeric_cols:
@@ -159,4 +399,4 @@ def show_demographics_page():
             else:
                 st.dataframe(df)
     except Exception as e:
-        st.error(f"Error reading Excel file: {e}")
\ No newline at end of file
+        st.error(f"Error reading file: {e}")
\ No newline at end of file
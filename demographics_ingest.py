@@ -0,0 +1,293 @@
+# demographics_ingest.py
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet extracts need pyarrow; CSV works without it
+    pq = None
+
+
+# Raw extract column -> accepted header names (first match wins, case-insensitive)
+EXTRACT_COLUMNS = {
+    "SSNUM": ["SSNUM", "SSS_NO", "MEMBER_ID"],
+    "AGE24_INT": ["AGE24_INT", "AGE"],
+    "SEX2": ["SEX2", "SEX", "GENDER"],
+    "REGION": ["REGION"],
+    "MEMBERSHIP": ["MEMBERSHIP", "MEMBERSHIP_TYPE", "MEMTYPE"],
+    "TOTPREM": ["TOTPREM", "PREMIUM", "AMOUNT"],
+}
+REQUIRED_COLUMNS = ["SSNUM", "SEX2", "TOTPREM"]
+
+# Output sheet suffix -> breakdown columns, same layout as the aggregated workbook
+GROUPINGS = {
+    "AGE_SEX": ["AGE24_INT", "SEX2"],
+    "SEX_REGION": ["SEX2", "REGION"],
+    "SEX_MEMBERSHIP": ["SEX2", "MEMBERSHIP"],
+}
+
+DEFAULT_CHUNKSIZE = 500_000
+DEFAULT_PRECISION = 14  # 2**14 registers per group, ~0.8% standard error
+
+
+# --- HyperLogLog ---
+
+def _hll_alpha(m):
+    return 0.7213 / (1 + 1.079 / m)
+
+
+def hll_registers(hashes, group_codes, n_groups, precision=DEFAULT_PRECISION):
+    """
+    HyperLogLog registers for each group from 64-bit hashes.
+
+    Args:
+        hashes (np.ndarray): uint64 hash per row
+        group_codes (np.ndarray): group number per row (0..n_groups-1)
+        n_groups (int): number of groups
+        precision (int): register index bits
+
+    Returns:
+        np.ndarray (n_groups, 2**precision) of uint8
+    """
+    m = 1 << precision
+    tail_bits = 64 - precision
+    index = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+    tail = hashes & np.uint64((1 << tail_bits) - 1)
+    # tail < 2**53, so the float conversion (and log2) is exact
+    with np.errstate(divide="ignore"):
+        rank = np.where(
+            tail == 0,
+            tail_bits + 1,
+            tail_bits - np.floor(np.log2(tail.astype(np.float64))),
+        ).astype(np.uint8)
+
+    registers = np.zeros((n_groups, m), dtype=np.uint8)
+    flat = group_codes.astype(np.int64) * m + index
+    best = pd.Series(rank).groupby(flat).max()
+    registers.reshape(-1)[best.index.to_numpy()] = best.to_numpy()
+    return registers
+
+
+def hll_estimate(registers):
+    """Distinct-count estimate for every row of a register matrix (with small-range correction)."""
+    m = registers.shape[1]
+    raw = _hll_alpha(m) * m * m / np.exp2(-registers.astype(np.float64)).sum(axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+# --- Chunk aggregation ---
+
+def resolve_extract_columns(header):
+    """Map the standard column names to the headers present in an extract."""
+    lookup = {str(col).strip().upper(): col for col in header}
+    resolved = {}
+    for name, candidates in EXTRACT_COLUMNS.items():
+        for candidate in candidates:
+            if candidate in lookup:
+                resolved[name] = lookup[candidate]
+                break
+    missing = [name for name in REQUIRED_COLUMNS if name not in resolved]
+    if missing:
+        raise ValueError(f"Extract is missing required column(s): {', '.join(missing)}")
+    return resolved
+
+
+def _clean_labels(values, transform):
+    """Normalize a low-cardinality text column through its distinct values only."""
+    cat = values.astype("category")
+    labels = transform(pd.Series(cat.cat.categories.astype(str), dtype=object))
+    # Code -1 (missing) picks the trailing NA
+    lookup = np.append(labels.to_numpy(dtype=object), None)
+    return pd.Series(lookup[cat.cat.codes.to_numpy()], index=values.index, dtype="category")
+
+
+def _normalize_chunk(chunk, resolved):
+    df = chunk[list(resolved.values())].rename(columns={v: k for k, v in resolved.items()})
+    out = pd.DataFrame(index=df.index)
+    if "AGE24_INT" in df.columns:
+        out["AGE24_INT"] = pd.to_numeric(df["AGE24_INT"], errors="coerce").round(0).astype("Int64")
+    out["SEX2"] = _clean_labels(df["SEX2"], lambda s: s.str.strip().str.upper().str[:1])
+    for col in ["REGION", "MEMBERSHIP"]:
+        if col in df.columns:
+            out[col] = _clean_labels(df[col], lambda s: s.str.strip())
+    out["TOTPREM"] = pd.to_numeric(df["TOTPREM"], errors="coerce").fillna(0.0)
+    # Hash the id as text so numeric and string chunks of the same member agree
+    ids = df["SSNUM"]
+    if not pd.api.types.is_object_dtype(ids):
+        ids = ids.astype(str).where(ids.notna())
+    out["_hash"] = pd.util.hash_array(ids.to_numpy(dtype=object))
+    out["_has_id"] = ids.notna().to_numpy()
+    return out
+
+
+def aggregate_chunk(chunk, resolved, precision=DEFAULT_PRECISION):
+    """
+    Partial aggregates of one chunk for every grouping the extract supports.
+
+    Returns:
+        dict: grouping -> (keys DataFrame, records, amounts, HLL registers)
+    """
+    df = _normalize_chunk(chunk, resolved)
+    partials = {}
+    for name, dims in GROUPINGS.items():
+        if any(dim not in df.columns for dim in dims):
+            continue
+        rows = df.dropna(subset=dims)
+        if rows.empty:
+            continue
+        grouped = rows.groupby(dims, observed=True, sort=False)
+        codes = grouped.ngroup().to_numpy()
+        sums = grouped.agg(Records=("TOTPREM", "size"), Amount=("TOTPREM", "sum"))
+        with_id = rows["_has_id"].to_numpy()
+        registers = hll_registers(
+            rows["_hash"].to_numpy()[with_id], codes[with_id], len(sums), precision
+        )
+        partials[name] = (
+            sums.index.to_frame(index=False),
+            sums["Records"].to_numpy(),
+            sums["Amount"].to_numpy(),
+            registers,
+        )
+    return partials
+
+
+class _GroupAccumulator:
+    """Running totals and merged HLL registers for one grouping (memory: groups x registers)."""
+
+    def __init__(self, dims, precision):
+        self.dims = dims
+        self.m = 1 << precision
+        self.slots = {}
+        self.records = np.zeros(0, dtype=np.int64)
+        self.amounts = np.zeros(0, dtype=np.float64)
+        self.registers = np.zeros((0, self.m), dtype=np.uint8)
+
+    def _grow(self, size):
+        if size <= len(self.records):
+            return
+        capacity = max(size, 2 * len(self.records), 64)
+        extra = capacity - len(self.records)
+        self.records = np.concatenate([self.records, np.zeros(extra, dtype=np.int64)])
+        self.amounts = np.concatenate([self.amounts, np.zeros(extra, dtype=np.float64)])
+        self.registers = np.vstack([self.registers, np.zeros((extra, self.m), dtype=np.uint8)])
+
+    def merge(self, keys, records, amounts, registers):
+        slots = np.array([
+            self.slots.setdefault(key, len(self.slots))
+            for key in keys.itertuples(index=False, name=None)
+        ], dtype=np.int64)
+        self._grow(len(self.slots))
+        np.add.at(self.records, slots, records)
+        np.add.at(self.amounts, slots, amounts)
+        self.registers[slots] = np.maximum(self.registers[slots], registers)
+
+    def result(self):
+        n = len(self.slots)
+        keys = pd.DataFrame(list(self.slots), columns=self.dims)
+        keys["SSNUM"] = np.round(hll_estimate(self.registers[:n])).astype(np.int64)
+        keys["TOTPREM"] = self.amounts[:n]
+        keys["RECORDS"] = self.records[:n]
+        return keys.sort_values(self.dims, kind="stable").reset_index(drop=True)
+
+
+# --- Readers ---
+
+def iter_extract_chunks(source, file_format="csv", chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Yield DataFrame chunks of a raw extract without loading it whole.
+
+    Args:
+        source: Path or file object
+        file_format (str): "csv" or "parquet"
+        chunksize (int): rows per chunk
+    """
+    if file_format == "parquet":
+        if pq is None:
+            raise ImportError("Reading Parquet extracts requires pyarrow.")
+        parquet = pq.ParquetFile(source)
+        resolved = resolve_extract_columns(parquet.schema_arrow.names)
+        for batch in parquet.iter_batches(batch_size=chunksize, columns=list(resolved.values())):
+            yield batch.to_pandas()
+        return
+
+    header = pd.read_csv(source, nrows=0).columns
+    if hasattr(source, "seek"):
+        source.seek(0)
+    resolved = resolve_extract_columns(header)
+    # Ids as text (stable hashing, no per-chunk dtype guessing); breakdowns as categories
+    dtypes = {resolved["SSNUM"]: str}
+    dtypes.update({resolved[col]: "category" for col in ["SEX2", "REGION", "MEMBERSHIP"] if col in resolved})
+    yield from pd.read_csv(
+        source,
+        usecols=list(resolved.values()),
+        dtype=dtypes,
+        skipinitialspace=True,
+        chunksize=chunksize,
+    )
+
+
+def aggregate_extract(source, file_format="csv", chunksize=DEFAULT_CHUNKSIZE, workers=4,
+                      precision=DEFAULT_PRECISION):
+    """
+    Stream a member-level extract into the aggregated demographics sheets.
+
+    Chunks are read sequentially and aggregated on a thread pool; at most
+    2 x workers chunks are held at once, so memory stays bounded by the chunk
+    size plus one HLL register row per group. Distinct SSNUM counts are
+    HyperLogLog estimates (relative error ~1.04 / sqrt(2**precision)).
+
+    Args:
+        source: Path or file object of a CSV or Parquet extract
+        file_format (str): "csv" or "parquet"
+        chunksize (int): rows per chunk
+        workers (int): aggregation threads
+        precision (int): HLL register index bits (4-18)
+
+    Returns:
+        dict[str, pd.DataFrame]: "Unique_Counts_by_*" and "sum_by_*" sheets in the workbook layout,
+        plus "Extract_Summary"
+    """
+    accumulators = {}
+    total_rows = 0
+    total_amount = 0.0
+    resolved = None
+
+    def collect(future):
+        for name, partial in future.result().items():
+            if name not in accumulators:
+                accumulators[name] = _GroupAccumulator(GROUPINGS[name], precision)
+            accumulators[name].merge(*partial)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for chunk in iter_extract_chunks(source, file_format, chunksize):
+            if resolved is None:
+                resolved = resolve_extract_columns(chunk.columns)
+            total_rows += len(chunk)
+            total_amount += pd.to_numeric(chunk[resolved["TOTPREM"]], errors="coerce").sum()
+            pending.add(pool.submit(aggregate_chunk, chunk, resolved, precision))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(future)
+        for future in pending:
+            collect(future)
+
+    sheets = {}
+    for name, acc in accumulators.items():
+        table = acc.result()
+        sheets[f"Unique_Counts_by_{name}"] = table.drop(columns=["TOTPREM"])
+        sheets[f"sum_by_{name}"] = table.drop(columns=["SSNUM"])
+    sheets["Extract_Summary"] = pd.DataFrame({
+        "Rows": [total_rows],
+        "TOTPREM": [total_amount],
+        "Chunks": [-(-total_rows // chunksize)],
+        "HLL_Precision": [precision],
+    })
+    return sheets
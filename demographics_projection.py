@@ -0,0 +1,205 @@
+# demographics_projection.py
+
+import numpy as np
+import pandas as pd
+
+SEXES = ["F", "M"]
+MIN_AGE = 14
+MAX_AGE = 100
+
+DEFAULT_ASSUMPTIONS = {
+    "entry_rate": 0.08,            # new members per year, share of the active population
+    "entry_age_mean": 25.0,
+    "entry_age_sd": 5.0,
+    "lapse_rate": 0.10,            # active members who stop contributing each year
+    "mortality_a": 5e-5,           # Gompertz mu(x) = a * exp(b * x)
+    "mortality_b": 0.09,
+    "male_mortality_factor": 1.3,
+    "mortality_multiplier": 1.0,
+    "early_retirement_age": 55,
+    "early_retirement_rate": 0.02,
+    "retirement_age": 60,          # every remaining member is paid out at this age
+    "contribution_growth": 0.04,   # growth of contributions per member per year
+    "interest_rate": 0.06,         # credited on member balances
+    "initial_balance_years": 3.0,  # starting balance, in years of current contributions
+}
+
+SUMMARY_COLUMNS = [
+    "Scenario", "Year", "Active", "Inactive", "Entrants", "Lapses", "Retirements", "Deaths",
+    "Contributions", "Retirement_Benefits", "Death_Benefits", "Outflows", "Net_Flow", "Fund_Balance",
+]
+
+
+def base_population(cube):
+    """
+    Starting contributors and contribution per contributor by sex x age from the demographics cube.
+
+    Returns:
+        ages (np.ndarray): MIN_AGE..MAX_AGE
+        counts (np.ndarray): (2, ages) contributors, rows in SEXES order
+        per_member (np.ndarray): (2, ages) yearly contribution per contributor
+    """
+    ages = np.arange(MIN_AGE, MAX_AGE + 1)
+    rows = cube[cube["age"].notna() & (cube["region"] == "All") & (cube["membership"] == "All")]
+    table = (
+        rows.groupby(["measure", "sex", "age"], observed=True)["value"].sum()
+        .unstack("age").reindex(columns=ages).fillna(0.0)
+    )
+
+    def measure(name):
+        if name not in table.index.get_level_values("measure"):
+            return np.zeros((len(SEXES), len(ages)))
+        return table.loc[name].reindex(SEXES).fillna(0.0).to_numpy()
+
+    counts = measure("contributors")
+    amounts = measure("contribution")
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_member = np.where(counts > 0, amounts / counts, 0.0)
+    return ages, counts, per_member
+
+
+def scenario_grid(base=None, sweep=None, values=()):
+    """
+    One row of assumptions per scenario: `base` with `sweep` set to each of `values`.
+
+    Returns:
+        pd.DataFrame indexed by Scenario label
+    """
+    base = {**DEFAULT_ASSUMPTIONS, **(base or {})}
+    if not sweep or len(values) == 0:
+        return pd.DataFrame([base], index=pd.Index(["Base"], name="Scenario"))
+    rows = [{**base, sweep: value} for value in values]
+    labels = [f"{sweep}={value:.4g}" for value in values]
+    return pd.DataFrame(rows, index=pd.Index(labels, name="Scenario"))
+
+
+def _column(scenarios, name):
+    """Assumption as an (S, 1, 1) array broadcasting over sex x age."""
+    return scenarios[name].to_numpy(dtype=np.float64)[:, None, None]
+
+
+def project_cohorts(counts, per_member, scenarios, years=30, start_year=None, ages=None):
+    """
+    Project contributors, contributions and benefit outflows for every scenario at once.
+
+    Populations and total member balances are (scenario x sex x age) arrays
+    for active and inactive (lapsed, still holding a balance) members. Each
+    projection year applies, in order: contributions and interest, deaths,
+    retirements (paid out as the member balance), lapses, ageing by one year
+    and new entrants.
+
+    Args:
+        counts (np.ndarray): (2, ages) starting contributors by sex x age
+        per_member (np.ndarray): (2, ages) yearly contribution per contributor
+        scenarios (pd.DataFrame): one row of assumptions per scenario (see scenario_grid)
+        years (int): projection horizon
+        start_year (int): calendar year of the starting population (default: current year)
+        ages (np.ndarray): ages of the columns (default: MIN_AGE..MAX_AGE)
+
+    Returns:
+        summary (pd.DataFrame): SUMMARY_COLUMNS, one row per scenario and year
+        population (np.ndarray): (scenarios, years + 1, 2, ages) active + inactive members
+    """
+    ages = np.arange(MIN_AGE, MAX_AGE + 1) if ages is None else np.asarray(ages)
+    start_year = pd.Timestamp.today().year if start_year is None else start_year
+    n_scen = len(scenarios)
+    shape = (n_scen, len(SEXES), len(ages))
+    age = ages[None, None, :].astype(np.float64)
+
+    # Rates by scenario x sex x age
+    male = np.array([0.0, 1.0])[None, :, None]
+    mu = (
+        _column(scenarios, "mortality_a") * np.exp(_column(scenarios, "mortality_b") * age)
+        * _column(scenarios, "mortality_multiplier")
+        * (1 + male * (_column(scenarios, "male_mortality_factor") - 1))
+    )
+    death_rate = 1 - np.exp(-mu)
+    retirement_age = _column(scenarios, "retirement_age")
+    retire_rate = np.where(
+        age >= retirement_age, 1.0,
+        np.where(age >= _column(scenarios, "early_retirement_age"), _column(scenarios, "early_retirement_rate"), 0.0),
+    )
+    lapse_rate = np.where(age < retirement_age, _column(scenarios, "lapse_rate"), 0.0)
+    entry_profile = np.exp(-0.5 * ((age - _column(scenarios, "entry_age_mean")) / _column(scenarios, "entry_age_sd")) ** 2)
+    entry_profile = np.where(age < retirement_age, entry_profile, 0.0)
+    entry_profile = entry_profile / entry_profile.sum(axis=2, keepdims=True)
+    total = counts.sum()
+    sex_share = (counts.sum(axis=1) / total if total > 0 else np.full(len(SEXES), 1 / len(SEXES)))[None, :, None]
+    entry_rate = _column(scenarios, "entry_rate")
+    growth = _column(scenarios, "contribution_growth")
+    interest = _column(scenarios, "interest_rate")
+
+    active = np.broadcast_to(counts, shape).astype(np.float64)
+    inactive = np.zeros(shape)
+    balance_active = active * per_member * _column(scenarios, "initial_balance_years")
+    balance_inactive = np.zeros(shape)
+
+    population = np.empty((n_scen, years + 1) + shape[1:])
+    population[:, 0] = active + inactive
+    metrics = {name: np.empty((n_scen, years)) for name in SUMMARY_COLUMNS[2:]}
+
+    for t in range(years):
+        # Contributions (mid-year) and interest
+        contributions = active * per_member * (1 + growth) ** (t + 1)
+        balance_active = balance_active * (1 + interest) + contributions * (1 + interest / 2)
+        balance_inactive = balance_inactive * (1 + interest)
+
+        # Deaths: balances paid to beneficiaries
+        deaths = (active + inactive) * death_rate
+        death_benefits = (balance_active + balance_inactive) * death_rate
+        active, inactive = active * (1 - death_rate), inactive * (1 - death_rate)
+        balance_active, balance_inactive = balance_active * (1 - death_rate), balance_inactive * (1 - death_rate)
+
+        # Retirements: balances paid out
+        retirements = (active + inactive) * retire_rate
+        retirement_benefits = (balance_active + balance_inactive) * retire_rate
+        active, inactive = active * (1 - retire_rate), inactive * (1 - retire_rate)
+        balance_active, balance_inactive = balance_active * (1 - retire_rate), balance_inactive * (1 - retire_rate)
+
+        # Lapses: stop contributing, keep the balance
+        lapses = active * lapse_rate
+        lapsed_balance = balance_active * lapse_rate
+        active, inactive = active - lapses, inactive + lapses
+        balance_active, balance_inactive = balance_active - lapsed_balance, balance_inactive + lapsed_balance
+
+        # Age by one year (everyone has retired before MAX_AGE)
+        active, inactive, balance_active, balance_inactive = (
+            np.concatenate([np.zeros(shape[:2] + (1,)), arr[:, :, :-1]], axis=2)
+            for arr in (active, inactive, balance_active, balance_inactive)
+        )
+
+        # New entrants, in proportion to the active population
+        entrants = entry_rate * active.sum(axis=(1, 2), keepdims=True) * sex_share * entry_profile
+        active = active + entrants
+
+        population[:, t + 1] = active + inactive
+        outflows = retirement_benefits + death_benefits
+        metrics["Active"][:, t] = active.sum(axis=(1, 2))
+        metrics["Inactive"][:, t] = inactive.sum(axis=(1, 2))
+        metrics["Entrants"][:, t] = entrants.sum(axis=(1, 2))
+        metrics["Lapses"][:, t] = lapses.sum(axis=(1, 2))
+        metrics["Retirements"][:, t] = retirements.sum(axis=(1, 2))
+        metrics["Deaths"][:, t] = deaths.sum(axis=(1, 2))
+        metrics["Contributions"][:, t] = contributions.sum(axis=(1, 2))
+        metrics["Retirement_Benefits"][:, t] = retirement_benefits.sum(axis=(1, 2))
+        metrics["Death_Benefits"][:, t] = death_benefits.sum(axis=(1, 2))
+        metrics["Outflows"][:, t] = outflows.sum(axis=(1, 2))
+        metrics["Net_Flow"][:, t] = metrics["Contributions"][:, t] - metrics["Outflows"][:, t]
+        metrics["Fund_Balance"][:, t] = (balance_active + balance_inactive).sum(axis=(1, 2))
+
+    summary = pd.DataFrame({
+        "Scenario": np.repeat(scenarios.index.to_numpy(), years),
+        "Year": np.tile(start_year + np.arange(1, years + 1), n_scen),
+        **{name: values.reshape(-1) for name, values in metrics.items()},
+    })
+    return summary[SUMMARY_COLUMNS], population
+
+
+def population_pyramid(population, ages, scenario=0, year_index=0, scale=1e3):
+    """Projected population of one scenario/year in the pyramid chart layout (males negative)."""
+    frame = pd.DataFrame(population[scenario, year_index].T, index=ages, columns=SEXES)
+    chart = frame.rename_axis("AGE24_INT").reset_index().melt(
+        id_vars="AGE24_INT", var_name="SEX2", value_name="Count"
+    )
+    chart["Count"] = np.where(chart["SEX2"] == "M", -1.0, 1.0) * chart["Count"] / scale
+    return chart
@@ -2,6 +2,9 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
+import os
+
+from price_panel import open_panels, panel_frame
 
 
 def show_equities_page():
@@ -9,13 +12,36 @@ def show_equities_page():
 
     # Load Price Dataset
     st.sidebar.header("Load Price Dataset")
-    uploaded_price_file = st.sidebar.file_uploader(
-        "Choose Price CSV", type=["csv"], key="price_uploader"
-    )
-    if uploaded_price_file is not None:
-        df_price = pd.read_csv(uploaded_price_file)
+    price_source = st.sidebar.radio("Price Source", ["CSV Upload", "OHLC Database"], key="price_source")
+    df_price = pd.DataFrame()
+    if price_source == "OHLC Database":
+        # Wide prices straight from the memory-mapped Date x Stock panels
+        db_path = st.sidebar.text_input("SQLite DB Path", "ohlc_bbdata.db", key="price_db_path")
+        if os.path.exists(db_path):
+            panels = open_panels(db_path, "stock_data")
+            fields = [name for name in panels if name not in ("dates", "symbols", "rows")]
+            field = st.sidebar.selectbox(
+                "Price Field", fields, index=fields.index("Close") if "Close" in fields else 0
+            )
+            symbols = panels["symbols"].tolist()
+            selected = st.sidebar.multiselect("Stocks", symbols, default=symbols, key="price_stocks")
+            dates = panels["dates"]
+            date_range = st.sidebar.date_input(
+                "Date Range", (dates[0].date(), dates[-1].date()) if len(dates) else (),
+                key="price_dates"
+            )
+            if selected and len(date_range) == 2:
+                prices = panel_frame(panels, field, date_range[0], date_range[1], selected)
+                df_price = prices.rename_axis(None, axis=1).reset_index()
+                df_price["Date"] = df_price["Date"].dt.date
+        else:
+            st.sidebar.error(f"Database file `{db_path}` not found.")
     else:
-        df_price = pd.DataFrame()
+        uploaded_price_file = st.sidebar.file_uploader(
+            "Choose Price CSV", type=["csv"], key="price_uploader"
+        )
+        if uploaded_price_file is not None:
+            df_price = pd.read_csv(uploaded_price_file)
 
     # Load Portfolio Returns and Weights
     st.sidebar.header("Load Portfolio Returns and Weights")
@@ -1,69 +1,108 @@
 # equity_market_prices.py
 
 import streamlit as st
-import sqlite3
 import pandas as pd
 import os
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
+from indicators import INDICATOR_COLUMNS, compute_indicators, indicator_settings
+from market_store import get_store
+
+# Sidebar indicator name -> indicators.py name
+INDICATOR_NAMES = {"RSI": "RSI", "MACD": "MACD", "DMI": "DMI", "Stochastics": "Stochastic"}
+PAGE_SIZES = [100, 500, 1000, 5000]
+
+
+def load_price_rows(db_path, table_name, stocks, start=None, end=None):
+    """Rows of `stocks` between `start` and `end` (filtered in SQL) with numeric OHLCV columns."""
+    df = get_store(db_path).get_prices(table_name, stocks, start, end, mirror=False)  # Date already normalized
+    df.drop(columns=['SourceFile'], errors='ignore', inplace=True)
+    for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def selection_indicators(db_path, table_name, db_mtime, stocks, end, names, params):
+    """
+    Indicators `names` for `stocks` on their full history up to `end`, in one
+    vectorized pass (cached per table version, selection and settings; the
+    last few selections only, as each entry holds a full-history frame).
+    """
+    df = load_price_rows(db_path, table_name, list(stocks), None, end)
+    if 'Stock' not in df.columns or not {'High', 'Low', 'Close'}.issubset(df.columns):
+        return df
+    return compute_indicators(df, list(names), dict(params))
+
 
 def show_equity_market_prices_page():
     st.header("Stock Data Viewer")
 
-    # Connect to the local SQLite database
+    # Shared read-only access to the local SQLite database
     db_path = os.path.join("data", "stock_prices.db")
-    conn = sqlite3.connect(db_path)
-
-    # Fetch available tables
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    tables = [row[0] for row in cursor.fetchall()]
+    if not os.path.exists(db_path):
+        st.error(f"Database file `{db_path}` not found.")
+        return
+    store = get_store(db_path)
+    tables = store.tables()
 
     # Sidebar: table selection
     table_name = st.sidebar.selectbox("Select table to load", tables)
     if not table_name:
         st.info("No tables found in the database.")
-        conn.close()
         return
 
-    # Load data
-    df = pd.read_sql(f'SELECT * FROM "{table_name}"', conn, parse_dates=["Date"])
-    df['Date'] = df['Date'].dt.normalize()
-    df.drop(columns=['SourceFile'], errors='ignore', inplace=True)
-
-    # Ensure numeric types
-    for col in ['Open', 'High', 'Low', 'Close', 'Volume']:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+    # View and indicator selection
+    view = st.sidebar.selectbox("Chart Type", ["Table", "Line", "Candlestick"])
+    indicators = st.sidebar.multiselect("Indicators", ["RSI", "MACD", "DMI", "Stochastics"])
+    params = indicator_settings(st.sidebar, key_prefix="equity")
 
-    # Filter stocks
-    stocks = df['Stock'].unique().tolist() if 'Stock' in df.columns else []
-    selected_stocks = st.sidebar.multiselect("Select Stock(s)", stocks, default=stocks)
+    # Stock list and date bounds come from metadata queries, not from the rows
+    stocks = store.list_symbols(table_name)
+    selected_stocks = st.sidebar.multiselect("Select Stock(s)", stocks, default=stocks[:1])
     if not selected_stocks:
         st.warning("Please select at least one stock.")
-        conn.close()
         return
-    data = df[df['Stock'].isin(selected_stocks)].copy()
+    first, last = store.date_bounds(table_name, selected_stocks)
+    if first is None:
+        st.info("No rows found for the selected stock(s).")
+        return
 
     # Date range filter
-    min_date, max_date = data['Date'].min(), data['Date'].max()
+    min_date, max_date = pd.Timestamp(first).date(), pd.Timestamp(last).date()
     start_date, end_date = st.sidebar.date_input(
         "Date range",
         value=(min_date, max_date),
         min_value=min_date,
         max_value=max_date
     )
-    data = data[(data['Date'] >= pd.to_datetime(start_date)) & (data['Date'] <= pd.to_datetime(end_date))]
-    data.sort_values('Date', inplace=True)
 
-    # View and indicator selection
-    view = st.sidebar.selectbox("Chart Type", ["Table", "Line", "Candlestick"])
-    indicators = st.sidebar.multiselect("Indicators", ["RSI", "MACD", "DMI", "Stochastics"])
+    # Only the selected stocks and dates are read; indicators need each stock's
+    # history before the start date, so they are computed up to the end date and cut after
+    names = tuple(INDICATOR_NAMES[ind] for ind in indicators)
+    if names:
+        data = selection_indicators(
+            db_path, table_name, os.path.getmtime(db_path), tuple(selected_stocks), str(end_date),
+            names, tuple(sorted(params.items()))
+        )
+        data = data[data['Date'] >= pd.to_datetime(start_date)]
+    else:
+        data = load_price_rows(db_path, table_name, selected_stocks, start_date, end_date)
+    data = data.sort_values(['Stock', 'Date'])
+    by_stock = list(data.groupby('Stock', sort=False))
+    indicator_cols = [col for cols in INDICATOR_COLUMNS.values() for col in cols]
 
-    # Display raw data
+    # Display raw data, one page at a time
     st.subheader("Data Table")
-    st.dataframe(data)
+    table = data.drop(columns=indicator_cols, errors='ignore')
+    col_size, col_page = st.columns(2)
+    page_size = col_size.selectbox("Rows per page", PAGE_SIZES, index=1, key="equity_page_size")
+    pages = max(1, -(-len(table) // page_size))
+    page = int(col_page.number_input("Page", min_value=1, max_value=pages, value=1, step=1))
+    st.dataframe(table.iloc[(page - 1) * page_size:page * page_size])
+    st.caption(f"{len(table):,} rows, page {page} of {pages}")
 
     # Plot price + volume
     if view != "Table" and not data.empty:
@@ -75,137 +114,104 @@ def show_equity_market_prices_page():
             vertical_spacing=0.02
         )
         # Price trace
-        if view == "Line":
-            fig.add_trace(
-                go.Scatter(x=data['Date'], y=data['Close'], name='Close'),
-                row=1, col=1
-            )
-        else:
+        for stock, rows in by_stock:
+            if view == "Line":
+                fig.add_trace(
+                    go.Scatter(x=rows['Date'], y=rows['Close'], name=stock),
+                    row=1, col=1
+                )
+            else:
+                fig.add_trace(
+                    go.Candlestick(
+                        x=rows['Date'],
+                        open=rows['Open'], high=rows['High'],
+                        low=rows['Low'], close=rows['Close'],
+                        name=stock
+                    ),
+                    row=1, col=1
+                )
+            # Volume bar trace
             fig.add_trace(
-                go.Candlestick(
-                    x=data['Date'],
-                    open=data['Open'], high=data['High'],
-                    low=data['Low'], close=data['Close'],
-                    name='Price'
-                ),
-                row=1, col=1
+                go.Bar(x=rows['Date'], y=rows['Volume'], name=f"{stock} Volume"),
+                row=2, col=1
             )
-        # Volume bar trace
-        fig.add_trace(
-            go.Bar(x=data['Date'], y=data['Volume'], name='Volume'),
-            row=2, col=1
+        fig.update_layout(
+            margin=dict(l=20, r=20, t=30, b=20), showlegend=len(by_stock) > 1,
+            xaxis_rangeslider_visible=False
         )
-        fig.update_layout(margin=dict(l=20, r=20, t=30, b=20), showlegend=False)
         st.subheader(f"{view} Chart with Volume")
         st.plotly_chart(fig, use_container_width=True)
 
-    # Initialize series dict for indicator series
-    series = {}
-
-    # Precompute indicator series if selected
-    if indicators and not data.empty:
-        if "RSI" in indicators and len(data) >= 15:
-            delta = data['Close'].diff()
-            gain = delta.clip(lower=0).rolling(14).mean()
-            loss = -delta.clip(upper=0).rolling(14).mean()
-            rs = gain / loss
-            series['RSI'] = 100 - (100 / (1 + rs))
-        if "MACD" in indicators and len(data) >= 26:
-            ema12 = data['Close'].ewm(span=12, adjust=False).mean()
-            ema26 = data['Close'].ewm(span=26, adjust=False).mean()
-            macd = ema12 - ema26
-            signal = macd.ewm(span=9, adjust=False).mean()
-            series['MACD'] = macd
-            series['Signal'] = signal
-        if "DMI" in indicators and len(data) >= 15:
-            h, l, c = data['High'], data['Low'], data['Close']
-            pdm = (h.diff()).clip(lower=0)
-            mdm = (-l.diff()).clip(lower=0)
-            tr = pd.concat([h - l, (h - c.shift()).abs(), (l - c.shift()).abs()], axis=1).max(axis=1)
-            series['DI+'] = 100 * pdm.rolling(14).sum() / tr.rolling(14).sum()
-            series['DI-'] = 100 * mdm.rolling(14).sum() / tr.rolling(14).sum()
-            series['ADX'] = (abs(series['DI+'] - series['DI-']) / (series['DI+'] + series['DI-'])).rolling(14).mean() * 100
-        if "Stochastics" in indicators and len(data) >= 14:
-            low14 = data['Low'].rolling(14).min()
-            high14 = data['High'].rolling(14).max()
-            K = 100 * (data['Close'] - low14) / (high14 - low14)
-            series['%K'] = K
-            series['%D'] = K.rolling(3).mean()
-
-    # Plot each indicator visually
-    if indicators and series:
-        for ind in indicators:
-            if ind == 'RSI' and 'RSI' in series:
-                fig_rsi = go.Figure(data=[go.Scatter(x=data['Date'], y=series['RSI'], name='RSI')])
-                fig_rsi.update_layout(title='RSI (14)', margin=dict(l=20, r=20, t=30, b=20))
-                st.plotly_chart(fig_rsi, use_container_width=True)
-            if ind == 'MACD' and 'MACD' in series and 'Signal' in series:
-                fig_macd = go.Figure()
-                fig_macd.add_trace(go.Scatter(x=data['Date'], y=series['MACD'], name='MACD'))
-                fig_macd.add_trace(go.Scatter(x=data['Date'], y=series['Signal'], name='Signal'))
-                fig_macd.update_layout(title='MACD (12,26,9)', margin=dict(l=20, r=20, t=30, b=20))
-                st.plotly_chart(fig_macd, use_container_width=True)
-            if ind == 'DMI' and 'ADX' in series:
-                fig_dmi = go.Figure()
-                fig_dmi.add_trace(go.Scatter(x=data['Date'], y=series['DI+'], name='DI+'))
-                fig_dmi.add_trace(go.Scatter(x=data['Date'], y=series['DI-'], name='DI-'))
-                fig_dmi.add_trace(go.Scatter(x=data['Date'], y=series['ADX'], name='ADX'))
-                fig_dmi.update_layout(title='DMI / ADX', margin=dict(l=20, r=20, t=30, b=20))
-                st.plotly_chart(fig_dmi, use_container_width=True)
-            if ind == 'Stochastics' and '%K' in series and '%D' in series:
-                fig_stoch = go.Figure()
-                fig_stoch.add_trace(go.Scatter(x=data['Date'], y=series['%K'], name='%K'))
-                fig_stoch.add_trace(go.Scatter(x=data['Date'], y=series['%D'], name='%D'))
-                fig_stoch.update_layout(title='Stochastics (14,3)', margin=dict(l=20, r=20, t=30, b=20))
-                st.plotly_chart(fig_stoch, use_container_width=True)
+    # Plot each indicator, one trace per stock
+    available = [
+        ind for ind in indicators
+        if set(INDICATOR_COLUMNS[INDICATOR_NAMES[ind]]).issubset(data.columns)
+        and data[INDICATOR_COLUMNS[INDICATOR_NAMES[ind]][0]].notna().any()
+    ]
+    titles = {
+        'RSI': f"RSI ({params['rsi_window']})",
+        'MACD': f"MACD ({params['macd_fast']},{params['macd_slow']},{params['macd_signal']})",
+        'DMI': f"DMI / ADX ({params['dmi_window']})",
+        'Stochastics': f"Stochastics ({params['stoch_window']},{params['stoch_smooth']})",
+    }
+    plotted = {'RSI': ['RSI'], 'MACD': ['MACD', 'Signal'], 'DMI': ['+DI', '-DI', 'ADX'], 'Stochastics': ['%K', '%D']}
+    if available:
+        for ind in available:
+            fig_ind = go.Figure()
+            for stock, rows in by_stock:
+                for col in plotted[ind]:
+                    name = col if len(by_stock) == 1 else f"{stock} {col}"
+                    fig_ind.add_trace(go.Scatter(x=rows['Date'], y=rows[col], name=name))
+            fig_ind.update_layout(title=titles[ind], margin=dict(l=20, r=20, t=30, b=20))
+            st.plotly_chart(fig_ind, use_container_width=True)
     elif indicators:
         st.warning("Not enough data points to compute selected indicators.")
     else:
         st.info("No indicators selected. Add indicators from the sidebar to display them.")
 
-    # Automated numeric analysis summary
+    # Automated numeric analysis summary, per stock
     analysis = []
-    if not data.empty:
+    for stock, rows in by_stock:
+        last = rows.iloc[-1]
         # Trend
-        start_p, end_p = data['Close'].iloc[0], data['Close'].iloc[-1]
+        start_p, end_p = rows['Close'].iloc[0], last['Close']
         trend = 'Upward' if end_p > start_p else 'Downward' if end_p < start_p else 'Sideways'
-        analysis.append(f"Trend: {trend} (from {start_p:.2f} to {end_p:.2f})")
+        analysis.append(f"**{stock}** Trend: {trend} (from {start_p:.2f} to {end_p:.2f})")
         # Candlestick pattern
-        if len(data) >= 2:
-            prev, curr = data.iloc[-2], data.iloc[-1]
-            if (curr['Close'] > curr['Open'] > prev['Close'] > prev['Open']):
-                analysis.append("Pattern: Bullish Engulfing")
-            elif (curr['Open'] > curr['Close'] < prev['Open'] < prev['Close']):
-                analysis.append("Pattern: Bearish Engulfing")
+        if len(rows) >= 2:
+            prev = rows.iloc[-2]
+            if (last['Close'] > last['Open'] > prev['Close'] > prev['Open']):
+                analysis.append(f"**{stock}** Pattern: Bullish Engulfing")
+            elif (last['Open'] > last['Close'] < prev['Open'] < prev['Close']):
+                analysis.append(f"**{stock}** Pattern: Bearish Engulfing")
             else:
-                analysis.append("Pattern: None detected")
+                analysis.append(f"**{stock}** Pattern: None detected")
         # Indicator values summary
-        if 'RSI' in series:
-            last = series['RSI'].iloc[-1]
-            analysis.append(f"RSI: {last:.1f} ({'Overbought' if last>70 else 'Oversold' if last<30 else 'Neutral'})")
-        if 'MACD' in series:
-            last_macd = series['MACD'].iloc[-1]
-            last_sig = series['Signal'].iloc[-1]
-            cross = ('Bullish crossover' if last_macd>last_sig and series['MACD'].iloc[-2]<=series['Signal'].iloc[-2]
-                     else 'Bearish crossover' if last_macd<last_sig and series['MACD'].iloc[-2]>=series['Signal'].iloc[-2]
+        if 'RSI' in available and pd.notna(last['RSI']):
+            rsi_val = last['RSI']
+            analysis.append(
+                f"**{stock}** RSI: {rsi_val:.1f} "
+                f"({'Overbought' if rsi_val>70 else 'Oversold' if rsi_val<30 else 'Neutral'})"
+            )
+        if 'MACD' in available and len(rows) >= 2 and pd.notna(last['MACD']):
+            prev = rows.iloc[-2]
+            last_macd, last_sig = last['MACD'], last['Signal']
+            cross = ('Bullish crossover' if last_macd>last_sig and prev['MACD']<=prev['Signal']
+                     else 'Bearish crossover' if last_macd<last_sig and prev['MACD']>=prev['Signal']
                      else 'No crossover')
             momentum = 'Bullish momentum' if last_macd>0 else 'Bearish momentum'
-            analysis.append(f"MACD: {last_macd:.2f}, Signal: {last_sig:.2f} ({cross}, {momentum})")
-        if 'ADX' in series:
-            dp = series['DI+'].iloc[-1]
-            dm = series['DI-'].iloc[-1]
-            adx_val = series['ADX'].iloc[-1]
-            strength = 'Strong' if adx_val>25 else 'Weak'
-            analysis.append(f"DMI/ADX: DI+ {dp:.1f}, DI- {dm:.1f}, ADX {adx_val:.1f} ({strength})")
-        if '%K' in series:
-            last_k = series['%K'].iloc[-1]
-            last_d = series['%D'].iloc[-1]
-            sig = 'Bullish' if last_k>last_d else 'Bearish'
-            analysis.append(f"Stochastics: %K {last_k:.1f}, %D {last_d:.1f} ({sig})")
+            analysis.append(f"**{stock}** MACD: {last_macd:.2f}, Signal: {last_sig:.2f} ({cross}, {momentum})")
+        if 'DMI' in available and pd.notna(last['ADX']):
+            strength = 'Strong' if last['ADX']>25 else 'Weak'
+            analysis.append(
+                f"**{stock}** DMI/ADX: +DI {last['+DI']:.1f}, -DI {last['-DI']:.1f}, "
+                f"ADX {last['ADX']:.1f} ({strength})"
+            )
+        if 'Stochastics' in available and pd.notna(last['%D']):
+            sig = 'Bullish' if last['%K']>last['%D'] else 'Bearish'
+            analysis.append(f"**{stock}** Stochastics: %K {last['%K']:.1f}, %D {last['%D']:.1f} ({sig})")
 
     if analysis:
         st.subheader("Automated Analysis")
         for item in analysis:
             st.markdown(f"• {item}")
-
-    conn.close()
@@ -3,15 +3,104 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 
+DATASETS = ["GS_Consolidated_Php", "GS_Consolidated_USD", "CBN_Php", "CBN_USD"]
+FUNDS = ["SSS", "EC", "FLEXI", "PESO", "MIA", "MPF", "NVPF"]
+
+
+def holdings_monthly_inflows(datasets, exchange_rate=None, funds=FUNDS):
+    """
+    Coupon and maturity inflows per fund and month from the holdings sheets.
+
+    Follows the Coupon Payment Report: semi-annual or quarterly coupons of
+    face * coupon / frequency from the issue date every 12 / frequency months
+    up to maturity, and the face amount at maturity. All rows and payments
+    are expanded with array arithmetic rather than a loop over dates.
+
+    Args:
+        datasets (dict): sheet name (DATASETS) -> holdings frame as loaded on the page
+        exchange_rate (float): Php per USD for the _USD sheets; None keeps USD
+        funds (list): funds with a Face_Amount_<fund> / <fund>_Outstanding column
+
+    Returns:
+        pd.DataFrame with Fund, Month, Coupon, Maturity
+    """
+    frames = []
+    for name, df in datasets.items():
+        if df is None or df.empty:
+            continue
+        gs = name.startswith("GS_Consolidated")
+        amount_cols = {f"Face_Amount_{fund}" if gs else f"{fund}_Outstanding": fund for fund in funds}
+        amount_cols = {col: fund for col, fund in amount_cols.items() if col in df.columns}
+        if not amount_cols or "Maturity_Date" not in df.columns:
+            continue
+        face = df[list(amount_cols)].apply(pd.to_numeric, errors="coerce")
+        if name.endswith("_USD") and exchange_rate:
+            face = face * exchange_rate
+        face = face.rename(columns=amount_cols).to_numpy(dtype="float64")  # (rows, funds)
+        fund_names = np.array(list(amount_cols.values()))
+
+        issue = pd.to_datetime(df.get("Issue_Date" if gs else "Issue_Value_Date"), errors="coerce")
+        maturity = pd.to_datetime(df["Maturity_Date"], errors="coerce")
+        freq = pd.to_numeric(df.get("Coupon_Freq" if gs else "Interest_Payment_Schedule"), errors="coerce")
+        coupon = pd.to_numeric(df.get("Coupon"), errors="coerce")
+
+        # Maturities: the face amount in the maturity month
+        rows, cols = np.nonzero(~np.isnan(face) & maturity.notna().to_numpy()[:, None])
+        frames.append(pd.DataFrame({
+            "Fund": fund_names[cols],
+            "Month": maturity.to_numpy()[rows],
+            "Type": "Maturity",
+            "Amount": face[rows, cols],
+        }))
+
+        # Coupons: payment k falls in month issue + k * step; the last one only
+        # if its (month-end clamped) day is not after the maturity day
+        valid = (issue.notna() & maturity.notna() & freq.isin([2, 4]) & coupon.notna()).to_numpy()
+        if not valid.any():
+            continue
+        issue, maturity = issue[valid], maturity[valid]
+        freq, coupon = freq[valid].to_numpy().astype(int), coupon[valid].to_numpy()
+        step = 12 // freq
+        issue_month = issue.dt.year.to_numpy() * 12 + issue.dt.month.to_numpy() - 1
+        span = maturity.dt.year.to_numpy() * 12 + maturity.dt.month.to_numpy() - 1 - issue_month
+        late_day = np.minimum(issue.dt.day.to_numpy(), maturity.dt.days_in_month.to_numpy()) > maturity.dt.day.to_numpy()
+        payments = span // step + 1 - ((span % step == 0) & late_day)
+        payments = np.maximum(payments, 0)
+        bond = np.repeat(np.arange(len(payments)), payments)
+        k = np.arange(len(bond)) - np.repeat(np.cumsum(payments) - payments, payments)
+        month = issue_month[bond] + k * step[bond]
+        months = pd.to_datetime(pd.DataFrame({"year": month // 12, "month": month % 12 + 1, "day": 1}))
+        per_payment = face[valid][bond] * (coupon / freq)[bond][:, None]  # (payments, funds)
+        rows, cols = np.nonzero(~np.isnan(per_payment))
+        frames.append(pd.DataFrame({
+            "Fund": fund_names[cols],
+            "Month": months.to_numpy()[rows],
+            "Type": "Coupon",
+            "Amount": per_payment[rows, cols],
+        }))
+
+    if not frames:
+        return pd.DataFrame(columns=["Fund", "Month", "Coupon", "Maturity"])
+    flows = pd.concat(frames, ignore_index=True)
+    flows["Month"] = flows["Month"].dt.to_period("M").dt.to_timestamp()
+    return (
+        flows.pivot_table(index=["Fund", "Month"], columns="Type", values="Amount", aggfunc="sum", fill_value=0.0)
+        .reindex(columns=["Coupon", "Maturity"], fill_value=0.0)
+        .rename_axis(None, axis=1)
+        .reset_index()
+    )
+
+
 def show_fixed_income_page():
     st.sidebar.title("📂 Fixed Income File Loader")
     uploaded_file = st.sidebar.file_uploader("Upload CSV or Excel file", type=["csv", "xlsx"])
 
-    dataset_names = ["GS_Consolidated_Php", "GS_Consolidated_USD", "CBN_Php", "CBN_USD"]
+    dataset_names = DATASETS
     selected_dataset = st.sidebar.radio("Select Dataset to View", options=dataset_names)
 
     exchange_rate = None
@@ -59,7 +148,7 @@ def show_fixed_income_page():
     df = data_storage[selected_dataset]
 
     if df is not None:
-        funds = ["SSS", "EC", "FLEXI", "PESO", "MIA", "MPF", "NVPF"]
+        funds = FUNDS
 
         for date_col in ["Issue_Date", "Issue_Value_Date", "Value_Date", "Maturity_Date"]:
             if date_col in df.columns:
@@ -155,7 +244,7 @@ def show_fixed_income_page():
         ### Maturities Report
         df_maturity = df[df["Maturity_Date"].between(start_date, end_date)]
 
-        funds = ["SSS", "EC", "FLEXI", "PESO", "MIA", "MPF", "NVPF"]
+        funds = FUNDS
         total_dict = {}
         conversion_applied = False
         for fund in funds:
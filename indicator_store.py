@@ -0,0 +1,230 @@
+# indicator_store.py
+#
+# Materialized technical indicators next to stock_data in the OHLC database.
+# stock_indicators holds one row per (Stock, Date) with the INDICATOR_COLUMNS
+# values; indicator_state holds, per stock and indicator, the IndicatorStream
+# state after the stock's last stored bar, so new bars are applied in O(1)
+# instead of recomputing the full history.
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from indicators import DEFAULT_PARAMS, INDICATOR_COLUMNS, IndicatorStream, bar_panel
+
+INDICATOR_TABLE = "stock_indicators"
+STATE_TABLE = "indicator_state"
+VALUE_COLUMNS = [col for cols in INDICATOR_COLUMNS.values() for col in cols]
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def ensure_indicator_tables(conn):
+    columns = ", ".join(f"{_quote(col)} REAL" for col in VALUE_COLUMNS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {INDICATOR_TABLE} (
+            Stock TEXT,
+            Date TEXT,
+            {columns},
+            PRIMARY KEY (Stock, Date)
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+            Stock TEXT,
+            Indicator TEXT,
+            Params TEXT,
+            Last_Date TEXT,
+            Bars INTEGER,
+            State TEXT,
+            PRIMARY KEY (Stock, Indicator)
+        )
+    """)
+
+
+def _params_key(params):
+    return json.dumps({**DEFAULT_PARAMS, **(params or {})}, sort_keys=True)
+
+
+def _date_text(dates):
+    return pd.to_datetime(pd.Series(dates)).dt.strftime("%Y-%m-%d").to_numpy()
+
+
+def _load_states(conn, stocks):
+    """{stock: (params, last_date, bars, state)} for stocks with a complete stored state."""
+    if not stocks:
+        return {}
+    rows = pd.read_sql(
+        f"SELECT * FROM {STATE_TABLE} WHERE Stock IN ({','.join('?' * len(stocks))})",
+        conn, params=list(stocks),
+    )
+    states = {}
+    for stock, group in rows.groupby("Stock"):
+        # All indicators must come from the same bar and parameters
+        if group["Last_Date"].nunique() != 1 or group["Params"].nunique() != 1:
+            continue
+        first = group.iloc[0]
+        states[stock] = (
+            first["Params"], first["Last_Date"], int(first["Bars"]),
+            {row.Indicator: json.loads(row.State) for row in group.itertuples()},
+        )
+    return states
+
+
+def _save(conn, stocks, stream, values, last_dates, bars, params):
+    """Write indicator rows (INSERT OR REPLACE) and the per-stock stream state."""
+    if len(values):
+        cols = ["Stock", "Date"] + VALUE_COLUMNS
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {INDICATOR_TABLE} ({', '.join(map(_quote, cols))}) "
+            f"VALUES ({', '.join('?' * len(cols))})",
+            # NaN -> NULL
+            values[cols].astype(object).where(values[cols].notna(), None).itertuples(index=False, name=None),
+        )
+    key = _params_key(params)
+    conn.executemany(
+        f"INSERT OR REPLACE INTO {STATE_TABLE} (Stock, Indicator, Params, Last_Date, Bars, State) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (stock, indicator, key, last_dates[i], int(bars[i]), json.dumps(state))
+            for i, stock in enumerate(stocks)
+            for indicator, state in stream.stock_state(i).items()
+        ],
+    )
+
+
+def _stream_rows(stream, rows):
+    """Step `stream` (one state row per stock of rows, sorted by stock) through rows bar by bar."""
+    panels, (bars, stock_codes, positions), _ = bar_panel(rows, ["High", "Low", "Close"])
+    active = np.zeros(panels["Close"].shape, dtype=bool)
+    active[bars, stock_codes] = True
+    results = stream.run(panels["High"], panels["Low"], panels["Close"], active)
+    out = rows.reset_index(drop=True)[["Stock", "Date"]].copy()
+    for name in VALUE_COLUMNS:
+        values = np.empty(len(out))
+        values[positions] = results[name][bars, stock_codes]
+        out[name] = values
+    counts = np.bincount(stock_codes, minlength=stream.n)
+    return out, counts
+
+
+def _read_prices(conn, stocks):
+    # Dates are stored as ISO text, so text order is date order
+    return pd.read_sql(
+        f"SELECT Stock, Date, High, Low, Close FROM stock_data WHERE Stock IN ({','.join('?' * len(stocks))})",
+        conn, params=list(stocks),
+    )
+
+
+def rebuild_indicators(conn, stocks=None, params=None):
+    """
+    Recompute indicators and stream state of `stocks` (default: all) from their full stock_data history.
+
+    Returns:
+        int: number of indicator rows written
+    """
+    ensure_indicator_tables(conn)
+    if stocks is None:
+        stocks = [row[0] for row in conn.execute("SELECT DISTINCT Stock FROM stock_data")]
+    stocks = sorted(set(stocks))
+    if not stocks:
+        return 0
+    placeholders = ",".join("?" * len(stocks))
+    conn.execute(f"DELETE FROM {INDICATOR_TABLE} WHERE Stock IN ({placeholders})", stocks)
+    conn.execute(f"DELETE FROM {STATE_TABLE} WHERE Stock IN ({placeholders})", stocks)
+
+    prices = _read_prices(conn, stocks)
+    stocks = sorted(prices["Stock"].unique())
+    if not stocks:
+        return 0
+    stream = IndicatorStream(len(stocks), params)
+    values, counts = _stream_rows(stream, prices)
+    last_dates = prices.groupby("Stock")["Date"].max().reindex(stocks).tolist()
+    _save(conn, stocks, stream, values, last_dates, counts, params)
+    conn.commit()
+    return len(values)
+
+
+def update_indicators(conn, new_rows, params=None):
+    """
+    Apply newly inserted stock_data rows to the stored indicator state.
+
+    Stocks whose new bars all come after their last processed bar are
+    advanced from the stored state, one step per new bar. Stocks without a
+    stored state, with different parameters, or with back-filled dates are
+    rebuilt from their full history.
+
+    Args:
+        conn (sqlite3.Connection): OHLC database connection
+        new_rows (pd.DataFrame): inserted rows with Stock, Date, High, Low, Close
+        params (dict): indicator parameters (default DEFAULT_PARAMS)
+
+    Returns:
+        dict with "advanced" and "rebuilt" stock lists
+    """
+    ensure_indicator_tables(conn)
+    if new_rows.empty:
+        return {"advanced": [], "rebuilt": []}
+    rows = new_rows[["Stock", "Date", "High", "Low", "Close"]].copy()
+    rows["Date"] = _date_text(rows["Date"])
+    for col in ["High", "Low", "Close"]:
+        rows[col] = pd.to_numeric(rows[col], errors="coerce")
+
+    stocks = sorted(rows["Stock"].unique())
+    states = _load_states(conn, stocks)
+    first_new = rows.groupby("Stock")["Date"].min()
+    key = _params_key(params)
+    advance = [
+        stock for stock in stocks
+        if stock in states and states[stock][0] == key and first_new[stock] > states[stock][1]
+    ]
+    rebuild = [stock for stock in stocks if stock not in advance]
+
+    if advance:
+        stream = IndicatorStream.from_states([states[stock][3] for stock in advance], params)
+        subset = rows[rows["Stock"].isin(advance)]
+        values, counts = _stream_rows(stream, subset)
+        last_dates = subset.groupby("Stock")["Date"].max().reindex(advance).tolist()
+        bars = [states[stock][2] + counts[i] for i, stock in enumerate(advance)]
+        _save(conn, advance, stream, values, last_dates, bars, params)
+        conn.commit()
+    if rebuild:
+        rebuild_indicators(conn, rebuild, params)
+    return {"advanced": advance, "rebuilt": rebuild}
+
+
+def ensure_indicators(conn, stocks, params=None):
+    """Build indicators for any of `stocks` that have no stored state yet; returns the stocks built."""
+    ensure_indicator_tables(conn)
+    states = _load_states(conn, list(stocks))
+    key = _params_key(params)
+    missing = [stock for stock in stocks if stock not in states or states[stock][0] != key]
+    if missing:
+        rebuild_indicators(conn, missing, params)
+    return missing
+
+
+def read_indicators(conn, stocks, start=None, end=None, columns=None):
+    """
+    Stored indicator values for `stocks` between `start` and `end` (inclusive), via the (Stock, Date) key.
+
+    Returns:
+        pd.DataFrame with Stock, Date (datetime.date) and the requested columns
+    """
+    columns = VALUE_COLUMNS if columns is None else [col for col in columns if col in VALUE_COLUMNS]
+    query = (
+        f"SELECT Stock, Date, {', '.join(map(_quote, columns))} FROM {INDICATOR_TABLE} "
+        f"WHERE Stock IN ({','.join('?' * len(stocks))})"
+    )
+    args = list(stocks)
+    if start is not None:
+        query += " AND Date >= ?"
+        args.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+    if end is not None:
+        query += " AND Date <= ?"
+        args.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+    df = pd.read_sql(query + " ORDER BY Stock, Date", conn, params=args)
+    df["Date"] = pd.to_datetime(df["Date"]).dt.date
+    return df
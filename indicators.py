@@ -0,0 +1,432 @@
+# indicators.py
+#
+# Technical indicators on (bar x stock) panels. Every function takes 2-D float
+# arrays with one column per stock and returns arrays of the same shape, so all
+# stocks are computed together. Columns are contiguous series; NaN rows at the
+# end (stocks with fewer bars) are left as NaN.
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_PARAMS = {
+    "rsi_window": 14,
+    "macd_fast": 12,
+    "macd_slow": 26,
+    "macd_signal": 9,
+    "stoch_window": 14,
+    "stoch_smooth": 3,
+    "dmi_window": 14,
+    "smoothing": "wilder",
+}
+SMOOTHING_METHODS = {"wilder": "Wilder (RMA)", "sma": "Simple moving average"}
+INDICATOR_COLUMNS = {
+    "RSI": ["RSI"],
+    "MACD": ["MACD", "Signal", "Hist"],
+    "Stochastic": ["%K", "%D"],
+    "DMI": ["+DI", "-DI", "ADX"],
+}
+
+
+# --- Window primitives ---
+
+def _as_2d(values):
+    arr = np.asarray(values, dtype=np.float64)
+    return arr[:, None] if arr.ndim == 1 else arr
+
+
+def shift(a, periods=1):
+    """Shift rows down by `periods` (NaN fill)."""
+    a = _as_2d(a)
+    out = np.full_like(a, np.nan)
+    if periods < len(a):
+        out[periods:] = a[:len(a) - periods]
+    return out
+
+
+def rolling_sum(a, window):
+    """
+    Sum over the last `window` rows; NaN unless the whole window is present.
+
+    `window` is an int or one window per column (e.g. to compute several
+    window lengths in one pass over tiled columns).
+    """
+    a = _as_2d(a)
+    valid = ~np.isnan(a)
+    zeros = np.zeros((1, a.shape[1]))
+    total = np.concatenate([zeros, np.cumsum(np.where(valid, a, 0.0), axis=0)])
+    count = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+    if np.ndim(window) == 0:
+        out = np.full_like(a, np.nan)
+        if window <= len(a):
+            window_sum = total[window:] - total[:-window]
+            out[window - 1:] = np.where(count[window:] - count[:-window] == window, window_sum, np.nan)
+        return out
+    windows = np.broadcast_to(np.asarray(window, dtype=np.int64), (a.shape[1],))
+    end = np.arange(1, len(a) + 1)[:, None]
+    start = end - windows[None, :]
+    cols = np.arange(a.shape[1])[None, :]
+    inside = start >= 0
+    start = np.maximum(start, 0)
+    full = inside & (count[end, cols] - count[start, cols] == windows)
+    return np.where(full, total[end, cols] - total[start, cols], np.nan)
+
+
+def rolling_mean(a, window):
+    return rolling_sum(a, window) / window
+
+
+def rolling_max(a, window):
+    a = _as_2d(a)
+    out = np.full_like(a, np.nan)
+    if window <= len(a):
+        out[window - 1:] = sliding_window_view(a, window, axis=0).max(axis=-1)
+    return out
+
+
+def rolling_min(a, window):
+    a = _as_2d(a)
+    out = np.full_like(a, np.nan)
+    if window <= len(a):
+        out[window - 1:] = sliding_window_view(a, window, axis=0).min(axis=-1)
+    return out
+
+
+def ema(a, span=None, alpha=None):
+    """Exponential moving average (pandas ewm(adjust=False)), started at each column's first value."""
+    a = _as_2d(a)
+    alpha = 2.0 / (span + 1.0) if alpha is None else alpha
+    out = np.full_like(a, np.nan)
+    state = np.full(a.shape[1], np.nan)
+    for t in range(len(a)):
+        x = a[t]
+        state = np.where(np.isnan(state), x, np.where(np.isnan(x), state, state + alpha * (x - state)))
+        out[t] = np.where(np.isnan(x), np.nan, state)
+    return out
+
+
+def wilder(a, window):
+    """Wilder's smoothing (RMA): seeded with the first full-window mean, then alpha = 1 / window."""
+    a = _as_2d(a)
+    seed = rolling_mean(a, window)
+    out = np.full_like(a, np.nan)
+    state = np.full(a.shape[1], np.nan)
+    for t in range(len(a)):
+        x = a[t]
+        state = np.where(np.isnan(state), seed[t], np.where(np.isnan(x), state, state + (x - state) / window))
+        out[t] = np.where(np.isnan(x), np.nan, state)
+    return out
+
+
+def smooth(a, window, method="wilder"):
+    """Average of the last `window` rows: "wilder" (RMA) or "sma"."""
+    if method == "wilder":
+        return wilder(a, window)
+    if method == "sma":
+        return rolling_mean(a, window)
+    raise ValueError(f"Unknown smoothing method: {method}")
+
+
+# --- Indicators ---
+
+def rsi(close, window=14, smoothing="wilder"):
+    close = _as_2d(close)
+    delta = close - shift(close)
+    gain = np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0))
+    loss = np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0))
+    avg_gain = smooth(gain, window, smoothing)
+    avg_loss = smooth(loss, window, smoothing)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), 100 - 100 / (1 + avg_gain / avg_loss))
+
+
+def macd(close, fast=12, slow=26, signal=9):
+    """Returns MACD line, signal line and histogram."""
+    line = ema(close, span=fast) - ema(close, span=slow)
+    signal_line = ema(line, span=signal)
+    return line, signal_line, line - signal_line
+
+
+def stochastic(high, low, close, window=14, smooth_window=3):
+    """Returns %K and %D."""
+    lowest = rolling_min(low, window)
+    highest = rolling_max(high, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        k = 100 * (_as_2d(close) - lowest) / (highest - lowest)
+    return k, rolling_mean(k, smooth_window)
+
+
+def true_range(high, low, close):
+    high, low = _as_2d(high), _as_2d(low)
+    prev_close = shift(close)
+    # fmax ignores the missing previous close on the first bar
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def dmi(high, low, close, window=14, smoothing="wilder"):
+    """
+    Directional movement: returns +DI, -DI and ADX.
+
+    +DM is the up move when it exceeds the down move (and is positive), -DM
+    the down move when it exceeds the up move; TR, +DM, -DM and DX are
+    averaged with `smoothing`.
+    """
+    high, low = _as_2d(high), _as_2d(low)
+    up = high - shift(high)
+    down = shift(low) - low
+    missing = np.isnan(up) | np.isnan(down)
+    plus_dm = np.where(missing, np.nan, np.where((up > down) & (up > 0), up, 0.0))
+    minus_dm = np.where(missing, np.nan, np.where((down > up) & (down > 0), down, 0.0))
+    tr = np.where(missing, np.nan, true_range(high, low, close))
+
+    atr = smooth(tr, window, smoothing)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = 100 * smooth(plus_dm, window, smoothing) / atr
+        minus_di = 100 * smooth(minus_dm, window, smoothing) / atr
+        di_sum = plus_di + minus_di
+        dx = np.where(di_sum == 0, 0.0, 100 * np.abs(plus_di - minus_di) / di_sum)
+    dx = np.where(np.isnan(plus_di) | np.isnan(minus_di), np.nan, dx)
+    return plus_di, minus_di, smooth(dx, window, smoothing)
+
+
+# --- Long <-> panel ---
+
+def bar_panel(df, columns, stock_col="Stock", date_col="Date"):
+    """
+    Pivot a long price table into bar-aligned (bar number x stock) arrays.
+
+    Each stock's rows (sorted by date) fill its column from the top, so every
+    column is a contiguous series even when stocks trade on different days.
+
+    Returns:
+        panels (dict[str, np.ndarray]),
+        (bar, stock, row position in df) of every row in panel order,
+        stocks (Index)
+    """
+    ordered = df.reset_index(drop=True).sort_values([stock_col, date_col], kind="stable")
+    stock_codes, stocks = pd.factorize(ordered[stock_col], sort=True)
+    bars = ordered.groupby(stock_col, sort=False).cumcount().to_numpy()
+    n_bars = bars.max() + 1 if len(bars) else 0
+    panels = {}
+    for col in columns:
+        panel = np.full((n_bars, len(stocks)), np.nan)
+        panel[bars, stock_codes] = pd.to_numeric(ordered[col], errors="coerce").to_numpy(dtype=np.float64)
+        panels[col] = panel
+    return panels, (bars, stock_codes, ordered.index.to_numpy()), stocks
+
+
+def compute_indicators(df, indicators=("RSI", "MACD", "Stochastic", "DMI"), params=None,
+                       stock_col="Stock", date_col="Date"):
+    """
+    Add indicator columns for every stock of a long OHLC table in one pass.
+
+    Args:
+        df (pd.DataFrame): Stock, Date, High, Low, Close rows (any order, several stocks)
+        indicators: any of "RSI", "MACD", "Stochastic", "DMI"
+        params (dict): overrides for DEFAULT_PARAMS
+
+    Returns:
+        copy of df with the INDICATOR_COLUMNS of the requested indicators
+    """
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    out = df.copy()
+    if df.empty:
+        for ind in indicators:
+            for col in INDICATOR_COLUMNS[ind]:
+                out[col] = np.nan
+        return out
+    needed = ["Close"] + (["High", "Low"] if {"Stochastic", "DMI"} & set(indicators) else [])
+    panels, (bars, stock_codes, rows), _ = bar_panel(df, needed, stock_col, date_col)
+    close = panels["Close"]
+
+    results = {}
+    if "RSI" in indicators:
+        results["RSI"] = rsi(close, p["rsi_window"], p["smoothing"])
+    if "MACD" in indicators:
+        results["MACD"], results["Signal"], results["Hist"] = macd(
+            close, p["macd_fast"], p["macd_slow"], p["macd_signal"]
+        )
+    if "Stochastic" in indicators:
+        results["%K"], results["%D"] = stochastic(
+            panels["High"], panels["Low"], close, p["stoch_window"], p["stoch_smooth"]
+        )
+    if "DMI" in indicators:
+        results["+DI"], results["-DI"], results["ADX"] = dmi(
+            panels["High"], panels["Low"], close, p["dmi_window"], p["smoothing"]
+        )
+
+    for name, panel in results.items():
+        values = np.empty(len(out))
+        values[rows] = panel[bars, stock_codes]
+        out[name] = values
+    return out
+
+
+# --- Streaming (one bar at a time) ---
+
+class IndicatorStream:
+    """
+    Bar-by-bar version of compute_indicators for many stocks at once.
+
+    The state is a dict of arrays with one row per stock: previous bar,
+    EMA values, Wilder averages and rolling-window buffers. Each step()
+    advances every active stock by one bar in O(window) time, independent
+    of history length, and gives the same values as the batch functions.
+    Keys are prefixed with their indicator ("price.", "rsi.", "macd.",
+    "stoch.", "dmi.") so the state can be stored per stock and indicator.
+    """
+
+    def __init__(self, n_stocks, params=None):
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.n = n_stocks
+        self.state = {}
+
+    # State helpers; arrays are created on first use
+    def _array(self, key, width=None, fill=np.nan):
+        if key not in self.state:
+            shape = (self.n,) if width is None else (self.n, width)
+            self.state[key] = np.full(shape, fill, dtype=np.float64)
+        return self.state[key]
+
+    def _set(self, key, value, active):
+        self.state[key] = np.where(active.reshape((-1,) + (1,) * (np.ndim(value) - 1)), value, self.state[key])
+
+    def _window(self, key, x, active, window):
+        """Push x into a rolling buffer; returns (buffer, full)."""
+        buf = self._array(f"{key}.buf", window)
+        count = self._array(f"{key}.n", fill=0.0)
+        self._set(f"{key}.buf", np.concatenate([buf[:, 1:], x[:, None]], axis=1), active)
+        self._set(f"{key}.n", np.minimum(count + 1, window), active)
+        return self.state[f"{key}.buf"], self.state[f"{key}.n"] == window
+
+    def _sma(self, key, x, active, window):
+        buf, full = self._window(key, x, active, window)
+        return np.where(full, buf.sum(axis=1) / window, np.nan)
+
+    def _smooth(self, key, x, active, window, method):
+        if method == "sma":
+            return self._sma(key, x, active, window)
+        if method != "wilder":
+            raise ValueError(f"Unknown smoothing method: {method}")
+        avg = self._array(f"{key}.avg")
+        seed = self._sma(key, x, active, window)
+        new = np.where(np.isnan(avg), seed, np.where(np.isnan(x), avg, avg + (x - avg) / window))
+        self._set(f"{key}.avg", new, active)
+        return np.where(np.isnan(x), np.nan, new)
+
+    def _ema(self, key, x, active, alpha):
+        value = self._array(f"{key}.ema")
+        new = np.where(np.isnan(value), x, np.where(np.isnan(x), value, value + alpha * (x - value)))
+        self._set(f"{key}.ema", new, active)
+        return np.where(np.isnan(x), np.nan, new)
+
+    def step(self, high, low, close, active=None):
+        """
+        Advance by one bar.
+
+        Args:
+            high, low, close (np.ndarray): (n_stocks,) values of the new bar
+            active (np.ndarray): bool mask of stocks that have this bar (default: all)
+
+        Returns:
+            dict column -> (n_stocks,) values (NaN for inactive stocks), columns as INDICATOR_COLUMNS
+        """
+        p = self.params
+        high, low, close = (np.asarray(v, dtype=np.float64).reshape(self.n) for v in (high, low, close))
+        active = np.ones(self.n, dtype=bool) if active is None else np.asarray(active, dtype=bool)
+        prev_close = self._array("price.close")
+        prev_high = self._array("price.high")
+        prev_low = self._array("price.low")
+        out = {}
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # RSI
+            delta = close - prev_close
+            gain = np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0))
+            loss = np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0))
+            avg_gain = self._smooth("rsi.gain", gain, active, p["rsi_window"], p["smoothing"])
+            avg_loss = self._smooth("rsi.loss", loss, active, p["rsi_window"], p["smoothing"])
+            out["RSI"] = np.where(avg_loss == 0, np.where(avg_gain == 0, 50.0, 100.0), 100 - 100 / (1 + avg_gain / avg_loss))
+
+            # MACD
+            line = (
+                self._ema("macd.fast", close, active, 2.0 / (p["macd_fast"] + 1.0))
+                - self._ema("macd.slow", close, active, 2.0 / (p["macd_slow"] + 1.0))
+            )
+            signal = self._ema("macd.signal", line, active, 2.0 / (p["macd_signal"] + 1.0))
+            out["MACD"], out["Signal"], out["Hist"] = line, signal, line - signal
+
+            # Stochastic
+            highs, full = self._window("stoch.high", high, active, p["stoch_window"])
+            lows, _ = self._window("stoch.low", low, active, p["stoch_window"])
+            lowest = np.where(full, lows.min(axis=1), np.nan)
+            highest = np.where(full, highs.max(axis=1), np.nan)
+            k = 100 * (close - lowest) / (highest - lowest)
+            out["%K"], out["%D"] = k, self._sma("stoch.k", k, active, p["stoch_smooth"])
+
+            # DMI
+            up = high - prev_high
+            down = prev_low - low
+            missing = np.isnan(up) | np.isnan(down)
+            plus_dm = np.where(missing, np.nan, np.where((up > down) & (up > 0), up, 0.0))
+            minus_dm = np.where(missing, np.nan, np.where((down > up) & (down > 0), down, 0.0))
+            tr = np.where(missing, np.nan, np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close))))
+            window, method = p["dmi_window"], p["smoothing"]
+            atr = self._smooth("dmi.tr", tr, active, window, method)
+            plus_di = 100 * self._smooth("dmi.plus", plus_dm, active, window, method) / atr
+            minus_di = 100 * self._smooth("dmi.minus", minus_dm, active, window, method) / atr
+            di_sum = plus_di + minus_di
+            dx = np.where(di_sum == 0, 0.0, 100 * np.abs(plus_di - minus_di) / di_sum)
+            dx = np.where(np.isnan(plus_di) | np.isnan(minus_di), np.nan, dx)
+            out["+DI"], out["-DI"], out["ADX"] = plus_di, minus_di, self._smooth("dmi.dx", dx, active, window, method)
+
+        self._set("price.close", close, active)
+        self._set("price.high", high, active)
+        self._set("price.low", low, active)
+        return {name: np.where(active, values, np.nan) for name, values in out.items()}
+
+    def run(self, high, low, close, active=None):
+        """Step through (bars x n_stocks) panels; returns dict column -> (bars x n_stocks) panel."""
+        high, low, close = _as_2d(high), _as_2d(low), _as_2d(close)
+        active = ~np.isnan(close) if active is None else active
+        results = {name: np.full(close.shape, np.nan) for cols in INDICATOR_COLUMNS.values() for name in cols}
+        for t in range(len(close)):
+            for name, values in self.step(high[t], low[t], close[t], active[t]).items():
+                results[name][t] = values
+        return results
+
+    def stock_state(self, i):
+        """State of stock i grouped by indicator: {"RSI": {...}, ...} of plain lists/floats."""
+        groups = {"price": "Price", "rsi": "RSI", "macd": "MACD", "stoch": "Stochastic", "dmi": "DMI"}
+        state = {}
+        for key, values in self.state.items():
+            state.setdefault(groups[key.split(".")[0]], {})[key] = values[i].tolist()
+        return state
+
+    @classmethod
+    def from_states(cls, states, params=None):
+        """Rebuild a stream from stock_state() dicts (one per stock, same params)."""
+        stream = cls(len(states), params)
+        keys = {key for state in states for group in state.values() for key in group}
+        flat = [{key: value for group in state.values() for key, value in group.items()} for state in states]
+        for key in keys:
+            stream.state[key] = np.array([row[key] for row in flat], dtype=np.float64)
+        return stream
+
+
+def indicator_settings(container, key_prefix="ind"):
+    """Window and smoothing inputs in an expander of `container` (e.g. st.sidebar); returns a params dict."""
+    box = container.expander("Indicator Settings")
+    return {
+        "smoothing": box.selectbox(
+            "Smoothing (RSI, DMI)", list(SMOOTHING_METHODS),
+            format_func=SMOOTHING_METHODS.get, key=f"{key_prefix}_smoothing"
+        ),
+        "rsi_window": int(box.number_input("RSI window", 2, 100, DEFAULT_PARAMS["rsi_window"], key=f"{key_prefix}_rsi")),
+        "macd_fast": int(box.number_input("MACD fast", 2, 100, DEFAULT_PARAMS["macd_fast"], key=f"{key_prefix}_fast")),
+        "macd_slow": int(box.number_input("MACD slow", 3, 200, DEFAULT_PARAMS["macd_slow"], key=f"{key_prefix}_slow")),
+        "macd_signal": int(box.number_input("MACD signal", 2, 100, DEFAULT_PARAMS["macd_signal"], key=f"{key_prefix}_signal")),
+        "stoch_window": int(box.number_input("Stochastic window", 2, 100, DEFAULT_PARAMS["stoch_window"], key=f"{key_prefix}_stoch")),
+        "stoch_smooth": int(box.number_input("Stochastic %D", 1, 20, DEFAULT_PARAMS["stoch_smooth"], key=f"{key_prefix}_stoch_d")),
+        "dmi_window": int(box.number_input("DMI window", 2, 100, DEFAULT_PARAMS["dmi_window"], key=f"{key_prefix}_dmi")),
+    }
@@ -2,10 +2,11 @@
 
 import streamlit as st
 import pandas as pd
-import sqlite3
 import plotly.express as px
 from datetime import datetime
 
+from market_store import get_store
+
 def show_weighted_vs_vwap_page():
     st.title("📊 Weighted Average Price vs Market VWAP Comparator (Integrated)")
 
@@ -46,22 +47,15 @@ def show_weighted_vs_vwap_page():
         grouped["Weighted_Avg_Price"] = (grouped["Total_Value"] / grouped["Total_Volume"]).round(2)
         return grouped
 
-    @st.cache_data
+    # Cached by the store until vwap_data.db changes
     def load_vwapex_data(start_date, end_date, selected_codes):
-        with sqlite3.connect("vwap_data.db") as conn:
-            df_all = pd.read_sql_query("SELECT * FROM vwap_data", conn)
+        df_all = get_store("vwap_data.db").get_vwap_ex(selected_codes, start_date, end_date)
         if df_all.empty:
             return pd.DataFrame()
 
         df_all["date"] = pd.to_datetime(df_all["date"]).dt.date
         df_all["code"] = df_all["code"].astype(str).str.strip()
-
-        filtered = df_all[
-            (df_all["date"] >= start_date) &
-            (df_all["date"] <= end_date) &
-            (df_all["code"].isin(selected_codes))
-        ]
-        return filtered
+        return df_all
 
     # Sidebar
     st.sidebar.header("📥 Upload Equity Monitor File")
@@ -76,9 +70,7 @@ def show_weighted_vs_vwap_page():
     selected_fund = st.sidebar.selectbox("Select Fund", fund_options)
 
     st.sidebar.header("📈 VWAPEx Filter Options")
-    with sqlite3.connect("vwap_data.db") as conn:
-        vwap_df_all = pd.read_sql_query("SELECT DISTINCT code FROM vwap_data", conn)
-        all_codes = sorted(vwap_df_all["code"].dropna().astype(str).unique().tolist()) if not vwap_df_all.empty else []
+    all_codes = sorted({str(code) for code in get_store("vwap_data.db").list_symbols()})
 
     select_all_codes = st.sidebar.checkbox("Select All Codes", value=True)
     selected_codes = all_codes if select_all_codes else st.sidebar.multiselect("Choose Stock Code", all_codes, default=[])
@@ -22,6 +22,9 @@ from collection_tracker import show_collection_tracker_page  # ✅ New import
 from vwap_db_update import show_vwap_db_update_page
 from stock_db_bbupdate import show_stock_ohlc_update_page
 from nvpf_portfolio import show_nvpf_portfolio_page
+from alm_gap import show_alm_gap_page
+from stock_screener import show_stock_screener_page
+from backtest import show_backtest_page
 
 def main():
     st.set_page_config(
@@ -44,6 +47,8 @@ def main():
             "Equity Portfolio Monitoring",
             "Technical Analysis",
             "PSEI Analysis",
+            "Stock Screener",
+            "Strategy Backtest",
             "WAP vs Market VWAP Comparator"
         ],
         "Fixed Income Asset": [
@@ -55,6 +60,7 @@ def main():
         "Other Analysis": [
             "Portfolio / ROI",
             "NVPF Portfolio: Contri vs Income",
+            "ALM Cash-Flow Gap",
             "PDF Viewer"
         ],
         "Database Update": [
@@ -86,6 +92,10 @@ def main():
         show_techanalysis_page()
     elif sub_selection == "PSEI Analysis":
         show_psei_page()
+    elif sub_selection == "Stock Screener":
+        show_stock_screener_page()
+    elif sub_selection == "Strategy Backtest":
+        show_backtest_page()
     elif sub_selection == "WAP vs Market VWAP Comparator":
         show_weighted_vs_vwap_page()
     elif sub_selection == "Fixed Income":
@@ -100,6 +110,8 @@ def main():
         show_portfolio_roi_page()
     elif sub_selection == "NVPF Portfolio: Contri vs Income":
         show_nvpf_portfolio_page()
+    elif sub_selection == "ALM Cash-Flow Gap":
+        show_alm_gap_page()
     elif sub_selection == "PDF Viewer":
         show_pdf_viewer_page()
     elif sub_selection == "VWAP Database Update":
@@ -0,0 +1,454 @@
+# market_db_v2.py
+#
+# Storage layout v2 for the market databases (ohlc_bbdata.db, stock_vwap.db,
+# vwap_data.db). Rows move from the legacy TEXT-keyed table into a
+# WITHOUT ROWID table clustered on (symbol id, day), where the day is an
+# integer count of days since 1970-01-01 and symbols (and VWAP source
+# sheets) are stored once in dictionary tables. A secondary index on the day
+# (which in a WITHOUT ROWID table also carries the key columns) covers
+# date-range scans over all symbols.
+#
+# The legacy table name becomes a view with the legacy columns and
+# INSTEAD OF INSERT/DELETE triggers, so existing SQL keeps working.
+# PRAGMA user_version is 2 after migration.
+#
+#   python market_db_v2.py migrate stock_vwap.db [--no-backup]
+#   python market_db_v2.py verify stock_vwap.db
+
+import argparse
+import os
+import sqlite3
+import sys
+
+import pandas as pd
+
+SCHEMA_VERSION = 2
+EPOCH_JULIAN = 2440587.5  # julianday('1970-01-01')
+MAX_SQL_PARAMS = 900
+
+# Dictionary table -> (id column, value column)
+DICTIONARIES = {
+    "symbols": ("Symbol_Id", "Symbol"),
+    "source_sheets": ("Sheet_Id", "Sheet"),
+}
+
+# Legacy table layouts. "key" is in clustered (physical) order; "values" maps
+# the remaining columns to their declared types.
+LAYOUTS = {
+    "ohlc": {
+        "view": "stock_data",
+        "table": "ohlc_bars",
+        "columns": ["Stock", "Date", "Open", "High", "Low", "Close", "Volume", "Value", "VWAP"],
+        "key": ["Stock", "Date"],
+        "date": "Date",
+        "dictionaries": {"Stock": "symbols"},
+        "values": {"Open": "REAL", "High": "REAL", "Low": "REAL", "Close": "REAL",
+                   "Volume": "INTEGER", "Value": "REAL", "VWAP": "REAL"},
+    },
+    "vwap": {
+        "view": "stock_data",
+        "table": "vwap_bars",
+        "columns": ["Date", "Security", "Volume", "Value", "VWAP", "SourceSheet"],
+        "key": ["Security", "Date", "SourceSheet"],
+        "date": "Date",
+        "dictionaries": {"Security": "symbols", "SourceSheet": "source_sheets"},
+        "values": {"Volume": "REAL", "Value": "REAL", "VWAP": "REAL"},
+    },
+    "vwap_ex": {
+        "view": "vwap_data",
+        "table": "vwap_ex_bars",
+        "columns": ["date", "code", "vwap_ex"],
+        "key": ["code", "date"],
+        "date": "date",
+        "dictionaries": {"code": "symbols"},
+        "values": {"vwap_ex": "REAL"},
+        # Legacy UNIQUE(date, code) ON CONFLICT IGNORE
+        "ignore_conflicts": True,
+    },
+}
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _day_sql(expr):
+    return f"CAST(julianday({expr}) - {EPOCH_JULIAN} AS INTEGER)"
+
+
+def _date_sql(expr):
+    return f"date({expr} + {EPOCH_JULIAN})"
+
+
+def to_day(value):
+    """Integer day key of a date-like value."""
+    return (pd.Timestamp(value).normalize() - pd.Timestamp("1970-01-01")).days
+
+
+def _physical(layout, col):
+    if col in layout["dictionaries"]:
+        return DICTIONARIES[layout["dictionaries"][col]][0]
+    if col == layout["date"]:
+        return "Day"
+    return col
+
+
+def _key_value_sql(layout, col, expr):
+    """SQL for the physical key value of legacy column `col` given its legacy value `expr`."""
+    if col in layout["dictionaries"]:
+        dictionary = layout["dictionaries"][col]
+        id_col, value_col = DICTIONARIES[dictionary]
+        return f"(SELECT {id_col} FROM {dictionary} WHERE {value_col} = {expr})"
+    if col == layout["date"]:
+        return _day_sql(expr)
+    return expr
+
+
+def _view_select(layout):
+    """SELECT of the legacy columns from the v2 table and its dictionaries."""
+    joins, exprs = [], []
+    aliases = {}
+    for i, (col, dictionary) in enumerate(layout["dictionaries"].items()):
+        id_col, _ = DICTIONARIES[dictionary]
+        aliases[col] = f"d{i}"
+        joins.append(f"JOIN {dictionary} AS d{i} ON d{i}.{id_col} = b.{_physical(layout, col)}")
+    for col in layout["columns"]:
+        if col in aliases:
+            exprs.append(f"{aliases[col]}.{DICTIONARIES[layout['dictionaries'][col]][1]} AS {_quote(col)}")
+        elif col == layout["date"]:
+            exprs.append(f"{_date_sql('b.Day')} AS {_quote(col)}")
+        else:
+            exprs.append(f"b.{_quote(col)} AS {_quote(col)}")
+    return f"SELECT {', '.join(exprs)} FROM {layout['table']} AS b {' '.join(joins)}", aliases
+
+
+def schema_sql(layout):
+    """
+    DDL of the v2 schema.
+
+    Returns:
+        dict "tables" (dictionaries and the clustered table), "index" (day
+        index) and "view" (compatibility view and its triggers) -> statements
+    """
+    tables = [
+        f"CREATE TABLE IF NOT EXISTS {name} ({id_col} INTEGER PRIMARY KEY, {value_col} TEXT NOT NULL UNIQUE)"
+        for name, (id_col, value_col) in DICTIONARIES.items()
+        if name in layout["dictionaries"].values()
+    ]
+    key = [_physical(layout, col) for col in layout["key"]]
+    columns = [f"{col} INTEGER NOT NULL" for col in key]
+    columns += [f"{_quote(col)} {col_type}" for col, col_type in layout["values"].items()]
+    conflict = " ON CONFLICT IGNORE" if layout.get("ignore_conflicts") else ""
+    tables.append(
+        f"CREATE TABLE {layout['table']} ({', '.join(columns)}, PRIMARY KEY ({', '.join(key)}){conflict}) WITHOUT ROWID"
+    )
+    index = [f"CREATE INDEX {layout['table']}_by_day ON {layout['table']} (Day)"]
+
+    view = _quote(layout["view"])
+    view_sql = [f"CREATE VIEW {view} AS {_view_select(layout)[0]}"]
+    physical = [_physical(layout, col) for col in layout["key"]] + [_quote(col) for col in layout["values"]]
+    new_values = [_key_value_sql(layout, col, f"NEW.{_quote(col)}") for col in layout["key"]]
+    new_values += [f"NEW.{_quote(col)}" for col in layout["values"]]
+    dictionary_inserts = "".join(
+        f"INSERT OR IGNORE INTO {dictionary} ({DICTIONARIES[dictionary][1]}) VALUES (NEW.{_quote(col)}); "
+        for col, dictionary in layout["dictionaries"].items()
+    )
+    view_sql.append(
+        f"CREATE TRIGGER {layout['view']}_insert INSTEAD OF INSERT ON {view} BEGIN "
+        f"{dictionary_inserts}"
+        f"INSERT INTO {layout['table']} ({', '.join(physical)}) VALUES ({', '.join(new_values)}); END"
+    )
+    view_sql.append(
+        f"CREATE TRIGGER {layout['view']}_delete INSTEAD OF DELETE ON {view} BEGIN "
+        f"DELETE FROM {layout['table']} WHERE {key_match_sql(layout, 'OLD', layout['table'])}; END"
+    )
+    return {"tables": tables, "index": index, "view": view_sql}
+
+
+def key_match_sql(layout, source, target):
+    """Condition matching the v2 row `target` to the legacy-column row `source` by key (uses the primary key)."""
+    return " AND ".join(
+        f"{target}.{_physical(layout, col)} = {_key_value_sql(layout, col, f'{source}.{_quote(col)}')}"
+        for col in layout["key"]
+    )
+
+
+def _columns(conn, name):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(name)})")]
+
+
+def detect_layout(conn):
+    """
+    (kind, version) of the market table in this database, or (None, None).
+
+    version is 1 for the legacy table and 2 for a migrated database.
+    """
+    objects = dict(conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')").fetchall())
+    for kind, layout in LAYOUTS.items():
+        if objects.get(layout["view"]) == "view" and objects.get(layout["table"]) == "table":
+            return kind, 2
+        if objects.get(layout["view"]) == "table" and set(_columns(conn, layout["view"])) == set(layout["columns"]):
+            return kind, 1
+    return None, None
+
+
+def compat_layout(conn, name):
+    """Layout of `name` if it is a v2 compatibility view in this database, else None."""
+    kind, version = detect_layout(conn)
+    if version == 2 and LAYOUTS[kind]["view"] == name:
+        return LAYOUTS[kind]
+    return None
+
+
+# --- Readers ---
+
+def _symbol_column(layout):
+    return next(col for col, dictionary in layout["dictionaries"].items() if dictionary == "symbols")
+
+
+def distinct_symbols(conn, table, column):
+    """Sorted distinct values of `column`; v2 reads the dictionary instead of scanning the rows."""
+    layout = compat_layout(conn, table)
+    if layout and column in layout["dictionaries"]:
+        dictionary = layout["dictionaries"][column]
+        id_col, value_col = DICTIONARIES[dictionary]
+        query = (
+            f"SELECT d.{value_col} FROM {dictionary} AS d WHERE EXISTS "
+            f"(SELECT 1 FROM {layout['table']} AS b WHERE b.{id_col} = d.{id_col}) ORDER BY d.{value_col}"
+        )
+    else:
+        query = f"SELECT DISTINCT {_quote(column)} FROM {_quote(table)} WHERE {_quote(column)} IS NOT NULL ORDER BY 1"
+    return [row[0] for row in conn.execute(query)]
+
+
+def date_bounds(conn, table):
+    """(first, last) ISO date in `table`; v2 reads both ends of the day index."""
+    layout = compat_layout(conn, table)
+    if layout:
+        first, last = conn.execute(f"SELECT MIN(Day), MAX(Day) FROM {layout['table']}").fetchone()
+        if first is None:
+            return None, None
+        return conn.execute(f"SELECT {_date_sql('?')}, {_date_sql('?')}", (first, last)).fetchone()
+    kind, _ = detect_layout(conn)
+    date_col = LAYOUTS[kind]["date"] if kind else "Date"
+    return conn.execute(f"SELECT MIN({_quote(date_col)}), MAX({_quote(date_col)}) FROM {_quote(table)}").fetchone()
+
+
+def read_range(conn, table, start=None, end=None, symbols=None):
+    """
+    Legacy-column rows of `table` between `start` and `end` (inclusive) for `symbols` (default: all).
+
+    On a v2 database the filters run on the integer day and symbol keys, so
+    a symbol's range is one clustered-index scan.
+
+    Returns:
+        pd.DataFrame with the legacy columns
+    """
+    kind, version = detect_layout(conn)
+    if kind is None:
+        raise ValueError(f"{table} is not a known market table.")
+    layout = LAYOUTS[kind]
+    symbol_col = _symbol_column(layout)
+    symbols = None if symbols is None else list(symbols)
+    push_symbols = symbols is not None and len(symbols) <= MAX_SQL_PARAMS
+    conditions, params = [], []
+
+    if version == 2:
+        select, aliases = _view_select(layout)
+        day = "b.Day"
+        if start is not None:
+            conditions.append(f"{day} >= ?")
+            params.append(to_day(start))
+        if end is not None:
+            conditions.append(f"{day} <= ?")
+            params.append(to_day(end))
+        symbol_expr = f"{aliases[symbol_col]}.{DICTIONARIES['symbols'][1]}"
+        order = f" ORDER BY b.{_physical(layout, symbol_col)}, b.Day"
+    else:
+        select = f"SELECT * FROM {_quote(table)}"
+        date_expr = f"date({_quote(layout['date'])})"
+        if start is not None:
+            conditions.append(f"{date_expr} >= ?")
+            params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            conditions.append(f"{date_expr} <= ?")
+            params.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+        symbol_expr = _quote(symbol_col)
+        order = ""
+    if push_symbols:
+        conditions.append(f"{symbol_expr} IN ({','.join('?' * len(symbols))})")
+        params += symbols
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    df = pd.read_sql(select + where + order, conn, params=params)
+    if symbols is not None and not push_symbols:
+        df = df[df[symbol_col].isin(symbols)].reset_index(drop=True)
+    return df
+
+
+# --- Migration ---
+
+def migrate(path, backup=True):
+    """
+    Migrate a legacy market database to v2 in place.
+
+    The copy is checked row for row against the legacy table (both
+    directions of EXCEPT) before the legacy table is dropped; any mismatch
+    rolls the whole migration back. The file is vacuumed afterwards.
+
+    Args:
+        path (str): database file
+        backup (bool): copy the database to <path>.v1.bak first
+
+    Returns:
+        dict with kind, rows, symbols, size_before, size_after, backup
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        kind, version = detect_layout(conn)
+        if kind is None:
+            raise ValueError(f"{path}: no stock_data or vwap_data table in a known layout.")
+        if version == 2:
+            raise ValueError(f"{path} is already at schema version 2.")
+        layout = LAYOUTS[kind]
+        size_before = os.path.getsize(path)
+        backup_path = None
+        if backup:
+            backup_path = path + ".v1.bak"
+            with sqlite3.connect(backup_path) as target:
+                conn.backup(target)
+            target.close()
+
+        legacy = _quote(f"{layout['view']}_v1")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"ALTER TABLE {_quote(layout['view'])} RENAME TO {legacy}")
+            schema = schema_sql(layout)
+            for sql in schema["tables"]:
+                conn.execute(sql)
+            for col, dictionary in layout["dictionaries"].items():
+                value_col = DICTIONARIES[dictionary][1]
+                conn.execute(
+                    f"INSERT OR IGNORE INTO {dictionary} ({value_col}) "
+                    f"SELECT DISTINCT {_quote(col)} FROM {legacy} WHERE {_quote(col)} IS NOT NULL ORDER BY 1"
+                )
+            physical = [_physical(layout, col) for col in layout["key"]] + [_quote(col) for col in layout["values"]]
+            values = [_key_value_sql(layout, col, f"l.{_quote(col)}") for col in layout["key"]]
+            values += [f"l.{_quote(col)}" for col in layout["values"]]
+            conn.execute(
+                f"INSERT INTO {layout['table']} ({', '.join(physical)}) "
+                f"SELECT {', '.join(values)} FROM {legacy} AS l ORDER BY {', '.join(values[:len(layout['key'])])}"
+            )
+            for sql in schema["index"] + schema["view"]:
+                conn.execute(sql)
+
+            # Row-for-row check of the view against the legacy table
+            legacy_cols = ", ".join(
+                f"date({_quote(col)})" if col == layout["date"] else _quote(col) for col in layout["columns"]
+            )
+            view_cols = ", ".join(_quote(col) for col in layout["columns"])
+            view = _quote(layout["view"])
+            rows = conn.execute(f"SELECT COUNT(*) FROM {legacy}").fetchone()[0]
+            copied = conn.execute(f"SELECT COUNT(*) FROM {view}").fetchone()[0]
+            missing = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT {legacy_cols} FROM {legacy} EXCEPT SELECT {view_cols} FROM {view})"
+            ).fetchone()[0]
+            extra = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT {view_cols} FROM {view} EXCEPT SELECT {legacy_cols} FROM {legacy})"
+            ).fetchone()[0]
+            if rows != copied or missing or extra:
+                raise RuntimeError(
+                    f"Verification failed: {rows} legacy rows, {copied} copied, {missing} missing, {extra} unexpected."
+                )
+            conn.execute(f"DROP TABLE {legacy}")
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("VACUUM")
+        symbols = conn.execute("SELECT COUNT(*) FROM symbols").fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        "kind": kind,
+        "rows": rows,
+        "symbols": symbols,
+        "size_before": size_before,
+        "size_after": os.path.getsize(path),
+        "backup": backup_path,
+    }
+
+
+def verify(path):
+    """
+    Consistency checks of a market database.
+
+    Returns:
+        dict check name -> (ok, detail)
+    """
+    conn = sqlite3.connect(path)
+    try:
+        kind, version = detect_layout(conn)
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        checks = {
+            "layout": (kind is not None, f"{kind} v{version}" if kind else "no known market table"),
+            "integrity_check": (integrity == "ok", integrity),
+        }
+        if version != 2:
+            return checks
+        layout = LAYOUTS[kind]
+        user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        checks["user_version"] = (user_version == SCHEMA_VERSION, str(user_version))
+        rows = conn.execute(f"SELECT COUNT(*) FROM {layout['table']}").fetchone()[0]
+        for col, dictionary in layout["dictionaries"].items():
+            id_col = DICTIONARIES[dictionary][0]
+            orphans = conn.execute(
+                f"SELECT COUNT(*) FROM {layout['table']} AS b "
+                f"WHERE NOT EXISTS (SELECT 1 FROM {dictionary} AS d WHERE d.{id_col} = b.{id_col})"
+            ).fetchone()[0]
+            checks[f"{col} ids"] = (orphans == 0, f"{orphans} rows without a {dictionary} entry")
+        view = _quote(layout["view"])
+        visible, bad_dates = conn.execute(
+            f"SELECT COUNT(*), SUM({_quote(layout['date'])} IS NULL) FROM {view}"
+        ).fetchone()
+        checks["view rows"] = (visible == rows, f"{visible} of {rows} rows visible through {layout['view']}")
+        checks["dates"] = (not bad_dates, f"{bad_dates or 0} rows with an invalid day")
+        return checks
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate or verify the market databases (schema v2).")
+    parser.add_argument("command", choices=["migrate", "verify"])
+    parser.add_argument("databases", nargs="+")
+    parser.add_argument("--no-backup", action="store_true", help="do not write <db>.v1.bak before migrating")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for path in args.databases:
+        if not os.path.exists(path):
+            print(f"{path}: not found")
+            failed = True
+            continue
+        if args.command == "migrate":
+            try:
+                report = migrate(path, backup=not args.no_backup)
+            except (ValueError, RuntimeError, sqlite3.Error) as e:
+                print(f"{path}: {e}")
+                failed = True
+                continue
+            print(
+                f"{path}: migrated {report['kind']} ({report['rows']:,} rows, {report['symbols']:,} symbols), "
+                f"{report['size_before'] / 1024:,.0f} KB -> {report['size_after'] / 1024:,.0f} KB"
+                + (f", backup {report['backup']}" if report["backup"] else "")
+            )
+        checks = verify(path)
+        for name, (ok, detail) in checks.items():
+            print(f"{path}: {'OK  ' if ok else 'FAIL'} {name}: {detail}")
+            failed |= not ok
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
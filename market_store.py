@@ -0,0 +1,169 @@
+# market_store.py
+#
+# One read access layer per market database. get_store(path) returns a
+# MarketDataStore held with st.cache_resource, so every page and rerun
+# shares it. Each thread gets its own read-only connection (Streamlit runs
+# scripts on several threads; sqlite3 connections stay on the thread that
+# made them), and query results are cached in the store.
+#
+# The cache is keyed by PRAGMA data_version of a connection the store never
+# writes through: SQLite changes that number whenever any other connection
+# or process commits to the file, so a write from a page, the ingest code
+# or another tool drops the cached results on the next query.
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from market_db_v2 import LAYOUTS, MAX_SQL_PARAMS, date_bounds, detect_layout, distinct_symbols
+from price_mirror import load_prices, price_keys
+
+MAX_CACHED_QUERIES = 32
+
+
+class MarketDataStore:
+    """
+    Cached reads of one market database (ohlc_bbdata.db, stock_vwap.db,
+    vwap_data.db or any SQLite file of price tables).
+
+    Returned frames are copies; callers may modify them.
+    """
+
+    def __init__(self, db_path):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(f"Database file not found: {db_path}")
+        self.db_path = db_path
+        self._uri = Path(os.path.abspath(db_path)).as_uri() + "?mode=ro"
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._monitor = sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+        self._cache = OrderedDict()
+        self._cache_version = None
+
+    def connection(self):
+        """This thread's read-only connection (opened on first use)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self._uri, uri=True)
+        return conn
+
+    def data_version(self):
+        """Counter that changes whenever another connection commits to the database."""
+        with self._lock:
+            return self._monitor.execute("PRAGMA data_version").fetchone()[0]
+
+    def _cached(self, key, compute):
+        version = self.data_version()
+        with self._lock:
+            if version != self._cache_version:
+                self._cache.clear()
+                self._cache_version = version
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                value = self._cache[key]
+                return value.copy() if hasattr(value, "copy") else value
+        value = compute()
+        with self._lock:
+            if version == self._cache_version:
+                self._cache[key] = value
+                while len(self._cache) > MAX_CACHED_QUERIES:
+                    self._cache.popitem(last=False)
+        return value.copy() if hasattr(value, "copy") else value
+
+    def _market_table(self, kind=None):
+        """Name of the database's market table, checked against `kind` if given."""
+        found, _ = self._cached(("layout",), lambda: detect_layout(self.connection()))
+        if found is None or (kind is not None and found != kind):
+            raise ValueError(f"{self.db_path} holds no {kind or 'market'} table.")
+        return LAYOUTS[found]["view"]
+
+    def tables(self):
+        """Names of the tables and views in the database."""
+        return self._cached(("tables",), lambda: [
+            row[0] for row in self.connection().execute(
+                "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+                "AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )
+        ])
+
+    def _keys(self, table):
+        columns = [row[1] for row in self.connection().execute(f'PRAGMA table_info("{table}")')]
+        return price_keys(columns)
+
+    def list_symbols(self, table=None):
+        """Sorted distinct symbols of `table` (default: the database's market table)."""
+        table = table or self._market_table()
+
+        def compute():
+            _, symbol_col = self._keys(table)
+            return distinct_symbols(self.connection(), table, symbol_col) if symbol_col else []
+        return self._cached(("symbols", table), compute)
+
+    def date_bounds(self, table=None, symbols=None):
+        """
+        (first, last) date of `table` (default: the database's market table), over
+        `symbols` only if given; (None, None) if there are no rows.
+        """
+        table = table or self._market_table()
+        symbols = None if symbols is None or len(symbols) > MAX_SQL_PARAMS else sorted(symbols)
+
+        def compute():
+            date_col, symbol_col = self._keys(table)
+            if symbols is None or symbol_col is None or date_col is None:
+                return tuple(date_bounds(self.connection(), table))
+            return tuple(self.connection().execute(
+                f'SELECT MIN("{date_col}"), MAX("{date_col}") FROM "{table}" '
+                f'WHERE "{symbol_col}" IN ({",".join("?" * len(symbols))})',
+                symbols,
+            ).fetchone())
+        return self._cached(("bounds", table, None if symbols is None else tuple(symbols)), compute)
+
+    def get_prices(self, table, symbols=None, start=None, end=None, columns=None, mirror=True):
+        """
+        Rows of a price table, filtered by symbol and inclusive date range.
+
+        Read from the columnar mirror when available (and `mirror` is set),
+        else with a filtered query through this thread's connection.
+
+        Returns:
+            pd.DataFrame with the date column as datetime64[ns]
+        """
+        key = (
+            "prices", table, None if symbols is None else tuple(symbols),
+            None if start is None else str(pd.Timestamp(start).date()),
+            None if end is None else str(pd.Timestamp(end).date()),
+            None if columns is None else tuple(columns), mirror,
+        )
+        return self._cached(key, lambda: load_prices(
+            self.db_path, table, columns, start, end, symbols, conn=self.connection(), mirror=mirror
+        ))
+
+    def get_ohlc(self, symbols=None, start=None, end=None, columns=None):
+        """OHLC bars (stock_data of ohlc_bbdata.db)."""
+        table = self._market_table("ohlc")
+        return self.get_prices(table, symbols, start, end, columns)
+
+    def get_vwap(self, symbols=None, start=None, end=None, columns=None):
+        """Daily volume, value and VWAP by source sheet (stock_data of stock_vwap.db)."""
+        table = self._market_table("vwap")
+        return self.get_prices(table, symbols, start, end, columns)
+
+    def get_vwap_ex(self, symbols=None, start=None, end=None, columns=None):
+        """VWAP excluding block sales (vwap_data of vwap_data.db)."""
+        table = self._market_table("vwap_ex")
+        return self.get_prices(table, symbols, start, end, columns)
+
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def _store(db_path):
+    return MarketDataStore(db_path)
+
+
+def get_store(db_path):
+    """The shared MarketDataStore of the database at `db_path`."""
+    return _store(os.path.abspath(db_path))
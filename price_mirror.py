@@ -0,0 +1,334 @@
+# price_mirror.py
+#
+# Columnar mirror of the SQLite price tables (stock_data, vwap_data and the
+# tables of data/stock_prices.db). Each table is kept as one uncompressed
+# Arrow IPC (Feather v2) file per year next to the database:
+#
+#   <db dir>/<db name>_mirror/<table>/year=2025/part-<id>.arrow
+#   <db dir>/<db name>_mirror/<table>/_manifest.json
+#
+# Uncompressed IPC files are memory-mapped on read, so a page that needs
+# three columns of one year maps that year's file and touches only those
+# columns; the date and symbol filters are applied by the Arrow scanner
+# before anything is converted to pandas. Dates are stored as date32 and
+# symbols dictionary-encoded.
+#
+# The manifest records the database modification time it was built from.
+# Ingest code calls sync_mirror() with the years it touched; any other
+# change to the database (deletes, the indicator table, another tool) makes
+# the manifest stale and the next read rebuilds the mirror. Without pyarrow
+# every read goes to SQLite.
+
+import json
+import os
+import sqlite3
+import uuid
+from contextlib import closing
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pa_fs
+except ImportError:  # pyarrow is optional; reads fall back to SQLite
+    pa = None
+
+from market_db_v2 import LAYOUTS, MAX_SQL_PARAMS, compat_layout, detect_layout, read_range
+
+DATE_COLUMNS = ("Date", "date")
+SYMBOL_COLUMNS = ("Stock", "Security", "code")
+MANIFEST = "_manifest.json"
+UNDATED_YEAR = 0  # partition of rows whose date does not parse
+
+
+def mirror_dir(db_path, table):
+    """Directory holding the mirror of `table` of the database at `db_path`."""
+    base, _ = os.path.splitext(db_path)
+    return os.path.join(f"{base}_mirror", table)
+
+
+def price_keys(columns):
+    """(date column, symbol column) of a price table; either is None if absent."""
+    date_col = next((col for col in DATE_COLUMNS if col in columns), None)
+    symbol_col = next((col for col in SYMBOL_COLUMNS if col in columns), None)
+    return date_col, symbol_col
+
+
+def _read_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(root, manifest):
+    path = os.path.join(root, MANIFEST)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _read_sqlite(conn, table, start=None, end=None, symbols=None):
+    """Rows of `table` from SQLite, with the date and symbol filters in the WHERE clause."""
+    kind, _ = detect_layout(conn)
+    if kind and LAYOUTS[kind]["view"] == table:
+        return read_range(conn, table, start, end, symbols)
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+    date_col, symbol_col = price_keys(columns)
+    symbols = None if symbols is None or symbol_col is None else list(symbols)
+    push_symbols = symbols is not None and len(symbols) <= MAX_SQL_PARAMS
+    conditions, params = [], []
+    if date_col and start is not None:
+        conditions.append(f'date("{date_col}") >= ?')
+        params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+    if date_col and end is not None:
+        conditions.append(f'date("{date_col}") <= ?')
+        params.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+    if push_symbols:
+        conditions.append(f'"{symbol_col}" IN ({",".join("?" * len(symbols))})')
+        params += symbols
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    df = pd.read_sql(f'SELECT * FROM "{table}"{where}', conn, params=params)
+    if symbols is not None and not push_symbols:
+        df = df[df[symbol_col].isin(symbols)].reset_index(drop=True)
+    return df
+
+
+def _count_rows(conn, table):
+    layout = compat_layout(conn, table)
+    return conn.execute(f'SELECT COUNT(*) FROM "{layout["table"] if layout else table}"').fetchone()[0]
+
+
+def _column_types(df, date_col, symbol_col):
+    """Mirror column types inferred from a full read of the table."""
+    types = {}
+    for col in df.columns:
+        if col == date_col:
+            types[col] = "date"
+        elif col == symbol_col:
+            types[col] = "symbol"
+        elif pd.api.types.is_integer_dtype(df[col]):
+            types[col] = "int64"
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            types[col] = "float64"
+        else:
+            types[col] = "string"
+    return types
+
+
+def _schema(types):
+    arrow_types = {
+        "date": pa.date32(),
+        "symbol": pa.dictionary(pa.int32(), pa.string()),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "string": pa.string(),
+    }
+    return pa.schema([(col, arrow_types[kind]) for col, kind in types.items()])
+
+
+def _write_years(root, df, manifest):
+    """Write one IPC file per year of `df` (sorted by symbol and date) and point the manifest at them."""
+    date_col, symbol_col = manifest["date_column"], manifest["symbol_column"]
+    types = manifest["columns"]
+    df = df[list(types)].copy()
+    dates = pd.to_datetime(df[date_col], errors="coerce").dt.normalize()
+    df[date_col] = dates.dt.date
+    for col, kind in types.items():
+        if kind in ("int64", "float64"):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        elif kind in ("string", "symbol"):
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    years = dates.dt.year.fillna(UNDATED_YEAR).astype(int)
+    schema = _schema(types)
+    replaced = []
+    for year, part in df.groupby(years, sort=True):
+        if symbol_col:
+            part = part.sort_values([symbol_col, date_col], kind="stable")
+        table = pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+        name = os.path.join(f"year={year}", f"part-{uuid.uuid4().hex[:12]}.arrow")
+        os.makedirs(os.path.join(root, f"year={year}"), exist_ok=True)
+        with pa.OSFile(os.path.join(root, name), "wb") as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                writer.write_table(table)
+        old = manifest["files"].get(str(year))
+        if old:
+            replaced.append(old)
+        manifest["files"][str(year)] = name
+        manifest["rows"][str(year)] = len(part)
+    return replaced
+
+
+def _remove(root, names):
+    """Delete superseded files; one still mapped by a reader (Windows) is left behind."""
+    for name in names:
+        try:
+            os.remove(os.path.join(root, name))
+        except OSError:
+            pass
+
+
+def sync_mirror(db_path, table, years=None):
+    """
+    Bring the mirror of `table` up to date with the database.
+
+    Args:
+        db_path (str): SQLite database path
+        table (str): table (or v2 compatibility view) to mirror
+        years (iterable[int]): years whose rows changed; the other year files
+            are kept. Default (or a missing/inconsistent mirror): rebuild all.
+
+    Returns:
+        dict: the new manifest, or None if pyarrow is unavailable or the table
+        has no date column
+    """
+    if pa is None:
+        return None
+    root = mirror_dir(db_path, table)
+    manifest = _read_manifest(root)
+    with closing(sqlite3.connect(db_path)) as conn:
+        if manifest is not None and years is not None:
+            years = sorted(set(int(year) for year in years))
+            try:
+                df = _read_sqlite(conn, table, f"{years[0]}-01-01", f"{years[-1]}-12-31") if years else None
+                if df is not None:
+                    dates = pd.to_datetime(df[manifest["date_column"]], errors="coerce")
+                    df = df[dates.dt.year.isin(years)]
+                    os.makedirs(root, exist_ok=True)
+                    replaced = _write_years(root, df, manifest)
+                    # A year that lost all its rows keeps no file
+                    for year in set(map(str, years)) - set(map(str, dates.dt.year.dropna().astype(int))):
+                        if year in manifest["files"]:
+                            replaced.append(manifest["files"].pop(year))
+                            manifest["rows"].pop(year, None)
+                else:
+                    replaced = []
+            except (pa.ArrowInvalid, pa.ArrowTypeError, KeyError):
+                manifest = None  # column types changed; rebuild
+            else:
+                if sum(manifest["rows"].values()) == _count_rows(conn, table):
+                    manifest["db_mtime"] = os.stat(db_path).st_mtime_ns
+                    _write_manifest(root, manifest)
+                    _remove(root, replaced)
+                    return manifest
+                manifest = None  # other years changed too
+
+        df = _read_sqlite(conn, table)
+    date_col, symbol_col = price_keys(df.columns)
+    if date_col is None:
+        return None
+    previous = _read_manifest(root)
+    manifest = {
+        "table": table,
+        "date_column": date_col,
+        "symbol_column": symbol_col,
+        "columns": _column_types(df, date_col, symbol_col),
+        "files": {},
+        "rows": {},
+    }
+    os.makedirs(root, exist_ok=True)
+    _write_years(root, df, manifest)
+    manifest["db_mtime"] = os.stat(db_path).st_mtime_ns
+    _write_manifest(root, manifest)
+    if previous:
+        _remove(root, previous.get("files", {}).values())
+    return manifest
+
+
+def _current_manifest(db_path, table):
+    """Manifest of an up-to-date mirror, rebuilding it if the database changed since."""
+    manifest = _read_manifest(mirror_dir(db_path, table))
+    if manifest is None or manifest.get("db_mtime") != os.stat(db_path).st_mtime_ns:
+        manifest = sync_mirror(db_path, table)
+    return manifest
+
+
+def read_mirror(db_path, table, columns=None, start=None, end=None, symbols=None):
+    """
+    Rows of `table` from its memory-mapped mirror, refreshed first if stale.
+
+    Only the year files overlapping [start, end] are opened, and only
+    `columns` are read; the date and symbol filters run in the Arrow scanner.
+
+    Returns:
+        pd.DataFrame (date column as datetime64[ns]), or None if the table
+        cannot be mirrored
+    """
+    manifest = _current_manifest(db_path, table)
+    if manifest is None:
+        return None
+    root = mirror_dir(db_path, table)
+    date_col, symbol_col = manifest["date_column"], manifest["symbol_column"]
+    first = pd.Timestamp(start).year if start is not None else None
+    last = pd.Timestamp(end).year if end is not None else None
+    files = [
+        os.path.abspath(os.path.join(root, name)) for year, name in sorted(manifest["files"].items(), key=lambda item: int(item[0]))
+        if (first is None or int(year) >= first) and (last is None or int(year) <= last)
+        and not (int(year) == UNDATED_YEAR and (first is not None or last is not None))
+    ]
+    columns = [col for col in (columns or manifest["columns"]) if col in manifest["columns"]]
+    schema = _schema(manifest["columns"])
+    if not files:
+        arrow_table = schema.empty_table().select(columns)
+    else:
+        conditions = []
+        if start is not None:
+            conditions.append(ds.field(date_col) >= pd.Timestamp(start).date())
+        if end is not None:
+            conditions.append(ds.field(date_col) <= pd.Timestamp(end).date())
+        if symbols is not None and symbol_col:
+            conditions.append(ds.field(symbol_col).isin([str(symbol) for symbol in symbols]))
+        condition = None
+        for part in conditions:
+            condition = part if condition is None else condition & part
+        dataset = ds.dataset(files, schema=schema, format="ipc", filesystem=pa_fs.LocalFileSystem(use_mmap=True))
+        arrow_table = dataset.to_table(columns=columns, filter=condition)
+    # Plain strings rather than categoricals, as from read_sql
+    for i, field in enumerate(arrow_table.schema):
+        if pa.types.is_dictionary(field.type):
+            arrow_table = arrow_table.set_column(i, field.name, arrow_table.column(i).cast(pa.string()))
+    df = arrow_table.to_pandas(date_as_object=False)
+    if date_col in df.columns:
+        df[date_col] = df[date_col].astype("datetime64[ns]")
+    return df
+
+
+def load_prices(db_path, table, columns=None, start=None, end=None, symbols=None, conn=None, mirror=True):
+    """
+    Price rows of `table` for the analytics pages: from the mirror when pyarrow
+    is installed, otherwise (or if the mirror cannot be written) from SQLite.
+
+    Args:
+        db_path (str): SQLite database path
+        table (str): price table
+        columns (list[str]): columns to return (default: all)
+        start, end: inclusive date bounds (default: unbounded)
+        symbols (list[str]): symbols to return (default: all)
+        conn (sqlite3.Connection): connection for the SQLite reads (default: a new one)
+        mirror (bool): use the mirror; False reads only the requested rows from
+            SQLite, which avoids a full-table mirror build on a first visit
+
+    Returns:
+        pd.DataFrame with the date column as datetime64[ns]
+    """
+    if mirror and pa is not None:
+        try:
+            df = read_mirror(db_path, table, columns, start, end, symbols)
+        except OSError:
+            df = None
+        if df is not None:
+            return df
+    if conn is not None:
+        df = _read_sqlite(conn, table, start, end, symbols)
+    else:
+        with closing(sqlite3.connect(db_path)) as conn:
+            df = _read_sqlite(conn, table, start, end, symbols)
+    date_col, _ = price_keys(df.columns)
+    if date_col:
+        df[date_col] = pd.to_datetime(df[date_col], errors="coerce").dt.normalize()
+    if columns:
+        df = df[[col for col in columns if col in df.columns]]
+    return df
@@ -0,0 +1,229 @@
+# price_panel.py
+#
+# Wide Date x Symbol panels of the price tables, stored as .npy files next
+# to the database so pages can slice them without a SQL query or a pivot:
+#
+#   <db dir>/<db name>_panels/<table>/dates-<id>.npy     datetime64[D] (dates,)
+#   <db dir>/<db name>_panels/<table>/symbols-<id>.npy   str (symbols,)
+#   <db dir>/<db name>_panels/<table>/rows-<id>.npy      bool (dates, symbols): a row exists
+#   <db dir>/<db name>_panels/<table>/<Field>-<id>.npy   float64 (dates, symbols), NaN if no row
+#   <db dir>/<db name>_panels/<table>/manifest.json
+#
+# Panels are C-contiguous with one row per date, so a date range is a
+# contiguous slice of the memory-mapped file. Ingest code that only inserted
+# rows passes them to update_panels() with the database mtime from before
+# its write; if the panels were current at that mtime and every new row is
+# dated after the panel's last date (new trading days for known symbols) the
+# panels are extended by those rows. Any other change (a new symbol, a
+# backfill, an update or delete, a write by another tool) rebuilds them.
+
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+from numpy.lib.format import open_memmap
+
+from price_mirror import load_prices, price_keys
+
+MANIFEST = "manifest.json"
+
+
+def panel_dir(db_path, table):
+    """Directory holding the panels of `table` of the database at `db_path`."""
+    base, _ = os.path.splitext(db_path)
+    return os.path.join(f"{base}_panels", table)
+
+
+def _read_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(root, manifest):
+    path = os.path.join(root, MANIFEST)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+
+def _numeric_fields(df, date_col, symbol_col):
+    return [
+        col for col in df.columns
+        if col not in (date_col, symbol_col) and pd.api.types.is_numeric_dtype(df[col])
+    ]
+
+
+def _fill(target, df, dates, symbols, date_col, symbol_col, fields):
+    """Scatter the rows of `df` into the panels (a key repeated in `df` keeps its last row)."""
+    i = dates.get_indexer(df[date_col])
+    j = symbols.get_indexer(df[symbol_col])
+    target["rows"][i, j] = True
+    for field in fields:
+        target[field][i, j] = pd.to_numeric(df[field], errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _source(db_path, table, fields=None):
+    """Price rows with a date and a symbol; also the total row count and the key/field columns."""
+    df = load_prices(db_path, table)
+    date_col, symbol_col = price_keys(df.columns)
+    if date_col is None or symbol_col is None:
+        raise ValueError(f"{table} has no date and symbol columns to build panels from.")
+    total = len(df)
+    fields = list(fields) if fields is not None else _numeric_fields(df, date_col, symbol_col)
+    df = df.dropna(subset=[date_col, symbol_col])
+    df = df.assign(**{symbol_col: df[symbol_col].astype(str)})
+    return df, total, date_col, symbol_col, fields
+
+
+def _save(root, name, array, token):
+    filename = f"{name}-{token}.npy"
+    np.save(os.path.join(root, filename), array)
+    return filename
+
+
+def _build(db_path, table, root, fields):
+    df, total, date_col, symbol_col, fields = _source(db_path, table, fields)
+    dates = pd.DatetimeIndex(np.sort(df[date_col].unique()))
+    symbols = pd.Index(np.sort(df[symbol_col].unique()))
+    token = uuid.uuid4().hex[:12]
+    files = {
+        "dates": _save(root, "dates", dates.to_numpy().astype("datetime64[D]"), token),
+        "symbols": _save(root, "symbols", symbols.to_numpy().astype(str), token),
+    }
+    shape = (len(dates), len(symbols))
+    target = {}
+    for name, dtype, fill in [("rows", np.bool_, False)] + [(field, np.float64, np.nan) for field in fields]:
+        files[name] = f"{name}-{token}.npy"
+        target[name] = open_memmap(os.path.join(root, files[name]), mode="w+", dtype=dtype, shape=shape)
+        target[name][:] = fill
+    _fill(target, df, dates, symbols, date_col, symbol_col, fields)
+    for array in target.values():
+        array.flush()
+    return {
+        "table": table,
+        "date_column": date_col,
+        "symbol_column": symbol_col,
+        "fields": fields,
+        "files": files,
+        "rows": total,
+        "last_date": str(dates[-1].date()) if len(dates) else None,
+    }
+
+
+def _extend(root, manifest, appended):
+    """Append the rows of `appended` to the panels; None if they are not all new days of known symbols."""
+    if manifest["last_date"] is None:
+        return None
+    date_col, symbol_col, fields = manifest["date_column"], manifest["symbol_column"], manifest["fields"]
+    if not {date_col, symbol_col, *fields} <= set(appended.columns):
+        return None
+    total = manifest["rows"] + len(appended)
+    new = appended.dropna(subset=[date_col, symbol_col])
+    new = new.assign(**{
+        date_col: pd.to_datetime(new[date_col], errors="coerce").dt.normalize(),
+        symbol_col: new[symbol_col].astype(str),
+    })
+    symbols = pd.Index(np.load(os.path.join(root, manifest["files"]["symbols"])))
+    if not (new[date_col] > pd.Timestamp(manifest["last_date"])).all() or not new[symbol_col].isin(symbols).all():
+        return None
+    if new.empty:
+        return dict(manifest, rows=total)
+
+    old_dates = np.load(os.path.join(root, manifest["files"]["dates"]))
+    new_dates = pd.DatetimeIndex(np.sort(new[date_col].unique()))
+    dates = pd.DatetimeIndex(np.concatenate([old_dates.astype("datetime64[ns]"), new_dates.to_numpy()]))
+    token = uuid.uuid4().hex[:12]
+    files = dict(manifest["files"], dates=_save(root, "dates", dates.to_numpy().astype("datetime64[D]"), token))
+    shape = (len(dates), len(symbols))
+    target = {}
+    for name in ["rows"] + fields:
+        old = np.load(os.path.join(root, manifest["files"][name]), mmap_mode="r")
+        files[name] = f"{name}-{token}.npy"
+        target[name] = open_memmap(os.path.join(root, files[name]), mode="w+", dtype=old.dtype, shape=shape)
+        target[name][:len(old)] = old
+        target[name][len(old):] = False if name == "rows" else np.nan
+        del old
+    _fill(target, new, dates, symbols, date_col, symbol_col, fields)
+    for array in target.values():
+        array.flush()
+    return dict(manifest, files=files, rows=total, last_date=str(dates[-1].date()))
+
+
+def update_panels(db_path, table, fields=None, appended=None, base_mtime=None):
+    """
+    Bring the panels of `table` up to date with the database.
+
+    Args:
+        db_path (str): SQLite database path
+        table (str): price table
+        fields (list[str]): value columns to keep as panels (default: every numeric column)
+        appended (pd.DataFrame): rows the caller inserted (e.g. bulk_upsert()'s
+            "inserted_rows"), if that insert was its only change to `table`
+        base_mtime (int): database st_mtime_ns from before that insert; the
+            panels are extended only if they were current at this mtime
+
+    Returns:
+        dict: the panel manifest
+    """
+    root = panel_dir(db_path, table)
+    manifest = _read_manifest(root)
+    mtime = os.stat(db_path).st_mtime_ns
+    same_fields = manifest is not None and (fields is None or set(fields) <= set(manifest["fields"]))
+    if same_fields and manifest["db_mtime"] == mtime:
+        return manifest
+
+    os.makedirs(root, exist_ok=True)
+    updated = None
+    if same_fields and appended is not None and base_mtime is not None and manifest["db_mtime"] == base_mtime:
+        updated = _extend(root, manifest, appended)
+    if updated is None:
+        updated = _build(db_path, table, root, fields)
+    updated["db_mtime"] = mtime
+    _write_manifest(root, updated)
+    # Superseded files; one still mapped by a reader (Windows) is left behind
+    for name in set((manifest or {}).get("files", {}).values()) - set(updated["files"].values()):
+        try:
+            os.remove(os.path.join(root, name))
+        except OSError:
+            pass
+    return updated
+
+
+def open_panels(db_path, table, fields=None):
+    """
+    Memory-mapped panels of `table`, updated first if the database changed.
+
+    Returns:
+        dict with "dates" (pd.DatetimeIndex), "symbols" (pd.Index), "rows"
+        and one read-only (dates, symbols) array per field
+    """
+    manifest = update_panels(db_path, table, fields)
+    root = panel_dir(db_path, table)
+    panels = {name: np.load(os.path.join(root, filename), mmap_mode="r") for name, filename in manifest["files"].items()}
+    panels["dates"] = pd.DatetimeIndex(panels["dates"].astype("datetime64[ns]"), name=manifest["date_column"])
+    panels["symbols"] = pd.Index(np.asarray(panels["symbols"]), name=manifest["symbol_column"])
+    return panels
+
+
+def panel_frame(panels, field, start=None, end=None, symbols=None):
+    """
+    Date x Symbol frame of one panel, sliced by date range (inclusive) and symbols.
+
+    A date range of all symbols is a view of the memory-mapped file; selecting
+    symbols copies just those columns.
+    """
+    dates = panels["dates"]
+    lo = dates.searchsorted(pd.Timestamp(start)) if start is not None else 0
+    hi = dates.searchsorted(pd.Timestamp(end), side="right") if end is not None else len(dates)
+    values, columns = panels[field][lo:hi], panels["symbols"]
+    if symbols is not None:
+        index = columns.get_indexer(list(symbols))
+        index = index[index >= 0]
+        values, columns = values[:, index], columns[index]
+    return pd.DataFrame(values, index=dates[lo:hi], columns=columns, copy=False)
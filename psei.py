@@ -3,14 +3,7 @@ import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
 
-def compute_rsi(series, window=14):
-    delta = series.diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-    avg_gain = gain.rolling(window=window, min_periods=window).mean()
-    avg_loss = loss.rolling(window=window, min_periods=window).mean()
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
+from indicators import compute_indicators, indicator_settings
 
 def show_psei_page():
     st.title("PSEI Technical Indicator Visualizer")
@@ -94,6 +87,7 @@ def show_psei_page():
         st.sidebar.header("Chart Options")
         chart_option = st.sidebar.selectbox("Chart Type", ["Line Chart", "Candlestick"])
         indicators = st.sidebar.multiselect("Select Technical Indicators", ['RSI', 'Stochastic', 'MACD', 'DMI'])
+        params = indicator_settings(st.sidebar, key_prefix="psei")
 
         if chart_option == 'Line Chart':
             cols = st.sidebar.multiselect("Columns to plot", numeric_cols, default=numeric_cols[:1])
@@ -114,45 +108,33 @@ def show_psei_page():
         if indicators:
             st.header("Technical Indicators")
             df = df.sort_values('Date').reset_index(drop=True)
-
-            if 'RSI' in indicators and 'Close' in df.columns:
-                df['RSI'] = compute_rsi(df['Close'])
-                st.subheader('RSI (14)')
-                st.line_chart(df.set_index(pd.to_datetime(df['Date']))['RSI'])
-
-            if 'Stochastic' in indicators and {'High', 'Low', 'Close'}.issubset(df.columns):
-                low14 = df['Low'].rolling(14).min()
-                high14 = df['High'].rolling(14).max()
-                df['%K'] = (df['Close'] - low14) / (high14 - low14) * 100
-                df['%D'] = df['%K'].rolling(3).mean()
+            has_close = 'Close' in df.columns
+            has_hlc = {'High', 'Low', 'Close'}.issubset(df.columns)
+            computable = [
+                ind for ind in indicators
+                if (ind in ('RSI', 'MACD') and has_close) or (ind in ('Stochastic', 'DMI') and has_hlc)
+            ]
+            if computable:
+                df = compute_indicators(df.assign(Stock='PSEI'), computable, params).drop(columns='Stock')
+            chart = df.set_index(pd.to_datetime(df['Date']))
+
+            if 'RSI' in computable:
+                st.subheader(f"RSI ({params['rsi_window']})")
+                st.line_chart(chart['RSI'])
+
+            if 'Stochastic' in computable:
                 st.subheader('Stochastic (%K and %D)')
-                st.line_chart(df.set_index(pd.to_datetime(df['Date']))[['%K', '%D']])
+                st.line_chart(chart[['%K', '%D']])
 
-            if 'MACD' in indicators and 'Close' in df.columns:
-                exp12 = df['Close'].ewm(span=12, adjust=False).mean()
-                exp26 = df['Close'].ewm(span=26, adjust=False).mean()
-                df['MACD'] = exp12 - exp26
-                df['Signal'] = df['MACD'].ewm(span=9, adjust=False).mean()
+            if 'MACD' in computable:
                 st.subheader('MACD and Signal')
-                st.line_chart(df.set_index(pd.to_datetime(df['Date']))[['MACD', 'Signal']])
-                df['Hist'] = df['MACD'] - df['Signal']
+                st.line_chart(chart[['MACD', 'Signal']])
                 st.subheader('MACD Histogram')
-                st.bar_chart(df.set_index(pd.to_datetime(df['Date']))['Hist'])
-
-            if 'DMI' in indicators and {'High', 'Low', 'Close'}.issubset(df.columns):
-                prev_close = df['Close'].shift(1)
-                df['TR'] = df.apply(lambda row: max(
-                    row['High'] - row['Low'], abs(row['High'] - prev_close.loc[row.name]), abs(row['Low'] - prev_close.loc[row.name])
-                ), axis=1)
-                df['+DM'] = df['High'].diff().clip(lower=0)
-                df['-DM'] = df['Low'].diff().clip(upper=0).abs()
-                tr14 = df['TR'].rolling(14).sum()
-                plus_dm14 = df['+DM'].rolling(14).sum()
-                minus_dm14 = df['-DM'].rolling(14).sum()
-                df['+DI'] = 100 * plus_dm14 / tr14
-                df['-DI'] = 100 * minus_dm14 / tr14
-                st.subheader('DMI (+DI and -DI)')
-                st.line_chart(df.set_index(pd.to_datetime(df['Date']))[['+DI', '-DI']])
+                st.bar_chart(chart['Hist'])
+
+            if 'DMI' in computable:
+                st.subheader('DMI (+DI, -DI and ADX)')
+                st.line_chart(chart[['+DI', '-DI', 'ADX']])
 
         df_export = df.copy()
         df_export['Date'] = df_export['Date'].astype(str)
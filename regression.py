@@ -0,0 +1,108 @@
+# regression.py
+#
+# Single-factor regressions (stock returns on a benchmark) for many stocks at
+# once. Inputs are (bar x stock) return panels and a benchmark return series;
+# every statistic is computed with column-wise sums instead of one fit per
+# stock. Missing values are handled pairwise: each stock uses the bars where
+# both it and the benchmark have a return.
+
+import numpy as np
+import pandas as pd
+
+from indicators import rolling_sum
+
+REGRESSION_COLUMNS = ["Alpha", "Beta", "R-squared", "Resid_Vol", "t(Alpha)", "t(Beta)", "Observations"]
+
+
+def _pairwise(y, x):
+    """Stock and benchmark panels with NaN wherever either side is missing."""
+    y = np.asarray(y, dtype=np.float64)
+    y = y[:, None] if y.ndim == 1 else y
+    x = np.asarray(x, dtype=np.float64).reshape(-1, 1)
+    valid = ~np.isnan(y) & ~np.isnan(x)
+    return np.where(valid, y, np.nan), np.where(valid, x, np.nan), valid
+
+
+def regress(y, x):
+    """
+    OLS of every column of `y` on `x` with an intercept: y = alpha + beta * x + e.
+
+    Args:
+        y (np.ndarray): (bars, stocks) stock returns
+        x (np.ndarray): (bars,) benchmark returns
+
+    Returns:
+        dict REGRESSION_COLUMNS -> (stocks,) arrays; Resid_Vol is the standard
+        error of the residuals per bar. Columns with fewer than 3 paired
+        observations (or a constant benchmark) are NaN.
+    """
+    y, x, valid = _pairwise(y, x)
+    n = np.count_nonzero(valid, axis=0).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_x = np.nansum(x, axis=0) / n
+        mean_y = np.nansum(y, axis=0) / n
+        # Centered sums (two-pass) for numerical stability
+        dx = np.where(valid, x - mean_x, 0.0)
+        dy = np.where(valid, y - mean_y, 0.0)
+        sxx = np.einsum("ij,ij->j", dx, dx)
+        syy = np.einsum("ij,ij->j", dy, dy)
+        sxy = np.einsum("ij,ij->j", dx, dy)
+
+        beta = sxy / sxx
+        alpha = mean_y - beta * mean_x
+        sse = np.maximum(syy - beta * sxy, 0.0)
+        resid_var = sse / (n - 2)
+        se_beta = np.sqrt(resid_var / sxx)
+        se_alpha = np.sqrt(resid_var * (1 / n + mean_x ** 2 / sxx))
+        result = {
+            "Alpha": alpha,
+            "Beta": beta,
+            "R-squared": np.where(syy > 0, sxy ** 2 / (sxx * syy), np.nan),
+            "Resid_Vol": np.sqrt(resid_var),
+            "t(Alpha)": alpha / se_alpha,
+            "t(Beta)": beta / se_beta,
+        }
+    usable = (n >= 3) & (sxx > 0)
+    result = {name: np.where(usable, values, np.nan) for name, values in result.items()}
+    result["Observations"] = n.astype(np.int64)
+    return result
+
+
+def rolling_regress(y, x, window=60):
+    """
+    Rolling alpha, beta and R-squared of every column of `y` on `x`.
+
+    Uses window sums of x, y, x*y, x^2 and y^2 from cumulative sums, so the
+    cost does not depend on the window length. A value is NaN unless all
+    `window` bars ending at that row have both a stock and a benchmark return.
+
+    Returns:
+        dict "Alpha", "Beta", "R-squared" -> (bars, stocks) arrays
+    """
+    y, x, valid = _pairwise(y, x)
+    # Shift by the column means so the window sums do not cancel
+    n = np.maximum(np.count_nonzero(valid, axis=0), 1)
+    shift_x, shift_y = np.nansum(x, axis=0) / n, np.nansum(y, axis=0) / n
+    dx, dy = x - shift_x, y - shift_y
+    sx, sy = rolling_sum(dx, window), rolling_sum(dy, window)
+    sxx, syy, sxy = rolling_sum(dx * dx, window), rolling_sum(dy * dy, window), rolling_sum(dx * dy, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var_x = sxx - sx * sx / window
+        var_y = syy - sy * sy / window
+        cov = sxy - sx * sy / window
+        beta = np.where(var_x > 0, cov / var_x, np.nan)
+        alpha = (sy / window + shift_y) - beta * (sx / window + shift_x)
+        r2 = np.where((var_x > 0) & (var_y > 0), cov ** 2 / (var_x * var_y), np.nan)
+    return {"Alpha": alpha, "Beta": beta, "R-squared": np.clip(r2, 0.0, 1.0)}
+
+
+def regression_table(returns, benchmark):
+    """
+    regress() on a Date x Stock returns frame against one of its columns.
+
+    Returns:
+        pd.DataFrame with Stock and REGRESSION_COLUMNS, one row per other stock
+    """
+    stocks = returns.drop(columns=benchmark)
+    result = regress(stocks.to_numpy(dtype=np.float64), returns[benchmark].to_numpy(dtype=np.float64))
+    return pd.DataFrame({"Stock": stocks.columns, **result})[["Stock"] + REGRESSION_COLUMNS]
@@ -1,10 +1,23 @@
 
 import streamlit as st
 import pandas as pd
-import openpyxl
 import sqlite3
 import os
 
+from bth_parser import parse_bth_files
+from db_ingest import bulk_upsert
+from indicator_store import ensure_indicators, read_indicators, update_indicators
+from indicators import INDICATOR_COLUMNS
+from market_store import get_store
+from price_mirror import sync_mirror
+from price_panel import open_panels, panel_frame, update_panels
+from regression import regression_table, rolling_regress
+
+@st.cache_data(show_spinner="Parsing workbooks...", max_entries=10)
+def load_bth_uploads(contents):
+    """parse_bth_files() cached by the uploaded workbooks' contents, so reruns do not re-read them."""
+    return parse_bth_files(contents)
+
 def show_stock_ohlc_update_page():
     st.title("📈 Stock OHLC Database Update")
 
@@ -25,33 +38,6 @@ def show_stock_ohlc_update_page():
     mode = st.sidebar.selectbox("Select Mode", ["Update / Create Stock Database", "Read an Existing Database"])
     db_path = st.sidebar.text_input("SQLite DB Path","ohlc_bbdata.db")
 
-    def parse_excel(file):
-        wb = openpyxl.load_workbook(file, data_only=True)
-        ws = wb.active
-        datasets = []
-        col_index = 1
-        while True:
-            stock_cell = ws.cell(row=4, column=col_index)
-            if stock_cell.value is None:
-                break
-            stock_raw = stock_cell.value
-            stock = stock_raw.split()[0] if isinstance(stock_raw, str) else stock_raw
-            data = []
-            row_index = 6
-            while True:
-                row = [ws.cell(row=row_index, column=col_index + i).value for i in range(7)]
-                if all(cell is None for cell in row):
-                    break
-                data.append(row)
-                row_index += 1
-            if data:
-                df = pd.DataFrame(data, columns=["Date", "Open", "High", "Low", "Close", "Volume", "Value"])
-                df.insert(0, "Stock", stock)
-                df["Date"] = pd.to_datetime(df["Date"]).dt.date
-                datasets.append(df)
-            col_index += 8
-        return pd.concat(datasets, ignore_index=True) if datasets else pd.DataFrame()
-
     def save_to_db(df, db_path):
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
@@ -69,33 +55,38 @@ def show_stock_ohlc_update_page():
                 PRIMARY KEY (Stock, Date)
             )
         """)
-        existing_keys = pd.read_sql("SELECT Stock, Date FROM stock_data", conn)
-        existing_keys["Date"] = pd.to_datetime(existing_keys["Date"]).dt.date
-        df_merged = df.merge(existing_keys, on=["Stock", "Date"], how="left", indicator=True)
-        new_data = df_merged[df_merged["_merge"] == "left_only"].drop(columns=["_merge"])
+        df = df.assign(Date=pd.to_datetime(df["Date"]).dt.strftime("%Y-%m-%d"))
+        base_mtime = os.stat(db_path).st_mtime_ns
+        result = bulk_upsert(
+            conn, "stock_data",
+            df[["Stock", "Date", "Open", "High", "Low", "Close", "Volume", "Value", "VWAP"]],
+            range_column="Date",
+        )
+        new_data = result["inserted_rows"]
         if not new_data.empty:
-            new_data[["Stock", "Date", "Open", "High", "Low", "Close", "Volume", "Value", "VWAP"]].to_sql(
-                "stock_data", conn, if_exists="append", index=False
-            )
+            # Advance the stored indicator state by the new bars
+            update_indicators(conn, new_data)
         conn.close()
+        # Refresh the columnar mirror for the years just written
+        if not new_data.empty:
+            sync_mirror(db_path, "stock_data", pd.to_datetime(new_data["Date"]).dt.year.unique())
+            update_panels(db_path, "stock_data", appended=new_data, base_mtime=base_mtime)
         return new_data
 
     def read_database(db_path):
         if not os.path.exists(db_path):
             st.error(f"Database file `{db_path}` not found.")
             return pd.DataFrame()
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql("SELECT * FROM stock_data", conn, parse_dates=["Date"])
-        df["Date"] = pd.to_datetime(df["Date"]).dt.date
-        conn.close()
+        df = get_store(db_path).get_ohlc()
+        df["Date"] = df["Date"].dt.date
         return df
 
     if mode == "Update / Create Stock Database":
-        uploaded_file = st.sidebar.file_uploader("Upload Excel File", type=["xlsx"])
+        uploaded_files = st.sidebar.file_uploader("Upload Excel File(s)", type=["xlsx"], accept_multiple_files=True)
         create_db_btn = st.sidebar.button("Save to Database")
 
-        if uploaded_file:
-            parsed_df = parse_excel(uploaded_file)
+        if uploaded_files:
+            parsed_df = load_bth_uploads(tuple(file.getvalue() for file in uploaded_files))
             if not parsed_df.empty:
                 parsed_df["VWAP"] = (parsed_df["Value"] / parsed_df["Volume"]).round(4)
                 parsed_df["Volume"] = parsed_df["Volume"].astype("Int64")
@@ -191,7 +182,14 @@ def show_stock_ohlc_update_page():
 
             if len(valid_selected_columns) == 1:
                 value_col = valid_selected_columns[0]
-                pivot_df = filtered_df.pivot(index="Date", columns="Stock", values=value_col).sort_index()
+                # Slice the memory-mapped Date x Stock panel instead of pivoting
+                panels = open_panels(db_path, "stock_data")
+                window = dict(start=date_range[0], end=date_range[1], symbols=sorted(selected_stocks))
+                present = panel_frame(panels, "rows", **window)
+                # Forward-fill over each stock's own rows only, as on the long table
+                pivot_df = panel_frame(panels, value_col, **window).ffill().where(present)
+                pivot_df = pivot_df.loc[present.any(axis=1), present.any(axis=0)]
+                pivot_df.index = pd.Index(pivot_df.index.date, name="Date")
                 st.dataframe(pivot_df)
 
                 st.sidebar.markdown("---")
@@ -223,27 +221,25 @@ def show_stock_ohlc_update_page():
                     st.dataframe(correlation)
 
                 if "Regression" in selected_analyses:
-                    if 'daily_return' not in locals():
-                        daily_return = pivot_df.pct_change().dropna()
                     st.markdown("**📐 Regression vs. Benchmark**")
                     benchmark_stock = st.selectbox("Select Benchmark Stock", pivot_df.columns)
-                    import statsmodels.api as sm
-                    regressions = []
-                    for stock in daily_return.columns:
-                        if stock == benchmark_stock:
-                            continue
-                        X = daily_return[benchmark_stock]
-                        y = daily_return[stock]
-                        X = sm.add_constant(X)
-                        model = sm.OLS(y, X).fit()
-                        regressions.append({
-                            "Stock": stock,
-                            "Beta": model.params[benchmark_stock],
-                            "Alpha": model.params["const"],
-                            "R-squared": model.rsquared
-                        })
-                    reg_df = pd.DataFrame(regressions)
-                    st.dataframe(reg_df)
+                    # Pairwise: each stock uses the days where it and the benchmark both have a return
+                    returns = pivot_df.pct_change(fill_method=None)
+                    reg_df = regression_table(returns, benchmark_stock)
+                    st.dataframe(
+                        reg_df.style.format({
+                            "Alpha": "{:.6f}", "Beta": "{:.4f}", "R-squared": "{:.4f}", "Resid_Vol": "{:.6f}",
+                            "t(Alpha)": "{:.2f}", "t(Beta)": "{:.2f}",
+                        }, na_rep="-"),
+                        hide_index=True
+                    )
+
+                    rolling_window = int(st.number_input("Rolling Beta Window (days)", min_value=5, max_value=500, value=60))
+                    others = returns.drop(columns=benchmark_stock)
+                    if len(others.columns) and len(returns) >= rolling_window:
+                        rolling = rolling_regress(others.to_numpy(), returns[benchmark_stock].to_numpy(), rolling_window)
+                        st.markdown(f"**📈 Rolling {rolling_window}-Day Beta vs. {benchmark_stock}**")
+                        st.line_chart(pd.DataFrame(rolling["Beta"], index=returns.index, columns=others.columns))
 
             else:
                 reshaped = []
@@ -253,3 +249,23 @@ def show_stock_ohlc_update_page():
                     reshaped.append(temp)
                 combined_df = pd.concat(reshaped, axis=1).sort_index()
                 st.dataframe(combined_df)
+
+            # Stored indicators: indexed read of the materialized values
+            st.sidebar.markdown("---")
+            indicator_names = st.sidebar.multiselect("Technical Indicators", list(INDICATOR_COLUMNS))
+            if indicator_names and selected_stocks:
+                conn = sqlite3.connect(db_path)
+                try:
+                    built = ensure_indicators(conn, selected_stocks)
+                    if built:
+                        st.caption(f"Indicators built for: {', '.join(built)}")
+                    columns = [col for name in indicator_names for col in INDICATOR_COLUMNS[name]]
+                    ind_df = read_indicators(conn, selected_stocks, date_range[0], date_range[1], columns)
+                finally:
+                    conn.close()
+
+                st.subheader("📉 Technical Indicators")
+                for name in indicator_names:
+                    for col in INDICATOR_COLUMNS[name]:
+                        st.markdown(f"**{col}**")
+                        st.line_chart(ind_df.pivot(index="Date", columns="Stock", values=col))
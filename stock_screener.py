@@ -0,0 +1,261 @@
+# stock_screener.py
+
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from indicators import bar_panel, macd, rolling_mean, rsi, shift
+from market_store import get_store
+
+# Condition label -> (metric test, threshold label or None, default threshold)
+CONDITIONS = {
+    "RSI below": (lambda m, x: m["RSI"] < x, "RSI level", 30.0),
+    "RSI above": (lambda m, x: m["RSI"] > x, "RSI level", 70.0),
+    "MACD bullish crossover (last bar)": (lambda m, x: m["MACD_Cross"] == "Bullish", None, None),
+    "MACD bearish crossover (last bar)": (lambda m, x: m["MACD_Cross"] == "Bearish", None, None),
+    "Price above moving average": (lambda m, x: m["Price"] > m["MA"], None, None),
+    "Price below moving average": (lambda m, x: m["Price"] < m["MA"], None, None),
+    "Volume above x ADV": (lambda m, x: m["Volume_Ratio"] > x, "Multiple of ADV", 2.0),
+    "Price above VWAP by at least %": (lambda m, x: m["VWAP_Dev_%"] >= x, "Deviation %", 2.0),
+    "Price below VWAP by at least %": (lambda m, x: m["VWAP_Dev_%"] <= -x, "Deviation %", 2.0),
+}
+
+METRIC_COLUMNS = [
+    "Stock", "Basis", "Last_Date", "Price", "Change_%", "RSI", "MACD", "Signal", "MACD_Cross",
+    "MA", "Price_vs_MA_%", "Volume", "ADV", "Volume_Ratio", "VWAP", "VWAP_Dev_%", "Bars",
+]
+
+
+def _mtime(path):
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+@st.cache_data(show_spinner=False)
+def load_universe(ohlc_path, vwap_path, ohlc_mtime, vwap_mtime):
+    """
+    Daily price, volume and market VWAP of every stock in the OHLC and VWAP databases.
+
+    Stocks in the OHLC database use Close as the price (Basis "Close"); stocks
+    only in the VWAP database use the daily VWAP (Basis "VWAP"). The market
+    VWAP comes from the VWAP database, or from the OHLC VWAP column when the
+    VWAP database has no row for that day.
+
+    Returns:
+        pd.DataFrame with Stock, Date, Price, Volume, VWAP, Basis
+    """
+    frames = []
+    market = pd.DataFrame(columns=["Stock", "Date", "Volume", "Market_VWAP"])
+    if vwap_mtime is not None:
+        # One market row per security and day, summed over the source sheets
+        sheets = get_store(vwap_path).get_vwap(columns=["Security", "Date", "Volume", "Value"])
+        market = (
+            sheets.groupby(["Security", "Date"], as_index=False)[["Volume", "Value"]].sum(min_count=1)
+            .rename(columns={"Security": "Stock"})
+        )
+        market["Market_VWAP"] = market["Value"] / market["Volume"].where(market["Volume"] != 0)
+        market = market[["Stock", "Date", "Volume", "Market_VWAP"]]
+
+    ohlc_stocks = set()
+    if ohlc_mtime is not None:
+        ohlc = get_store(ohlc_path).get_ohlc(columns=["Stock", "Date", "Close", "Volume", "VWAP"])
+        ohlc_stocks = set(ohlc["Stock"])
+        ohlc = ohlc.merge(market[["Stock", "Date", "Market_VWAP"]], on=["Stock", "Date"], how="left")
+        frames.append(pd.DataFrame({
+            "Stock": ohlc["Stock"],
+            "Date": ohlc["Date"],
+            "Price": ohlc["Close"],
+            "Volume": ohlc["Volume"],
+            "VWAP": ohlc["Market_VWAP"].fillna(ohlc["VWAP"]),
+            "Basis": "Close",
+        }))
+
+    vwap_only = market[~market["Stock"].isin(ohlc_stocks)]
+    frames.append(pd.DataFrame({
+        "Stock": vwap_only["Stock"],
+        "Date": vwap_only["Date"],
+        "Price": vwap_only["Market_VWAP"],
+        "Volume": vwap_only["Volume"],
+        "VWAP": np.nan,
+        "Basis": "VWAP",
+    }))
+    universe = pd.concat(frames, ignore_index=True)
+    universe["Date"] = pd.to_datetime(universe["Date"])
+    for col in ["Price", "Volume", "VWAP"]:
+        universe[col] = pd.to_numeric(universe[col], errors="coerce")
+    return universe
+
+
+@st.cache_data(show_spinner=False)
+def screen_metrics(universe, ma_window=50, adv_window=20, rsi_window=14):
+    """
+    Last-bar screening metrics for every stock, computed on one (bar x stock) panel.
+
+    Returns:
+        pd.DataFrame with METRIC_COLUMNS, one row per stock
+    """
+    if universe.empty:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    panels, (bars, stock_codes, positions), stocks = bar_panel(universe, ["Price", "Volume", "VWAP"])
+    price, volume = panels["Price"], panels["Volume"]
+    n_stocks = len(stocks)
+    counts = np.bincount(stock_codes, minlength=n_stocks)
+    cols = np.arange(n_stocks)
+    last = counts - 1
+    prev = np.maximum(counts - 2, 0)
+    has_prev = counts >= 2
+
+    def at(panel, rows):
+        return panel[rows, cols]
+
+    rsi_panel = rsi(price, rsi_window)
+    macd_line, signal_line, _ = macd(price)
+    ma = rolling_mean(price, ma_window)
+    # Average daily volume over the days before the last bar
+    adv = rolling_mean(shift(volume), adv_window)
+
+    above_now = at(macd_line, last) > at(signal_line, last)
+    above_before = at(macd_line, prev) > at(signal_line, prev)
+    cross = np.where(
+        has_prev & above_now & ~above_before, "Bullish",
+        np.where(has_prev & ~above_now & above_before, "Bearish", "None"),
+    )
+
+    last_rows = np.zeros(n_stocks, dtype=np.int64)
+    last_rows[stock_codes] = positions
+    ordered = universe.reset_index(drop=True)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        metrics = pd.DataFrame({
+            "Stock": stocks,
+            "Basis": ordered["Basis"].to_numpy()[last_rows],
+            "Last_Date": ordered["Date"].to_numpy()[last_rows],
+            "Price": at(price, last),
+            "Change_%": np.where(has_prev, (at(price, last) / at(price, prev) - 1) * 100, np.nan),
+            "RSI": at(rsi_panel, last),
+            "MACD": at(macd_line, last),
+            "Signal": at(signal_line, last),
+            "MACD_Cross": cross,
+            "MA": at(ma, last),
+            "Price_vs_MA_%": (at(price, last) / at(ma, last) - 1) * 100,
+            "Volume": at(volume, last),
+            "ADV": at(adv, last),
+            "Volume_Ratio": at(volume, last) / at(adv, last),
+            "VWAP": at(panels["VWAP"], last),
+            "VWAP_Dev_%": (at(price, last) / at(panels["VWAP"], last) - 1) * 100,
+            "Bars": counts,
+        })
+    return metrics.replace([np.inf, -np.inf], np.nan)[METRIC_COLUMNS]
+
+
+def run_screen(metrics, rules, match="All", rank_by="RSI", ascending=True):
+    """
+    Apply screening rules to the metrics table in one vectorized pass.
+
+    Args:
+        metrics (pd.DataFrame): screen_metrics output
+        rules (list[tuple[str, float]]): (CONDITIONS label, threshold)
+        match (str): "All" (every rule) or "Any" (at least one rule)
+        rank_by (str): metric column to rank by (after Conditions_Met for "Any")
+
+    Returns:
+        pd.DataFrame of matching stocks with Rank and Conditions_Met
+    """
+    if rules:
+        hits = np.column_stack([
+            CONDITIONS[label][0](metrics, threshold).fillna(False).to_numpy(dtype=bool)
+            for label, threshold in rules
+        ])
+        met = hits.sum(axis=1)
+        keep = met == len(rules) if match == "All" else met > 0
+    else:
+        met = np.zeros(len(metrics), dtype=np.int64)
+        keep = np.ones(len(metrics), dtype=bool)
+    result = metrics.assign(Conditions_Met=met)[keep]
+    if match == "Any":
+        result = result.sort_values(["Conditions_Met", rank_by], ascending=[False, ascending], na_position="last")
+    else:
+        result = result.sort_values(rank_by, ascending=ascending, na_position="last")
+    result.insert(0, "Rank", np.arange(1, len(result) + 1))
+    return result.reset_index(drop=True)
+
+
+def show_stock_screener_page():
+    st.title("🔎 Stock Screener")
+
+    ohlc_path = st.sidebar.text_input("OHLC DB Path", "ohlc_bbdata.db")
+    vwap_path = st.sidebar.text_input("VWAP DB Path", "stock_vwap.db")
+    ohlc_mtime, vwap_mtime = _mtime(ohlc_path), _mtime(vwap_path)
+    if ohlc_mtime is None and vwap_mtime is None:
+        st.error("Neither database was found. Check the paths in the sidebar.")
+        return
+
+    st.sidebar.header("Windows")
+    ma_window = int(st.sidebar.number_input("Moving average (days)", 2, 400, 50))
+    adv_window = int(st.sidebar.number_input("Average daily volume (days)", 2, 250, 20))
+    rsi_window = int(st.sidebar.number_input("RSI window", 2, 100, 14))
+
+    st.sidebar.header("Conditions")
+    selected = st.sidebar.multiselect(
+        "Screening conditions", list(CONDITIONS),
+        default=["RSI below", "Volume above x ADV"]
+    )
+    rules = []
+    for label in selected:
+        _, threshold_label, default = CONDITIONS[label]
+        threshold = (
+            st.sidebar.number_input(f"{label}: {threshold_label}", value=default, key=f"screen_{label}")
+            if threshold_label else None
+        )
+        rules.append((label, threshold))
+    match = st.sidebar.radio("Match", ["All", "Any"], horizontal=True)
+    latest_only = st.sidebar.checkbox("Only stocks that traded on the latest date", value=True)
+
+    try:
+        with st.spinner("Loading price history..."):
+            universe = load_universe(ohlc_path, vwap_path, ohlc_mtime, vwap_mtime)
+            metrics = screen_metrics(universe, ma_window, adv_window, rsi_window)
+    except Exception as e:
+        st.error(f"Error reading the databases: {e}")
+        return
+    if metrics.empty:
+        st.warning("No price data found in the databases.")
+        return
+
+    numeric_cols = [col for col in METRIC_COLUMNS if col not in ("Stock", "Basis", "Last_Date", "MACD_Cross")]
+    rank_by = st.sidebar.selectbox("Rank by", numeric_cols, index=numeric_cols.index("RSI"))
+    ascending = st.sidebar.checkbox("Ascending", value=True)
+
+    started = time.perf_counter()
+    pool = metrics[metrics["Last_Date"] == metrics["Last_Date"].max()] if latest_only else metrics
+    result = run_screen(pool, rules, match, rank_by, ascending)
+    elapsed = (time.perf_counter() - started) * 1000
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Stocks screened", f"{len(pool):,}")
+    col2.metric("Matches", f"{len(result):,}")
+    col3.metric("Latest date", f"{metrics['Last_Date'].max():%Y-%m-%d}")
+    st.caption(
+        f"Screen evaluated in {elapsed:,.1f} ms. Basis \"Close\" uses the OHLC database; "
+        "\"VWAP\" stocks are only in the VWAP database and use the daily VWAP as price "
+        "(no VWAP deviation). Metrics are cached until either database changes."
+    )
+
+    st.subheader("📋 Screen Results")
+    st.dataframe(
+        result.style.format({
+            "Last_Date": "{:%Y-%m-%d}",
+            "Price": "{:,.4f}", "MA": "{:,.4f}", "VWAP": "{:,.4f}",
+            "MACD": "{:,.4f}", "Signal": "{:,.4f}",
+            "Change_%": "{:,.2f}", "RSI": "{:,.1f}", "Price_vs_MA_%": "{:,.2f}",
+            "Volume": "{:,.0f}", "ADV": "{:,.0f}", "Volume_Ratio": "{:,.2f}", "VWAP_Dev_%": "{:,.2f}",
+        }, na_rep="-"),
+        use_container_width=True, hide_index=True
+    )
+    st.download_button(
+        "📥 Download Screen as CSV",
+        result.to_csv(index=False).encode("utf-8"),
+        file_name="stock_screen.csv", mime="text/csv"
+    )
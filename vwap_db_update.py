@@ -1,5 +1,7 @@
 # db_vwap_app.py
 
+import hashlib
+import io
 import streamlit as st
 import pandas as pd
 import sqlite3
@@ -7,6 +9,10 @@ from datetime import datetime
 import plotly.express as px
 import os
 
+from db_ingest import bulk_upsert, read_ingest_detail, read_ingest_history, record_ingest
+from market_store import get_store
+from price_mirror import sync_mirror
+
 def show_vwap_db_update_page():
     st.title(":bar_chart: Stock Volume & VWAP Dashboard")
 
@@ -37,12 +43,18 @@ def show_vwap_db_update_page():
         with open(LOG_FILE, "a") as f:
             f.write(f"[{datetime.now()}] {message}\n")
 
+    # --- Delete and count the rows removed ---
+    def delete_rows(conn, sql, params):
+        # cursor.rowcount stays 0 when stock_data is the layout v2 view (the
+        # delete runs in its INSTEAD OF trigger); total_changes counts those rows
+        before = conn.total_changes
+        conn.execute(sql, params)
+        return conn.total_changes - before
+
     # --- Delete by Date ---
     def delete_data_by_date(conn, selected_date):
         try:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM stock_data WHERE Date = ?", (selected_date,))
-            deleted = cursor.rowcount
+            deleted = delete_rows(conn, "DELETE FROM stock_data WHERE Date = ?", (selected_date,))
             conn.commit()
             log_to_file(f"Deleted {deleted} records for Date = {selected_date}")
             return deleted
@@ -54,16 +66,15 @@ def show_vwap_db_update_page():
     # --- Delete by Security with Confirmation ---
     def delete_data_by_security(conn, selected_security):
         try:
-            df = pd.read_sql("SELECT * FROM stock_data WHERE Security = ?", conn, params=(selected_security,))
+            df = get_store(db_input_file).get_vwap([selected_security])
+            df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
             if df.empty:
                 st.sidebar.info(f"No records found for Security: {selected_security}")
                 return
             st.sidebar.subheader(f"Records to Delete for {selected_security}")
             st.sidebar.dataframe(df)
             if st.sidebar.button(f"Confirm Delete for {selected_security}"):
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM stock_data WHERE Security = ?", (selected_security,))
-                deleted = cursor.rowcount
+                deleted = delete_rows(conn, "DELETE FROM stock_data WHERE Security = ?", (selected_security,))
                 conn.commit()
                 log_to_file(f"Deleted {deleted} records for Security = {selected_security}")
                 st.sidebar.success(f"Deleted {deleted} records for {selected_security}")
@@ -74,58 +85,26 @@ def show_vwap_db_update_page():
             st.sidebar.error(f"Error deleting by Security: {e}")
 
     # --- Save to DB with duplicate prevention and audit trail ---
-    def save_to_db(df, conn):
+    def save_to_db(df, conn, file_name=None, file_hash=None, sheet=None, keep_detail=False):
         df = df.copy()
         df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
         df['Security'] = df['Security'].astype(str).str.strip().str.upper()
         df['SourceSheet'] = df['SourceSheet'].astype(str).str.strip().str.upper()
-        df['key'] = df['Date'] + '|' + df['Security'] + '|' + df['SourceSheet']
-
-        try:
-            existing = pd.read_sql("SELECT Date, Security, SourceSheet FROM stock_data", conn)
-            existing['Date'] = pd.to_datetime(existing['Date']).dt.strftime('%Y-%m-%d')
-            existing['Security'] = existing['Security'].astype(str).str.strip().str.upper()
-            existing['SourceSheet'] = existing['SourceSheet'].astype(str).str.strip().str.upper()
-            existing['key'] = existing['Date'] + '|' + existing['Security'] + '|' + existing['SourceSheet']
-            duplicates = df[df['key'].isin(existing['key'])]
-            skipped_keys = duplicates['key'].tolist()
-            if skipped_keys:
-                log_to_file(f"SKIPPED duplicate entries: {skipped_keys}")
-            df = df[~df['key'].isin(existing['key'])].drop(columns='key')
-        except Exception as e:
-            st.warning(f"Failed to check existing records. Proceeding to insert all rows. Error: {e}")
-            log_to_file(f"ERROR during duplicate check: {e}")
-            df = df.drop(columns='key')
-
-        if df.empty:
-            return 0, None
-
-        insert_query = """
-            INSERT OR IGNORE INTO stock_data (Date, Security, Volume, Value, VWAP, SourceSheet)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """
-        records = []
-        for _, row in df.iterrows():
-            try:
-                records.append((row['Date'], row['Security'], row['Volume'], row['Value'], row['VWAP'], row['SourceSheet']))
-            except Exception as e:
-                log_to_file(f"ERROR formatting record: {row.to_dict()} - {e}")
 
         try:
-            cursor = conn.cursor()
-            cursor.executemany(insert_query, records)
-            conn.commit()
-            inserted = cursor.rowcount
-            log_to_file(f"INSERTED {inserted} new records.")
-            return inserted, df
-        except sqlite3.IntegrityError as e:
-            log_to_file(f"IntegrityError on insert: {e}")
-            st.error("Database insert failed due to duplicate primary keys.")
-            return 0, None
-        except Exception as e:
+            result = bulk_upsert(
+                conn, "stock_data", df[['Date', 'Security', 'Volume', 'Value', 'VWAP', 'SourceSheet']],
+                range_column="Date"
+            )
+        except sqlite3.Error as e:
             log_to_file(f"Unexpected DB error: {e}")
             st.error(f"Unexpected error during database insert: {e}")
-            return 0, None
+            record_ingest(conn, "stock_data", None, file_name, file_hash, sheet, failed=len(df))
+            return None
+
+        # One audit row per batch; skipped keys only on request (compressed)
+        record_ingest(conn, "stock_data", result, file_name, file_hash, sheet, keep_detail=keep_detail)
+        return result
 
     # --- Parse Excel Blocks ---
     def extract_blocks(sheet_df, sheet_name):
@@ -146,9 +125,9 @@ def show_vwap_db_update_page():
         return pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame()
 
     # --- Load from DB ---
-    def load_all_data(conn):
-        df = pd.read_sql("SELECT * FROM stock_data", conn, parse_dates=["Date"])
-        df['Date'] = pd.to_datetime(df['Date']).dt.strftime('%Y-%m-%d')
+    def load_all_data(db_path):
+        df = get_store(db_path).get_vwap()
+        df['Date'] = df['Date'].dt.strftime('%Y-%m-%d')
         return df
 
     # --- Sidebar: DB File Selector and Load ---
@@ -158,7 +137,7 @@ def show_vwap_db_update_page():
 
     if st.sidebar.checkbox("Show Current Dataset"):
         try:
-            current_data = load_all_data(conn)
+            current_data = load_all_data(db_input_file)
             st.subheader("📄 Current Database Content")
             st.dataframe(current_data)
         except Exception as e:
@@ -168,6 +147,8 @@ def show_vwap_db_update_page():
     st.sidebar.markdown("---")
     st.sidebar.header("Upload Monthly Volume Excel (DB Update)")
     uploaded_volume = st.sidebar.file_uploader("Upload Monthly Excel File", type="xlsx", key="monthly")
+    keep_detail = st.sidebar.checkbox("Keep skipped keys in the ingest log (compressed)", value=False)
+    show_history = st.sidebar.checkbox("Show Ingest History")
 
     # --- Sidebar: Delete Data by Date ---
     st.sidebar.markdown("---")
@@ -183,7 +164,7 @@ def show_vwap_db_update_page():
     # --- Sidebar: Delete by Security ---
     st.sidebar.markdown("---")
     st.sidebar.header("Delete by Security")
-    all_securities = pd.read_sql("SELECT DISTINCT Security FROM stock_data ORDER BY Security", conn)['Security'].tolist()
+    all_securities = get_store(db_input_file).list_symbols()
     selected_sec = st.sidebar.selectbox("Select Security to Delete", all_securities)
     if selected_sec:
         delete_data_by_security(conn, selected_sec)
@@ -192,40 +173,97 @@ def show_vwap_db_update_page():
     sheet_names = [datetime(2025, i, 1).strftime('%B %Y') for i in range(1, 13)]
 
     if uploaded_volume:
-        xls = pd.ExcelFile(uploaded_volume)
-        all_blocks = []
-        sheet_counts = {}
-        for sheet in sheet_names:
-            if sheet in xls.sheet_names:
-                sheet_df = pd.read_excel(xls, sheet_name=sheet, header=None)
-                parsed = extract_blocks(sheet_df, sheet)
-                if not parsed.empty:
-                    sheet_counts[sheet] = len(parsed)
-                    all_blocks.append(parsed)
-        combined_df = pd.concat(all_blocks, ignore_index=True) if all_blocks else pd.DataFrame()
-        if not combined_df.empty:
-            combined_df.dropna(subset=['Security'], inplace=True)
-            combined_df = combined_df[combined_df['Security'].str.upper() != 'TOTAL:']
-            combined_df['Volume'] = pd.to_numeric(combined_df['Volume'], errors='coerce')
-            combined_df['Value'] = pd.to_numeric(combined_df['Value'], errors='coerce')
-            combined_df['VWAP'] = combined_df['Value'] / combined_df['Volume']
-            combined_df = combined_df[['Date', 'Security', 'Volume', 'Value', 'VWAP', 'SourceSheet']]
-            inserted, new_data = save_to_db(combined_df, conn)
-
-            for sheet, count in sheet_counts.items():
-                st.write(f"✅ Parsed {count} records from sheet: {sheet}")
+        file_bytes = uploaded_volume.getvalue()
+        ingest_key = (db_input_file, hashlib.sha1(file_bytes).hexdigest())
+        ingested = st.session_state.setdefault("vwap_ingested", {})
+        reimport = st.sidebar.button("Re-import Uploaded File")
+        if ingest_key not in ingested or reimport:
+            xls = pd.ExcelFile(io.BytesIO(file_bytes))
+            all_blocks = []
+            sheet_counts = {}
+            for sheet in sheet_names:
+                if sheet in xls.sheet_names:
+                    sheet_df = pd.read_excel(xls, sheet_name=sheet, header=None)
+                    parsed = extract_blocks(sheet_df, sheet)
+                    if not parsed.empty:
+                        sheet_counts[sheet] = len(parsed)
+                        all_blocks.append(parsed)
+            combined_df = pd.concat(all_blocks, ignore_index=True) if all_blocks else pd.DataFrame()
+            results = []
+            if not combined_df.empty:
+                combined_df.dropna(subset=['Security'], inplace=True)
+                combined_df = combined_df[combined_df['Security'].str.upper() != 'TOTAL:']
+                combined_df['Volume'] = pd.to_numeric(combined_df['Volume'], errors='coerce')
+                combined_df['Value'] = pd.to_numeric(combined_df['Value'], errors='coerce')
+                combined_df['VWAP'] = combined_df['Value'] / combined_df['Volume']
+                combined_df = combined_df[['Date', 'Security', 'Volume', 'Value', 'VWAP', 'SourceSheet']]
+                for sheet, batch in combined_df.groupby('SourceSheet', sort=False):
+                    result = save_to_db(batch, conn, uploaded_volume.name, ingest_key[1], sheet, keep_detail)
+                    if result:
+                        results.append(result)
+                # Refresh the columnar mirror for the years just written; with no
+                # rows inserted the audit rows still changed the file, so re-stamp it
+                ranges = [result["inserted_range"] for result in results if result["inserted"]]
+                years = []
+                if ranges:
+                    first, last = min(r[0] for r in ranges), max(r[1] for r in ranges)
+                    years = range(int(first[:4]), int(last[:4]) + 1)
+                sync_mirror(db_input_file, "stock_data", years)
+            ingested[ingest_key] = (sheet_counts, results)
+        else:
+            st.caption("This file was already imported in this session. Use **Re-import Uploaded File** to load it again.")
 
+        sheet_counts, results = ingested[ingest_key]
+        for sheet, count in sheet_counts.items():
+            st.write(f"✅ Parsed {count} records from sheet: {sheet}")
+
+        if sheet_counts:
+            inserted = sum(result["inserted"] for result in results)
+            skipped = sum(result["skipped"] for result in results)
             if inserted > 0:
-                date_from = new_data['Date'].min()
-                date_to = new_data['Date'].max()
+                ranges = [result["inserted_range"] for result in results if result["inserted"]]
+                date_from, date_to = min(r[0] for r in ranges), max(r[1] for r in ranges)
                 st.success(f"✅ {inserted} new records added from {date_from} to {date_to}.")
             else:
                 st.info("No new records were added to the database.")
                 try:
-                    db_data = load_all_data(conn)
-                    if not db_data.empty:
-                        earliest = db_data['Date'].min()
-                        latest = db_data['Date'].max()
+                    earliest, latest = get_store(db_input_file).date_bounds()
+                    if earliest is not None:
                         st.info(f"Current DB data range: {earliest} to {latest}.")
                 except Exception as e:
                     st.warning(f"Unable to summarize DB contents: {e}")
+            if skipped:
+                ranges = [result["skipped_range"] for result in results if result["skipped"]]
+                st.info(
+                    f"{skipped} records already in the database were skipped "
+                    f"({min(r[0] for r in ranges)} to {max(r[1] for r in ranges)})."
+                )
+
+    # --- Ingest History ---
+    if show_history:
+        history = read_ingest_history(conn)
+        st.subheader("📜 Ingest History")
+        if history.empty:
+            st.info("No uploads have been recorded in this database yet.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Batches", f"{len(history):,}")
+            col2.metric("Records inserted", f"{int(history['Inserted'].sum()):,}")
+            col3.metric("Median throughput", f"{history['Rows_Per_Sec'].median():,.0f} rows/s")
+            st.dataframe(
+                history.style.format({"Duration_Sec": "{:,.3f}", "Rows_Per_Sec": "{:,.0f}"}, na_rep="-"),
+                hide_index=True
+            )
+            fig = px.bar(
+                history.sort_values("Batch_Id"), x="Batch_Id", y="Rows_Per_Sec", color="Sheet",
+                hover_data=["Ingested_At", "File_Name", "Inserted", "Skipped", "Failed"],
+                title="Ingest Throughput by Batch (rows/s)"
+            )
+            st.plotly_chart(fig, use_container_width=True)
+
+            with_detail = history.loc[history["Has_Detail"] == 1, "Batch_Id"].tolist()
+            if with_detail:
+                batch_id = st.selectbox("Show skipped keys for batch", with_detail)
+                st.dataframe(read_ingest_detail(conn, batch_id), hide_index=True)
+
+    conn.close()